@@ -8,8 +8,8 @@ ls -l "$SKETCH_DIR"
 
 cd "$SKETCH_DIR"
 
-echo ">>> Compiling sketch..."
-arduino-cli compile -b arduino:zephyr:unoq --output-dir . .
+echo ">>> Compiling sketch (skipped when cached)..."
+python3 /usr/local/bin/sketch_cache.py build --fqbn arduino:zephyr:unoq --output-dir . .
 
 echo ">>> Searching generated .elf-zsk.bin file..."
 BIN_FILE=$(ls *.elf-zsk.bin | head -n 1)
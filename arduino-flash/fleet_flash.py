@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""Compile once, flash many: parallel flashing of a fleet of UNO Q boards.
+
+Every board in the inventory names a target and a sketch directory. Each
+distinct sketch is compiled once, through the build cache of sketch_cache.py.
+A worker pool then flashes the boards as soon as their sketch is built. The
+flash itself is the usual arduino-flash.sh/flashctl.py run on the board, so
+unchanged sectors are skipped there as well.
+
+Inventory (one board per line, sketch paths relative to the file):
+
+    # name     target                      sketch
+    lab-01     ssh://root@10.0.0.11        ../arduino-matrix
+    lab-02     ssh://root@10.0.0.12:2222   ../arduino-matrix
+    bench      local                       /tmp/sketch
+
+Targets:
+    ssh://[user@]host[:port]  copy the image with scp, then run --remote-command over ssh
+    local                     run --flash-script here (inside the arduino-flash container)
+
+At most --per-host flashes run against the same host at a time; each board's
+SWD bus is driven by its own host. Failed flashes are retried with
+exponential backoff. --dry-run replaces compiling and flashing with a timed
+stub (random skips and failures, see --fail-rate) to try the orchestration
+without boards.
+
+Usage:
+    python3 fleet_flash.py fleet.txt --jobs 8 --per-host 1 --retries 2
+    python3 fleet_flash.py fleet.txt --dry-run --fail-rate 0.2 --seed 1
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from sketch_cache import DEFAULT_FQBN, SketchCache
+
+DEFAULT_FLASH_SCRIPT = "/opt/openocd/bin/arduino-flash.sh"
+REMOTE_DIR = "/tmp/fleet-flash"
+DEFAULT_REMOTE_COMMAND = (
+    "docker run --rm --privileged "
+    "--device /dev/gpiochip0 --device /dev/gpiochip1 --device /dev/gpiochip2 "
+    "-e FLASHCTL_JSON=1 -v {dir}:{dir} -v /var/cache/arduino-sketch:/var/cache/arduino-sketch "
+    "arduino-flash /opt/openocd/bin/arduino-flash.sh {image}")
+SSH_OPTIONS = ["-o", "BatchMode=yes", "-o", "ConnectTimeout=10"]
+PHASES = ("compile", "transfer", "verify", "read", "erase", "write")
+
+
+class FlashError(Exception):
+    pass
+
+
+class Board:
+    """One inventory line plus what happened to it"""
+
+    def __init__(self, name: str, target: str, sketch: str):
+        self.name = name
+        self.target = target
+        self.sketch = sketch
+        self.host = urlparse(target).hostname if target.startswith("ssh://") else "localhost"
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.attempts = 0
+        self.mode = None     # skipped / delta / full, from flashctl
+        self.written = None
+        self.error = None
+        self.total = 0.0
+
+
+def load_inventory(path: str) -> List[Board]:
+    base = os.path.dirname(os.path.abspath(path))
+    boards = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            fields = line.split()
+            if len(fields) != 3:
+                raise ValueError(f"{path}:{number}: expected 'name target sketch'")
+            name, target, sketch = fields
+            if target != "local" and not target.startswith("ssh://"):
+                raise ValueError(f"{path}:{number}: target must be local or ssh://...")
+            boards.append(Board(name, target, os.path.normpath(os.path.join(base, sketch))))
+    names = [b.name for b in boards]
+    duplicates = {n for n in names if names.count(n) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate board names: {', '.join(sorted(duplicates))}")
+    return boards
+
+
+def _flashctl_report(output: str) -> dict:
+    """The last FLASHCTL-REPORT line; a truncated or garbled one is a FlashError, so it is retried"""
+    for line in reversed(output.splitlines()):
+        if line.startswith("FLASHCTL-REPORT "):
+            try:
+                report = json.loads(line[len("FLASHCTL-REPORT "):])
+            except ValueError as e:
+                raise FlashError(f"unreadable flashctl report: {e}") from None
+            if not isinstance(report, dict):
+                raise FlashError("unreadable flashctl report: not an object")
+            return report
+    return {}
+
+
+class Runner:
+    """Compiles sketches and flashes boards for real"""
+
+    def __init__(self, fqbn: str, cache_dir: str, build_dir: str, flash_script: str, remote_command: str):
+        self.fqbn = fqbn
+        self.cache = SketchCache(cache_dir)
+        self.build_dir = build_dir
+        self.flash_script = flash_script
+        self.remote_command = remote_command
+
+    def compile(self, sketch: str) -> str:
+        digest = hashlib.sha1(sketch.encode()).hexdigest()[:8]
+        output = os.path.join(self.build_dir, f"{os.path.basename(sketch)}-{digest}")
+        return self.cache.build(sketch, self.fqbn, output)
+
+    def flash(self, board: Board, image: str) -> dict:
+        """Flash one board; returns the flashctl report, timings include 'transfer'"""
+        if board.target == "local":
+            result = subprocess.run([self.flash_script, image], capture_output=True, text=True,
+                                    env=dict(os.environ, FLASHCTL_JSON="1"))
+            transfer = 0.0
+        else:
+            url = urlparse(board.target)
+            destination = f"{url.username}@{url.hostname}" if url.username else url.hostname
+            ssh = ["ssh", *SSH_OPTIONS] + (["-p", str(url.port)] if url.port else [])
+            scp = ["scp", "-q", *SSH_OPTIONS] + (["-P", str(url.port)] if url.port else [])
+            remote_image = f"{REMOTE_DIR}/{board.name}.elf-zsk.bin"
+            start = time.monotonic()
+            for cmd in ([*ssh, destination, f"mkdir -p {REMOTE_DIR}"],
+                        [*scp, image, f"{destination}:{remote_image}"]):
+                copy = subprocess.run(cmd, capture_output=True, text=True)
+                if copy.returncode != 0:
+                    raise FlashError(f"copy failed: {copy.stderr.strip() or copy.returncode}")
+            transfer = time.monotonic() - start
+            command = self.remote_command.format(dir=REMOTE_DIR, image=shlex.quote(remote_image))
+            result = subprocess.run([*ssh, destination, command], capture_output=True, text=True)
+        if result.returncode != 0:
+            tail = (result.stderr or result.stdout).strip().splitlines()[-1:] or [str(result.returncode)]
+            raise FlashError(f"flash failed: {tail[0]}")
+        report = _flashctl_report(result.stdout)
+        report["transfer"] = transfer
+        return report
+
+
+class DryRunner:
+    """Stand-in for Runner: sleeps for plausible compile/flash times divided by
+    `speed`, skips and fails at random; reported times are the real sleeps"""
+
+    def __init__(self, fail_rate: float = 0.1, speed: float = 10.0, seed: Optional[int] = None):
+        self.fail_rate = fail_rate
+        self.speed = speed
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _sleep(self, seconds: float) -> float:
+        time.sleep(seconds / self.speed)
+        return seconds / self.speed
+
+    def compile(self, sketch: str) -> str:
+        with self._lock:
+            seconds = self.random.uniform(20.0, 60.0)
+        self._sleep(seconds)
+        return f"/dry-run/{os.path.basename(sketch)}.ino.elf-zsk.bin"
+
+    def flash(self, board: Board, image: str) -> dict:
+        with self._lock:
+            transfer = 0.0 if board.target == "local" else self.random.uniform(0.3, 1.5)
+            fails = self.random.random() < self.fail_rate
+            identical = self.random.random() < 0.3
+            changed = self.random.randint(1, 13)
+        transfer = self._sleep(transfer)
+        verify = self._sleep(0.4)
+        if fails:
+            raise FlashError("simulated SWD error")
+        if identical:
+            return {"mode": "skipped", "written": 0, "transfer": transfer, "phases": {"verify": verify}}
+        read = self._sleep(3.5)
+        erase = self._sleep(0.05 * changed)
+        write = self._sleep(0.25 * changed)
+        verify += self._sleep(0.4)
+        return {"mode": "delta", "written": changed, "transfer": transfer,
+                "phases": {"verify": verify, "read": read, "erase": erase, "write": write}}
+
+
+class FleetFlasher:
+    """Compile each sketch once, then flash boards on a worker pool"""
+
+    def __init__(self, runner, jobs: int = 4, per_host: int = 1, retries: int = 2,
+                 backoff: float = 2.0, max_backoff: float = 30.0, compile_jobs: int = 1):
+        self.runner = runner
+        self.jobs = jobs
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.compile_jobs = compile_jobs
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self._print_lock = threading.Lock()
+
+    def _log(self, message: str):
+        with self._print_lock:
+            print(message, flush=True)
+
+    def _slot(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
+
+    def _compile(self, sketch: str):
+        start = time.monotonic()
+        image = self.runner.compile(sketch)
+        return image, time.monotonic() - start
+
+    def _flash(self, board: Board, build) -> Board:
+        start = time.monotonic()
+        try:
+            image, compile_seconds = build.result()
+        except Exception as e:
+            board.error = f"compile failed: {e}"
+            return board
+        board.phases["compile"] = compile_seconds
+        for attempt in range(1, self.retries + 2):
+            board.attempts = attempt
+            try:
+                with self._slot(board.host):
+                    report = self.runner.flash(board, image)
+                board.mode = report.get("mode", "unknown")
+                board.written = report.get("written")
+                board.phases["transfer"] += report.get("transfer", 0.0)
+                for phase, seconds in report.get("phases", {}).items():
+                    board.phases[phase] = board.phases.get(phase, 0.0) + seconds
+                board.error = None
+                self._log(f"[FLEET] {board.name}: {board.mode} (attempt {attempt})")
+                break
+            except (FlashError, OSError) as e:
+                board.error = str(e)
+                if attempt > self.retries:
+                    self._log(f"[FLEET] {board.name}: giving up after {attempt} attempts: {e}")
+                    break
+                delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff) * random.uniform(0.5, 1.0)
+                self._log(f"[FLEET] {board.name}: {e}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+        board.total = time.monotonic() - start
+        return board
+
+    def run(self, boards: List[Board]) -> List[Board]:
+        sketches = sorted({board.sketch for board in boards})
+        self._log(f"[FLEET] {len(boards)} boards, {len(sketches)} sketches, "
+                  f"{self.jobs} workers, {self.per_host} per host")
+        with ThreadPoolExecutor(self.compile_jobs, thread_name_prefix="compile") as compilers, \
+                ThreadPoolExecutor(self.jobs, thread_name_prefix="flash") as flashers:
+            builds = {sketch: compilers.submit(self._compile, sketch) for sketch in sketches}
+            futures = [flashers.submit(self._flash, board, builds[board.sketch]) for board in boards]
+            return [future.result() for future in futures]
+
+
+def format_report(boards: List[Board], wall: float) -> str:
+    columns = PHASES
+    rows = [f"{'board':<14} {'host':<16} {'result':<10} {'tries':>5} "
+            + " ".join(f"{c:>8}" for c in columns) + f" {'total':>8}"]
+    for b in boards:
+        result = "FAILED" if b.error else b.mode
+        rows.append(f"{b.name:<14} {b.host:<16} {result:<10} {b.attempts:>5} "
+                    + " ".join(f"{b.phases.get(c, 0.0):>7.1f}s" for c in columns) + f" {b.total:>7.1f}s")
+    failed = [b for b in boards if b.error]
+    serial = sum(b.total for b in boards)
+    rows.append(f"{len(boards) - len(failed)} flashed, {len(failed)} failed in {wall:.1f}s "
+                f"(sum of board times {serial:.1f}s, {serial / wall if wall else 0:.1f}x)")
+    for b in failed:
+        rows.append(f"  {b.name}: {b.error}")
+    return "\n".join(rows)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Compile once and flash a fleet of UNO Q boards in parallel")
+    parser.add_argument("inventory", help="file with 'name target sketch' lines")
+    parser.add_argument('--jobs', type=int, default=4, help="boards flashed at the same time")
+    parser.add_argument('--per-host', type=int, default=1, help="concurrent flashes per host")
+    parser.add_argument('--compile-jobs', type=int, default=1, help="sketches compiled at the same time")
+    parser.add_argument('--retries', type=int, default=2, help="retries per board after a failure")
+    parser.add_argument('--backoff', type=float, default=2.0, help="first retry delay in seconds, doubled each time")
+    parser.add_argument('--fqbn', default=DEFAULT_FQBN)
+    parser.add_argument('--cache-dir', default=os.environ.get("SKETCH_CACHE_DIR", "/var/cache/arduino-sketch"))
+    parser.add_argument('--build-dir', default="/tmp/fleet-build", help="where compiled images are copied")
+    parser.add_argument('--flash-script', default=DEFAULT_FLASH_SCRIPT, help="flasher for 'local' targets")
+    parser.add_argument('--remote-command', default=DEFAULT_REMOTE_COMMAND,
+                        help="command run over ssh, {image} and {dir} are filled in")
+    parser.add_argument('--dry-run', action='store_true', help="simulate compiling and flashing")
+    parser.add_argument('--fail-rate', type=float, default=0.1, help="dry run: fraction of failing flashes")
+    parser.add_argument('--speed', type=float, default=10.0, help="dry run: time compression factor")
+    parser.add_argument('--seed', type=int, help="dry run: random seed")
+    args = parser.parse_args(argv)
+
+    try:
+        boards = load_inventory(args.inventory)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 2
+
+    if args.dry_run:
+        runner = DryRunner(args.fail_rate, args.speed, args.seed)
+    else:
+        runner = Runner(args.fqbn, args.cache_dir, args.build_dir, args.flash_script, args.remote_command)
+    flasher = FleetFlasher(runner, args.jobs, args.per_host, args.retries, args.backoff,
+                           compile_jobs=args.compile_jobs)
+
+    start = time.monotonic()
+    results = flasher.run(boards)
+    print()
+    print(format_report(results, time.monotonic() - start))
+    return 1 if any(b.error for b in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,115 @@
+"""flashctl delta logic against the file: fake flash. Run from arduino-flash/:
+
+    python3 -m unittest discover tests
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "openocd", "bin"))
+
+from flashctl import ERASED, SKETCH_ADDRESS, FileTarget, changed_runs, flash
+
+SECTOR = 16
+
+
+class ChangedRunsTest(unittest.TestCase):
+
+    def test_identical_image_has_no_runs(self):
+        image = bytes(range(64))
+        self.assertEqual(changed_runs(image, image, 0x1000, SECTOR), [])
+
+    def test_adjacent_changed_sectors_merge_into_one_run(self):
+        image = bytes(range(64))
+        current = bytearray(image)
+        current[17] ^= 1
+        current[40] ^= 1
+        self.assertEqual(changed_runs(image, bytes(current), 0x1000, SECTOR), [(0x1010, image[16:48])])
+
+    def test_separate_runs_and_partial_last_sector(self):
+        image = bytes(range(60))
+        current = bytearray(image)
+        current[0] ^= 1
+        current[59] ^= 1
+        self.assertEqual(changed_runs(image, bytes(current), 0x1000, SECTOR),
+                         [(0x1000, image[0:16]), (0x1030, image[48:60])])
+
+    def test_short_readback_counts_as_changed(self):
+        image = bytes(range(40))
+        self.assertEqual(changed_runs(image, image[:20], 0, SECTOR), [(16, image[16:40])])
+
+
+class FlashTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="flashctl-test-")
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.flash_path = os.path.join(self.tmp, "flash.bin")
+        self.state = os.path.join(self.tmp, "state.json")
+
+    def image(self, data: bytes) -> str:
+        path = os.path.join(self.tmp, "sketch.bin")
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def flash(self, data: bytes, **kwargs) -> dict:
+        target = FileTarget(self.flash_path, sector_size=SECTOR)
+        report = flash(target, self.image(data), sector_size=SECTOR, state_path=self.state, **kwargs)
+        report["erased_sectors"] = target.erased_sectors
+        return report
+
+    def flash_contents(self) -> bytes:
+        with open(self.flash_path, "rb") as f:
+            return f.read()
+
+    def test_skip_delta_and_full(self):
+        image = bytes(range(100))
+        report = self.flash(image)
+        self.assertEqual((report["mode"], report["written"], report["sectors"]), ("delta", 7, 7))
+        self.assertEqual(self.flash_contents()[:100], image)
+        self.assertEqual(self.flash_contents()[100:], bytes([ERASED]) * 12)
+
+        report = self.flash(image)
+        self.assertEqual((report["mode"], report["written"], report["erased_sectors"]), ("skipped", 0, 0))
+
+        changed = bytearray(image)
+        changed[50] = 0
+        report = self.flash(bytes(changed))
+        self.assertEqual((report["mode"], report["written"], report["runs"]), ("delta", 1, 1))
+        self.assertEqual(report["erased_sectors"], 1)
+        self.assertEqual(self.flash_contents()[:100], bytes(changed))
+
+        report = self.flash(bytes(changed), full=True)
+        self.assertEqual((report["mode"], report["erased_sectors"]), ("full", 7))
+
+    def test_timings_are_kept_per_target_kind(self):
+        board = {"sector_seconds": 0.5, "session_seconds": 3.0}
+        with open(self.state, "w") as f:
+            json.dump({"openocd": board}, f)
+        self.flash(bytes(range(100)))
+        with open(self.state) as f:
+            state = json.load(f)
+        self.assertEqual(state["openocd"], board)
+        self.assertEqual(set(state["file"]), {"sector_seconds", "session_seconds"})
+
+    def test_flat_legacy_state_is_ignored(self):
+        with open(self.state, "w") as f:
+            json.dump({"sector_seconds": 9.0, "session_seconds": 9.0}, f)
+        report = self.flash(bytes(range(32)))
+        self.assertLess(report["full_estimate"], 9.0)
+        with open(self.state) as f:
+            self.assertEqual(set(json.load(f)), {"file"})
+
+    def test_file_starts_at_the_sketch_address(self):
+        target = FileTarget(self.flash_path, sector_size=SECTOR)
+        flash(target, self.image(b"\x01" * 16), address=SKETCH_ADDRESS + SECTOR, sector_size=SECTOR,
+              state_path=self.state)
+        self.assertEqual(self.flash_contents(), bytes([ERASED]) * SECTOR + b"\x01" * 16)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+"""fleet_flash report parsing and retries. Run from arduino-flash/:
+
+    python3 -m unittest discover tests
+"""
+import contextlib
+import io
+import os
+import sys
+import unittest
+from concurrent.futures import Future
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from fleet_flash import Board, FlashError, FleetFlasher, _flashctl_report
+
+GOOD = 'FLASHCTL-REPORT {"mode": "delta", "written": 2, "phases": {"write": 0.5}}'
+
+
+class ScriptedRunner:
+    """Runner whose flash() parses the next canned flashctl output"""
+
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+
+    def flash(self, board, image):
+        report = _flashctl_report(self.outputs.pop(0))
+        report["transfer"] = 0.0
+        return report
+
+
+class ReportTest(unittest.TestCase):
+
+    def test_last_report_line_wins(self):
+        output = '[FLASH] Wrote 2/8 sectors\nFLASHCTL-REPORT {"mode": "full"}\n' + GOOD + "\n"
+        self.assertEqual(_flashctl_report(output)["mode"], "delta")
+
+    def test_missing_report_is_empty(self):
+        self.assertEqual(_flashctl_report("[FLASH] Wrote 2/8 sectors\n"), {})
+
+    def test_garbled_report_is_a_flash_error(self):
+        for line in ('FLASHCTL-REPORT {"mode": "del', "FLASHCTL-REPORT [1, 2]"):
+            with self.assertRaises(FlashError):
+                _flashctl_report(line)
+
+
+class RetryTest(unittest.TestCase):
+
+    def flash(self, outputs, retries=2):
+        build = Future()
+        build.set_result(("sketch.bin", 0.0))
+        fleet = FleetFlasher(ScriptedRunner(outputs), retries=retries, backoff=0.0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fleet._flash(Board("b1", "local", "sketch"), build)
+
+    def test_truncated_report_is_retried(self):
+        board = self.flash(['FLASHCTL-REPORT {"mode": "de', GOOD])
+        self.assertEqual((board.attempts, board.mode, board.written, board.error), (2, "delta", 2, None))
+        self.assertEqual(board.phases["write"], 0.5)
+
+    def test_gives_up_after_retries(self):
+        board = self.flash(["FLASHCTL-REPORT {"] * 2, retries=1)
+        self.assertEqual(board.attempts, 2)
+        self.assertIn("unreadable flashctl report", board.error)
+
+
+if __name__ == "__main__":
+    unittest.main()
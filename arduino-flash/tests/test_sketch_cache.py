@@ -0,0 +1,168 @@
+"""sketch_cache keys, LRU eviction and build(). Run from arduino-flash/:
+
+    python3 -m unittest discover tests
+
+build() is exercised with a throwaway arduino-cli script put first on PATH.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from sketch_cache import SketchCache, cache_key, sketch_sources
+
+VERSIONS = {"core": "arduino:zephyr@0.1", "cli": "1.0"}
+
+FAKE_CLI = """#!/bin/sh
+# arduino-cli stand-in: `version`, and `compile ... --output-dir DIR SKETCH`
+[ "$1" = version ] && { echo "arduino-cli Version: test"; exit 0; }
+while [ $# -gt 1 ]; do [ "$1" = --output-dir ] && out="$2"; shift; done
+echo compiled >> "$(dirname "$0")/compiles"
+head -c "${FAKE_IMAGE_BYTES:-64}" /dev/zero > "$out/sketch.ino.elf-zsk.bin"
+echo elf > "$out/sketch.ino.elf"
+"""
+
+
+class CacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="sketch-cache-test-")
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.cache = SketchCache(os.path.join(self.tmp, "cache"))
+
+    def sketch(self, name="sketch", source="void setup() {}\n"):
+        path = os.path.join(self.tmp, name)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "sketch.ino"), "w") as f:
+            f.write(source)
+        return path
+
+    def store(self, key, size=10, age=0.0):
+        """Stores a fake build of `size` bytes, last used `age` seconds ago"""
+        build = tempfile.mkdtemp(dir=self.tmp)
+        with open(os.path.join(build, "sketch.ino.elf-zsk.bin"), "wb") as f:
+            f.write(b"\0" * size)
+        path = self.cache.store(key, build, {})
+        used = time.time() - age
+        os.utime(os.path.join(path, "meta.json"), (used, used))
+        return path
+
+    def keys(self):
+        return [e["key"] for e in self.cache.entries()]
+
+
+class CacheKeyTest(CacheTestCase):
+
+    def test_key_depends_on_sources_and_toolchain(self):
+        sketch = self.sketch()
+        key = cache_key(sketch, "arduino:zephyr:unoq", VERSIONS)
+        self.assertEqual(key, cache_key(sketch, "arduino:zephyr:unoq", VERSIONS))
+        self.assertNotEqual(key, cache_key(sketch, "arduino:zephyr:other", VERSIONS))
+        self.assertNotEqual(key, cache_key(sketch, "arduino:zephyr:unoq", dict(VERSIONS, cli="1.1")))
+        self.sketch(source="void setup() { }\n")
+        self.assertNotEqual(key, cache_key(sketch, "arduino:zephyr:unoq", VERSIONS))
+
+    def test_outputs_and_hidden_files_are_ignored(self):
+        sketch = self.sketch()
+        key = cache_key(sketch, "arduino:zephyr:unoq", VERSIONS)
+        for name in ("sketch.ino.elf-zsk.bin", "frames.bin", ".sketch.ino.swp"):
+            with open(os.path.join(sketch, name), "w") as f:
+                f.write("x")
+        os.makedirs(os.path.join(sketch, "build"))
+        with open(os.path.join(sketch, "build", "gen.cpp"), "w") as f:
+            f.write("x")
+        self.assertEqual(sketch_sources(sketch), ["sketch.ino"])
+        self.assertEqual(key, cache_key(sketch, "arduino:zephyr:unoq", VERSIONS))
+
+
+class PruneTest(CacheTestCase):
+
+    def test_lookup_marks_entry_as_used(self):
+        self.store("a", age=30)
+        self.store("b", age=20)
+        self.assertEqual(self.keys(), ["b", "a"])
+        self.assertIsNotNone(self.cache.lookup("a"))
+        self.assertEqual(self.keys(), ["a", "b"])
+        self.assertIsNone(self.cache.lookup("missing"))
+
+    def test_evicts_least_recently_used_beyond_max_entries(self):
+        for i, key in enumerate("abcd"):
+            self.store(key, age=40 - 10 * i)  # d is the most recent
+        self.assertEqual(sorted(self.cache.prune(max_entries=2)), ["a", "b"])
+        self.assertEqual(self.keys(), ["d", "c"])
+
+    def test_evicts_beyond_max_bytes(self):
+        self.store("old", size=600, age=20)
+        self.store("new", size=600, age=10)
+        meta = os.path.getsize(os.path.join(self.cache.path("new"), "meta.json"))
+        self.assertEqual(self.cache.prune(max_bytes=600 + meta + 100), ["old"])
+        self.assertEqual(self.keys(), ["new"])
+
+    def test_kept_entry_survives_even_when_over_budget(self):
+        self.store("recent", size=10, age=10)
+        self.store("big", size=5000, age=100)
+        evicted = self.cache.prune(max_entries=1, max_bytes=100, keep="big")
+        self.assertEqual(evicted, ["recent"])
+        self.assertEqual(self.keys(), ["big"])
+
+    def test_interrupted_stores_are_cleaned_up(self):
+        self.store("a")
+        os.makedirs(os.path.join(self.cache.root, ".store-leftover"))
+        self.cache.prune()
+        self.assertFalse(os.path.exists(os.path.join(self.cache.root, ".store-leftover")))
+        self.assertEqual(self.keys(), ["a"])
+
+
+class TinyCache(SketchCache):
+    """Budget smaller than one build, as with a huge image on a small cache"""
+
+    def prune(self, max_entries=8, max_bytes=16, keep=None):
+        return super().prune(max_entries, max_bytes, keep)
+
+
+class BuildTest(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        bin_dir = os.path.join(self.tmp, "bin")
+        os.makedirs(bin_dir)
+        cli = os.path.join(bin_dir, "arduino-cli")
+        with open(cli, "w") as f:
+            f.write(FAKE_CLI)
+        os.chmod(cli, 0o755)
+        self.compiles = os.path.join(bin_dir, "compiles")
+        path = os.environ["PATH"]
+        self.addCleanup(os.environ.__setitem__, "PATH", path)
+        os.environ["PATH"] = bin_dir + os.pathsep + path
+        os.environ["ARDUINO_DIRECTORIES_DATA"] = os.path.join(self.tmp, "data")
+        self.addCleanup(os.environ.pop, "ARDUINO_DIRECTORIES_DATA")
+
+    def compile_count(self):
+        with open(self.compiles) as f:
+            return len(f.readlines())
+
+    def test_miss_compiles_and_hit_copies(self):
+        sketch = self.sketch()
+        out1, out2 = os.path.join(self.tmp, "out1"), os.path.join(self.tmp, "out2")
+        image = self.cache.build(sketch, output_dir=out1)
+        self.assertEqual(image, os.path.join(out1, "sketch.ino.elf-zsk.bin"))
+        self.assertEqual(self.compile_count(), 1)
+        image = self.cache.build(sketch, output_dir=out2)
+        self.assertTrue(os.path.exists(image))
+        self.assertTrue(os.path.exists(os.path.join(out2, "sketch.ino.elf")))
+        self.assertEqual(self.compile_count(), 1)
+
+    def test_build_larger_than_the_cache_budget_still_succeeds(self):
+        cache = TinyCache(self.cache.root)
+        sketch = self.sketch()
+        image = cache.build(sketch, output_dir=os.path.join(self.tmp, "out"))
+        self.assertEqual(os.path.getsize(image), 64)
+        self.assertEqual(len(cache.entries()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,10 @@ import time
 import sys
 from arduino.app_utils import *
 from arduino.app_bricks.keyword_spotting import KeywordSpotting
+from metrics import REGISTRY, InstrumentedBridge
+
+# Time every Bridge.call per method
+Bridge = InstrumentedBridge(Bridge)
 
 def on_keyword_detected():
     """Executes the expected action when the keyword is detected or simulated."""
@@ -21,6 +25,7 @@ def main():
             time.sleep(10)
     except KeyboardInterrupt:
         print("Exiting...")
+        print(REGISTRY.summary())
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Absolute LED state shared with sketch.ino (set_leds / get_leds).
+
+The six LEDs are bits of two masks, in the same order as LED_BUILTIN + i on
+the MCU. get_leds() returns the whole state packed in one integer:
+
+    bits 0-5   on_mask      LED is lit (when not blinking)
+    bits 6-11  blink_mask   LED is blinking
+    bits 12+   period_ms    blink interval shared by all blinking LEDs
+"""
+from typing import Dict, Tuple
+
+LED_ORDER = ('led3_r', 'led3_g', 'led3_b', 'led4_r', 'led4_g', 'led4_b')
+LED_COUNT = len(LED_ORDER)
+MASK = (1 << LED_COUNT) - 1
+PERIOD_SHIFT = 2 * LED_COUNT
+
+
+def pack_state(on_mask: int, blink_mask: int, period_ms: int) -> int:
+    return (period_ms << PERIOD_SHIFT) | ((blink_mask & MASK) << LED_COUNT) | (on_mask & MASK)
+
+
+def unpack_state(value: int) -> Tuple[int, int, int]:
+    """Split a get_leds() value into (on_mask, blink_mask, period_ms)"""
+    return value & MASK, (value >> LED_COUNT) & MASK, value >> PERIOD_SHIFT
+
+
+def to_masks(led_states: Dict[str, bool], blink_states: Dict[str, bool]) -> Tuple[int, int]:
+    on_mask = sum(1 << i for i, led in enumerate(LED_ORDER) if led_states[led])
+    blink_mask = sum(1 << i for i, led in enumerate(LED_ORDER) if blink_states[led])
+    return on_mask, blink_mask
+
+
+def from_masks(on_mask: int, blink_mask: int) -> Tuple[Dict[str, bool], Dict[str, bool]]:
+    led_states = {led: bool((on_mask >> i) & 1) for i, led in enumerate(LED_ORDER)}
+    blink_states = {led: bool((blink_mask >> i) & 1) for i, led in enumerate(LED_ORDER)}
+    return led_states, blink_states
@@ -1,18 +1,30 @@
 #!/usr/bin/env python3
+import os
 import sys
 import threading
 import time
-from queue import Queue
-from weakref import WeakSet
-from flask import Flask, Response, send_file, jsonify
+from flask import Flask, jsonify, request
 from arduino.app_utils import *
+from metrics import REGISTRY, InstrumentedBridge, instrument_flask
+from sse import Broadcaster, serve
+from assets import AssetStore
+from bridge_dispatch import BridgeDispatcher
+from ledstate import LED_ORDER, from_masks, to_masks, unpack_state
+
+# Time every Bridge.call per method (exposed on /metrics)
+Bridge = InstrumentedBridge(Bridge)
 
 # Flask app
 app = Flask(__name__)
+instrument_flask(app)
+
+BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+# index.html in memory, gzip/brotli precompressed, served with an ETag
+assets = AssetStore(BASE_DIR, ['index.html'])
 
-# Status management for Server-Sent Events
-status_connections = WeakSet()
+# Status management for Server-Sent Events (served by sse.py on /status)
 current_status = "Ready"
+status_broadcaster = Broadcaster({"status": current_status})
 
 class WebStatus:
     _lock = threading.Lock()
@@ -20,8 +32,7 @@ class WebStatus:
     @classmethod
     def _broadcast(cls):
         """Broadcast current status to all connected clients"""
-        for q in status_connections:
-            q.put({"status": current_status})
+        status_broadcaster.publish({"status": current_status})
 
     @classmethod
     def update_status(cls, status: str):
@@ -42,30 +53,120 @@ blink_states = {
     'led4_r': False, 'led4_g': False, 'led4_b': False
 }
 
+LED_MODES = ('off', 'on', 'blink')
+
+# Blink interval shared by all blinking LEDs (ms)
+BLINK_PERIOD_DEFAULT = 1000
+BLINK_PERIOD_MIN = 50
+BLINK_PERIOD_MAX = 60000
+blink_period = BLINK_PERIOD_DEFAULT
+
+# Serializes state updates with queueing the matching bridge call
+led_lock = threading.Lock()
+
+# Bumped on every host-side change, so a read-back that raced with one is ignored
+state_version = 0
+
+# How often the shadow state is checked against the MCU (get_leds)
+RECONCILE_SECONDS = 5.0
+reconcile_stats = {'reads': 0, 'drifts': 0, 'raced': 0, 'failed': 0}
+
+def led_mode(led):
+    """Current mode of one LED: 'off', 'on' or 'blink'"""
+    if blink_states[led]:
+        return 'blink'
+    return 'on' if led_states[led] else 'off'
+
+def led_masks():
+    """Current state as set_leds() arguments: (on_mask, blink_mask, period_ms)"""
+    return to_masks(led_states, blink_states) + (blink_period,)
+
+def merge_led_calls(batch):
+    """Calls that queued up behind an in-flight one collapse into a single
+    set_leds of the current state, which already includes all of them; a
+    queued read-back is sent last so it sees that state. Each write shares
+    the set_leds result, each read-back gets the get_leds value"""
+    writes = [i for i, (method, _) in enumerate(batch) if method != "get_leds"]
+    reads = [i for i, (method, _) in enumerate(batch) if method == "get_leds"]
+    calls = []
+    if writes:
+        with led_lock:
+            calls.append(("set_leds", led_masks(), writes))
+    if reads:
+        calls.append(("get_leds", (), reads))
+    return calls
+
+# All LED calls go through one FIFO channel, so routes never wait on the bridge
+bridge = BridgeDispatcher(Bridge.call)
+bridge.channel("leds", merger=merge_led_calls)
+
+REGISTRY.gauge("sse_subscribers", "Connected SSE clients", lambda: {("/status",): status_broadcaster.subscribers}, ("path",))
+REGISTRY.gauge("bridge_pending_calls", "Bridge calls queued but not yet sent", bridge.pending)
+
+def report_bridge_error(label):
+    """Future callback: log and surface a failed bridge call"""
+    def callback(future):
+        error = future.exception()
+        if error is not None:
+            print(f"[ERROR] {label}: {error}")
+            WebStatus.update_status(f"{label} failed: {error}")
+    return callback
+
+def push_led_state(label):
+    """Queue the whole (absolute) LED state; call with led_lock held, after
+    updating led_states / blink_states / blink_period"""
+    global state_version
+    state_version += 1
+    future = bridge.submit("leds", "set_leds", *led_masks())
+    future.add_done_callback(report_bridge_error(label))
+    return future
+
+def reconcile_leds(timeout=2.0):
+    """Read the state back from the MCU and adopt it if the shadow copy drifted
+    (MCU reset, another client); returns True when both already matched"""
+    global blink_period
+    with led_lock:
+        version = state_version
+    value = bridge.submit("leds", "get_leds").result(timeout)
+    with led_lock:
+        reconcile_stats['reads'] += 1
+        if version != state_version:
+            # Changed while reading; the next pass checks the new state
+            reconcile_stats['raced'] += 1
+            return True
+        on_mask, blink_mask, period = unpack_state(int(value))
+        if (on_mask, blink_mask, period) == led_masks():
+            return True
+        reconcile_stats['drifts'] += 1
+        mcu_leds, mcu_blinks = from_masks(on_mask, blink_mask)
+        led_states.update(mcu_leds)
+        blink_states.update(mcu_blinks)
+        if period > 0:
+            blink_period = period
+        result = {led: led_mode(led) for led in LED_ORDER}
+    WebStatus.update_status("LED state resynced from the board")
+    print(f"[LED] Resynced from MCU -> {result} ({blink_period} ms)")
+    return False
+
+def reconcile_loop():
+    """Background resync of the shadow state, one get_leds call per pass"""
+    healthy = True
+    while True:
+        time.sleep(RECONCILE_SECONDS)
+        try:
+            reconcile_leds()
+            healthy = True
+        except Exception as e:
+            reconcile_stats['failed'] += 1
+            if healthy:
+                print(f"[WARN] LED reconcile failed: {e}")
+            healthy = False
+
 # Routes
 @app.route('/')
 def index():
     """Serve the main HTML page"""
-    return send_file('index.html')
-
-@app.route('/status')
-def status_stream():
-    """Server-Sent Events endpoint for real-time status updates"""
-    def event_stream():
-        q = Queue()
-        status_connections.add(q)
-        try:
-            # Send initial status
-            yield f"data: {{\"status\": \"{current_status}\"}}\n\n"
-            
-            # Stream updates
-            while True:
-                data = q.get()
-                yield f"data: {{'status': '{data['status']}'}}\n\n"
-        except GeneratorExit:
-            status_connections.discard(q)
-    
-    return Response(event_stream(), mimetype='text/event-stream')
+    return assets.flask_response('index.html')
 
 @app.route('/toggle/<led>', methods=['POST'])
 def toggle_led(led):
@@ -74,22 +175,24 @@ def toggle_led(led):
         if led not in led_states:
             return jsonify({'success': False, 'error': 'Invalid LED'}), 400
         
-        # Call Arduino Bridge
-        Bridge.call(f"toggle_{led}")
-        
-        # Update state
-        led_states[led] = not led_states[led]
+        with led_lock:
+            # Update state
+            led_states[led] = not led_states[led]
+            state = led_states[led]
+
+            # Queue Arduino Bridge call with the resulting absolute state
+            push_led_state(f"Toggle {led}")
         
         # Update status
-        status_msg = f"{led.upper()}: {'ON' if led_states[led] else 'OFF'}"
+        status_msg = f"{led.upper()}: {'ON' if state else 'OFF'}"
         WebStatus.update_status(status_msg)
         
-        print(f"[LED] Toggled {led} -> {led_states[led]}")
+        print(f"[LED] Toggled {led} -> {state}")
         
         return jsonify({
             'success': True,
             'led': led,
-            'state': led_states[led]
+            'state': state
         })
     except Exception as e:
         print(f"[ERROR] Toggle {led}: {e}")
@@ -102,22 +205,28 @@ def start_blink(led):
         if led not in blink_states:
             return jsonify({'success': False, 'error': 'Invalid LED'}), 400
         
-        # Call Arduino Bridge
-        Bridge.call(f"start_blink_{led}")
-        
-        # Update state
-        blink_states[led] = True
-        
-        # Update status
-        status_msg = f"{led.upper()} blink STARTED"
-        WebStatus.update_status(status_msg)
+        with led_lock:
+            # Already blinking: nothing to send
+            skipped = blink_states[led]
+            if not skipped:
+                # Update state
+                blink_states[led] = True
+
+                # Queue Arduino Bridge call with the resulting absolute state
+                push_led_state(f"Start blink {led}")
         
-        print(f"[BLINK] Started {led}")
+        if not skipped:
+            # Update status
+            status_msg = f"{led.upper()} blink STARTED"
+            WebStatus.update_status(status_msg)
+
+            print(f"[BLINK] Started {led}")
         
         return jsonify({
             'success': True,
             'led': led,
-            'blinking': True
+            'blinking': True,
+            'skipped': skipped
         })
     except Exception as e:
         print(f"[ERROR] Start blink {led}: {e}")
@@ -130,27 +239,118 @@ def stop_blink(led):
         if led not in blink_states:
             return jsonify({'success': False, 'error': 'Invalid LED'}), 400
         
-        # Call Arduino Bridge
-        Bridge.call(f"stop_blink_{led}")
-        
-        # Update state
-        blink_states[led] = False
-        
-        # Update status
-        status_msg = f"{led.upper()} blink STOPPED"
-        WebStatus.update_status(status_msg)
+        with led_lock:
+            # Not blinking and already off: nothing to send
+            skipped = not blink_states[led] and not led_states[led]
+            if not skipped:
+                # Update state (stopping a blink leaves the LED off)
+                blink_states[led] = False
+                led_states[led] = False
+
+                # Queue Arduino Bridge call with the resulting absolute state
+                push_led_state(f"Stop blink {led}")
         
-        print(f"[BLINK] Stopped {led}")
+        if not skipped:
+            # Update status
+            status_msg = f"{led.upper()} blink STOPPED"
+            WebStatus.update_status(status_msg)
+
+            print(f"[BLINK] Stopped {led}")
         
         return jsonify({
             'success': True,
             'led': led,
-            'blinking': False
+            'blinking': False,
+            'skipped': skipped
         })
     except Exception as e:
         print(f"[ERROR] Stop blink {led}: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/leds', methods=['POST'])
+def set_leds():
+    """Set the desired mode of several LEDs with one bridge call
+
+    Body: {"leds": {"led3_r": "on", "led4_b": "blink", ...}, "period": 500}
+    LEDs that are left out keep their mode; "period" is the blink interval in ms.
+    """
+    global blink_period
+    try:
+        data = request.get_json(silent=True) or {}
+        wanted = data.get('leds') or {}
+        if not isinstance(wanted, dict):
+            return jsonify({'success': False, 'error': '"leds" must be an object'}), 400
+
+        modes = {}
+        for led, mode in wanted.items():
+            if led not in led_states:
+                return jsonify({'success': False, 'error': f'Invalid LED: {led}'}), 400
+            if isinstance(mode, bool):
+                mode = 'on' if mode else 'off'
+            if mode not in LED_MODES:
+                return jsonify({'success': False, 'error': f'Invalid mode for {led}: {mode}'}), 400
+            modes[led] = mode
+
+        period = data.get('period', blink_period)
+        try:
+            period = int(period)
+        except (TypeError, ValueError):
+            period = -1
+        if not BLINK_PERIOD_MIN <= period <= BLINK_PERIOD_MAX:
+            return jsonify({'success': False,
+                            'error': f'period must be {BLINK_PERIOD_MIN}-{BLINK_PERIOD_MAX} ms'}), 400
+
+        with led_lock:
+            changed = [led for led in LED_ORDER if led in modes and modes[led] != led_mode(led)]
+            period_changed = period != blink_period
+            future = None
+            if changed or period_changed:
+                # Update state
+                for led in changed:
+                    led_states[led] = modes[led] == 'on'
+                    blink_states[led] = modes[led] == 'blink'
+                blink_period = period
+
+                # Queue one Arduino Bridge call for the whole scene
+                future = push_led_state("Set LEDs")
+            result = {led: led_mode(led) for led in LED_ORDER}
+        if future is not None:
+            WebStatus.update_status(
+                ", ".join(f"{led.upper()}: {result[led].upper()}" for led in changed) or f"Blink period {period} ms")
+            print(f"[LED] Scene -> {result} ({period} ms)")
+
+        return jsonify({
+            'success': True,
+            'leds': result,
+            'period': period,
+            'changed': changed,
+            'skipped': future is None
+        })
+    except Exception as e:
+        print(f"[ERROR] Set LEDs: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/leds', methods=['GET'])
+def get_leds():
+    """Get the mode of every LED; ?refresh=1 reads it back from the MCU first"""
+    try:
+        in_sync = None
+        if request.args.get('refresh'):
+            in_sync = reconcile_leds()
+        with led_lock:
+            result = {led: led_mode(led) for led in LED_ORDER}
+            period = blink_period
+        return jsonify({'success': True, 'leds': result, 'period': period, 'in_sync': in_sync})
+    except Exception as e:
+        print(f"[ERROR] Get LEDs: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/bridge/stats', methods=['GET'])
+def bridge_stats():
+    """Get bridge dispatcher and reconcile counters"""
+    return jsonify({'success': True, 'pending': bridge.pending(), 'stats': dict(bridge.stats),
+                    'reconcile': dict(reconcile_stats)})
+
 def main():
     print("=" * 60)
     print("Arduino LED Web Control - Starting Server")
@@ -159,14 +359,16 @@ def main():
     print("   http://0.0.0.0:8000")
     print("\n" + "=" * 60)
     
-    # Start Flask server
+    # Adopt whatever the MCU is showing, then keep the shadow state in sync
+    try:
+        reconcile_leds()
+    except Exception as e:
+        print(f"[WARN] Could not read LED state from the board: {e}")
+    threading.Thread(target=reconcile_loop, daemon=True).start()
+
+    # Start server: Flask routes on a worker pool, /status SSE on the event loop
     try:
-        app.run(
-            host="0.0.0.0",
-            port=8000,
-            debug=False,
-            use_reloader=False
-        )
+        serve(app, "0.0.0.0", 8000, {'/status': status_broadcaster})
     except KeyboardInterrupt:
         print("\n\nShutting down...")
     except Exception as e:
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""Asyncio Server-Sent Events broadcaster and HTTP front end for the Flask apps.
+
+All SSE subscribers are served from a single asyncio event loop instead of
+one blocked Flask thread each. Every client has a one-slot buffer that only
+holds the latest state, so a stalled browser tab never makes memory grow: new
+updates overwrite the pending one (coalescing) until the socket drains.
+Idle streams get a heartbeat comment, and clients are dropped as soon as
+their connection closes.
+
+Each state change is serialized once, in publish(), into a ready-to-write
+SSE frame with an `id:` of the form `<epoch>-<seq>`: seq increases
+monotonically and epoch is random per Broadcaster, so per process. Every
+subscriber writes that same bytes buffer. The last few frames are kept in a
+history ring, so a reconnecting EventSource (which sends `Last-Event-ID`)
+only gets the frames it missed, or nothing at all if it is already up to
+date. An id from another epoch (the server restarted) gets the full latest
+state, even if its seq happens to fall inside the new history.
+
+Regular routes still go to the Flask (WSGI) app, run on a small bounded
+thread pool:
+
+    status = Broadcaster({"status": "Ready"})
+    status.publish({"status": "LED3_R: ON"})          # from any thread
+    serve(app, "0.0.0.0", 8000, {"/status": status})  # blocks
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, Optional
+from urllib.parse import unquote_to_bytes
+
+HEARTBEAT_SECONDS = 15.0
+HISTORY_SIZE = 32
+WSGI_WORKERS = 8
+MAX_HEADER_LINES = 100
+MAX_BODY_BYTES = 1 << 20
+
+SSE_HEADERS = (b"HTTP/1.1 200 OK\r\n"
+               b"Content-Type: text/event-stream\r\n"
+               b"Cache-Control: no-cache\r\n"
+               b"Connection: keep-alive\r\n"
+               b"X-Accel-Buffering: no\r\n"
+               b"\r\n")
+HEARTBEAT = b": ping\n\n"
+
+
+class HttpError(Exception):
+    """A request the server answers with an error status and then closes"""
+
+    def __init__(self, status: str):
+        super().__init__(status)
+        self.status = status
+
+    def response(self) -> bytes:
+        body = self.status.encode("latin-1")
+        return (f"HTTP/1.1 {self.status}\r\nContent-Type: text/plain\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode("latin-1") + body
+
+
+class _Client:
+    """One SSE subscriber: a single pending (id, frame) slot plus a wakeup flag"""
+    __slots__ = ("pending", "last_id", "wakeup")
+
+    def __init__(self, last_id: int):
+        self.pending = None
+        self.last_id = last_id
+        self.wakeup = asyncio.Event()
+
+
+class Broadcaster:
+    """Fans state updates out to SSE clients, keeping only the latest value per client"""
+
+    def __init__(self, initial: Optional[dict] = None, heartbeat: float = HEARTBEAT_SECONDS,
+                 history: int = HISTORY_SIZE, epoch: Optional[str] = None):
+        self.heartbeat = heartbeat
+        # Distinguishes this process's ids from those of an earlier run
+        self.epoch = epoch or os.urandom(4).hex()
+        self._state = initial
+        self._seq = 0
+        self._history = deque(maxlen=history)
+        self._clients = set()
+        self._loop = None
+        self._lock = threading.Lock()
+        if initial is not None:
+            self._history.append((0, self.encode(0, initial)))
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """Bind to the event loop that serves the streams"""
+        self._loop = loop
+
+    @property
+    def state(self) -> Optional[dict]:
+        return self._state
+
+    @property
+    def last_id(self) -> int:
+        """seq of the latest frame (the `id:` sent is `<epoch>-<seq>`)"""
+        return self._seq
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._clients)
+
+    def publish(self, data: dict):
+        """Encode a new state once and wake every client (safe from any thread)"""
+        with self._lock:
+            self._seq += 1
+            frame = (self._seq, self.encode(self._seq, data))
+            self._state = data
+            self._history.append(frame)
+            loop = self._loop
+            # Scheduled under the lock so frames reach the loop in id order
+            if loop is not None and not loop.is_closed():
+                loop.call_soon_threadsafe(self._fanout, frame)
+
+    def _fanout(self, frame):
+        for client in self._clients:
+            # Overwrites anything a slow client hasn't received yet
+            client.pending = frame
+            client.wakeup.set()
+
+    def encode(self, seq: int, data: dict) -> bytes:
+        return f"id: {self.epoch}-{seq}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+    def _resume_seq(self, last_event_id: Optional[str]) -> Optional[int]:
+        """seq of a Last-Event-ID from this epoch, None for anything else"""
+        epoch, _, seq = (last_event_id or "").strip().rpartition("-")
+        if epoch != self.epoch:
+            return None
+        try:
+            return int(seq)
+        except ValueError:
+            return None
+
+    def backlog(self, last_event_id: Optional[str] = None):
+        """Returns (last_id, frames) a new client must receive first: the frames
+        after `last_event_id` if it is from this epoch and still in the history
+        ring, otherwise the latest full state"""
+        with self._lock:
+            history = list(self._history)
+        if not history:
+            return -1, []
+        resume = self._resume_seq(last_event_id)
+        if resume is not None and history[0][0] - 1 <= resume <= history[-1][0]:
+            return history[-1][0], [frame for _, frame in history[resume - history[0][0] + 1:]]
+        return history[-1][0], [history[-1][1]]
+
+    async def stream(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                     last_event_id: Optional[str] = None):
+        """Serve one subscriber until it disconnects"""
+        last_id, backlog = self.backlog(last_event_id)
+        client = _Client(last_id)
+        self._clients.add(client)
+        # Browsers never send anything after the request; EOF means they left
+        closed = asyncio.ensure_future(reader.read(1))
+        try:
+            writer.write(SSE_HEADERS + b"".join(backlog))
+            await writer.drain()
+            while not closed.done():
+                woken = asyncio.ensure_future(client.wakeup.wait())
+                await asyncio.wait({woken, closed}, timeout=self.heartbeat,
+                                   return_when=asyncio.FIRST_COMPLETED)
+                if not woken.done():
+                    woken.cancel()
+                    if not closed.done():
+                        writer.write(HEARTBEAT)
+                        await writer.drain()
+                    continue
+                client.wakeup.clear()
+                pending, client.pending = client.pending, None
+                # Skip frames already sent as part of the backlog
+                if pending is not None and pending[0] > client.last_id:
+                    client.last_id = pending[0]
+                    writer.write(pending[1])
+                    await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            closed.cancel()
+            self._clients.discard(client)
+
+
+class EventLoopServer:
+    """Minimal HTTP/1.1 server: SSE paths on the event loop, everything else via WSGI"""
+
+    def __init__(self, app, host: str, port: int, streams: Dict[str, Broadcaster],
+                 workers: int = WSGI_WORKERS, ready: Optional[threading.Event] = None):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.streams = streams
+        self.ready = ready
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wsgi")
+
+    def serve_forever(self):
+        asyncio.run(self._serve())
+
+    async def _serve(self):
+        loop = asyncio.get_running_loop()
+        for broadcaster in self.streams.values():
+            broadcaster.attach(loop)
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        if self.ready is not None:
+            self.ready.set()
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, query, version, headers = request
+
+                if path in self.streams and method in ("GET", "HEAD"):
+                    if method == "HEAD":
+                        writer.write(SSE_HEADERS)
+                        await writer.drain()
+                        continue
+                    await self.streams[path].stream(reader, writer, headers.get("last-event-id"))
+                    break
+
+                body = await self._read_body(reader, writer, headers)
+
+                environ = self._environ(writer, method, path, query, version, headers, body)
+                status, response_headers, payload = await asyncio.get_running_loop().run_in_executor(
+                    self._pool, self._call_app, environ)
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write(self._head(status, response_headers, payload, keep_alive))
+                if method != "HEAD":
+                    writer.write(payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except HttpError as e:
+            writer.write(e.response())
+        except (asyncio.LimitOverrunError, ValueError):
+            # Malformed request line or headers (readline() reports over-long
+            # lines as ValueError)
+            writer.write(HttpError("400 Bad Request").response())
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    async def _read_body(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, headers: dict) -> bytes:
+        """The Content-Length body; chunked bodies are refused (411) rather than
+        misread, and `Expect: 100-continue` clients are told to go ahead"""
+        if "transfer-encoding" in headers:
+            raise HttpError("411 Length Required")
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HttpError("400 Bad Request")
+        if length < 0:
+            raise HttpError("400 Bad Request")
+        if length > MAX_BODY_BYTES:
+            raise HttpError("413 Payload Too Large")
+        if not length:
+            return b""
+        if headers.get("expect", "").lower() == "100-continue":
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            await writer.drain()
+        return await reader.readexactly(length)
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader):
+        line = await reader.readline()
+        if not line:
+            return None
+        parts = line.decode("latin-1").split()
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            raise HttpError("400 Bad Request")
+        method, target, version = parts
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, colon, value = line.decode("latin-1").partition(":")
+            if not colon:
+                raise HttpError("400 Bad Request")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise HttpError("400 Bad Request")
+        path, _, query = target.partition("?")
+        return method, unquote_to_bytes(path).decode("latin-1"), query, version, headers
+
+    def _environ(self, writer, method, path, query, version, headers, body) -> dict:
+        peer = writer.get_extra_info("peername") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": method,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "SERVER_NAME": self.host,
+            "SERVER_PORT": str(self.port),
+            "SERVER_PROTOCOL": version,
+            "REMOTE_ADDR": peer[0],
+            "REMOTE_PORT": str(peer[1]),
+            "CONTENT_TYPE": headers.get("content-type", ""),
+            "CONTENT_LENGTH": str(len(body)) if body else "",
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in headers.items():
+            if name not in ("content-type", "content-length"):
+                environ["HTTP_" + name.upper().replace("-", "_")] = value
+        return environ
+
+    def _call_app(self, environ: dict):
+        """Runs the WSGI app in a worker thread and buffers the whole response"""
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [status, headers]
+            return lambda data: None
+
+        try:
+            result = self.app(environ, start_response)
+            try:
+                payload = b"".join(result)
+            finally:
+                if hasattr(result, "close"):
+                    result.close()
+            return started[0], started[1], payload
+        except Exception as e:
+            print(f"[ERROR] WSGI app: {e}")
+            return "500 INTERNAL SERVER ERROR", [("Content-Type", "text/plain")], b"Internal Server Error"
+
+    @staticmethod
+    def _head(status: str, headers, payload: bytes, keep_alive: bool) -> bytes:
+        lines = [f"HTTP/1.1 {status}"]
+        for name, value in headers:
+            if name.lower() not in ("content-length", "connection"):
+                lines.append(f"{name}: {value}")
+        lines.append(f"Content-Length: {len(payload)}")
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def serve(app, host: str, port: int, streams: Dict[str, Broadcaster], workers: int = WSGI_WORKERS,
+          ready: Optional[threading.Event] = None):
+    """Serve `app` with SSE `streams` ({path: Broadcaster}) on one event loop; blocks.
+    `ready`, if given, is set once the socket is listening"""
+    EventLoopServer(app, host, port, streams, workers, ready).serve_forever()
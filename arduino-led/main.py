@@ -1,5 +1,76 @@
 import sys
+import time
 from arduino.app_utils import *
+from metrics import REGISTRY, InstrumentedBridge
+from ledstate import LED_ORDER, unpack_state
+
+# Time every Bridge.call per method
+Bridge = InstrumentedBridge(Bridge)
+
+# Menu keys -> LED
+TOGGLE_KEYS = {'r': 'led3_r', 'g': 'led3_g', 'b': 'led3_b', 'R': 'led4_r', 'G': 'led4_g', 'B': 'led4_b'}
+BLINK_KEYS = {f"{action}{key}": led for key, led in TOGGLE_KEYS.items() for action in 'is'}
+LED_ICONS = {'led3_r': '🔴', 'led3_g': '🟢', 'led3_b': '🔵', 'led4_r': '🔴', 'led4_g': '🟢', 'led4_b': '🔵'}
+
+# A shadow state older than this is read back from the MCU before the next command
+RECONCILE_SECONDS = 5.0
+
+class LedBoard:
+    """Absolute LED state: applied with set_leds(), read back with get_leds()"""
+
+    def __init__(self):
+        self.on_mask = 0
+        self.blink_mask = 0
+        self.period = 1000
+        self.synced_at = None
+
+    def sync(self):
+        """Read the state from the MCU, returns True if the shadow copy had drifted"""
+        state = unpack_state(int(Bridge.call("get_leds")))
+        drifted = self.synced_at is not None and state != (self.on_mask, self.blink_mask, self.period)
+        self.on_mask, self.blink_mask, self.period = state
+        self.synced_at = time.monotonic()
+        return drifted
+
+    def maybe_sync(self):
+        """Cheap resync: one get_leds call, only when the shadow state is stale"""
+        if self.synced_at is not None and time.monotonic() - self.synced_at < RECONCILE_SECONDS:
+            return
+        try:
+            if self.sync():
+                print("🔄 LED state changed on the board, resynced")
+        except Exception as e:
+            print(f"[warn] LED read-back failed: {e}", file=sys.stderr)
+
+    def apply(self, on_mask, blink_mask):
+        """Send the whole state, skipping the round trip when nothing changes"""
+        if (on_mask, blink_mask) == (self.on_mask, self.blink_mask):
+            return False
+        Bridge.call("set_leds", on_mask, blink_mask, self.period)
+        self.on_mask, self.blink_mask = on_mask, blink_mask
+        self.synced_at = time.monotonic()
+        return True
+
+    def bit(self, led):
+        return 1 << LED_ORDER.index(led)
+
+    def is_on(self, led):
+        return bool(self.on_mask & self.bit(led))
+
+    def mode(self, led):
+        if self.blink_mask & self.bit(led):
+            return "BLINK"
+        return "ON" if self.is_on(led) else "OFF"
+
+    def toggle(self, led):
+        return self.apply(self.on_mask ^ self.bit(led), self.blink_mask)
+
+    def start_blink(self, led):
+        return self.apply(self.on_mask, self.blink_mask | self.bit(led))
+
+    def stop_blink(self, led):
+        # Stopping a blink leaves the LED off, like stop_blink_* in the sketch
+        return self.apply(self.on_mask & ~self.bit(led), self.blink_mask & ~self.bit(led))
 
 def main():
     print("=" * 60)
@@ -24,19 +95,16 @@ def main():
     print("  iG - Start blink LED4_G    sG - Stop blink LED4_G")
     print("  iB - Start blink LED4_B    sB - Stop blink LED4_B")
     print("\n⚙️  Utilities:")
+    print("  l - Read LED state back from the board")
     print("  q - Quit")
     print("\n" + "=" * 60)
     print()
     
-    # Track LED states
-    led_states = {
-        'led3_r': False,
-        'led3_g': False,
-        'led3_b': False,
-        'led4_r': False,
-        'led4_g': False,
-        'led4_b': False,
-    }
+    board = LedBoard()
+    try:
+        board.sync()
+    except Exception as e:
+        print(f"[warn] Could not read LED state from the board: {e}", file=sys.stderr)
     
     try:
         while True:
@@ -44,83 +112,40 @@ def main():
             
             if key == 'q':
                 print("Exiting...")
+                print(REGISTRY.summary())
                 break
-            elif key == 'r':
-                Bridge.call("toggle_led3_r")
-                led_states['led3_r'] = not led_states['led3_r']
-                status = "ON" if led_states['led3_r'] else "OFF"
-                print(f"🔴 LED3_R is now {status}")
-            elif key == 'g':
-                Bridge.call("toggle_led3_g")
-                led_states['led3_g'] = not led_states['led3_g']
-                status = "ON" if led_states['led3_g'] else "OFF"
-                print(f"🟢 LED3_G is now {status}")
-            elif key == 'b':
-                Bridge.call("toggle_led3_b")
-                led_states['led3_b'] = not led_states['led3_b']
-                status = "ON" if led_states['led3_b'] else "OFF"
-                print(f"🔵 LED3_B is now {status}")
-            elif key == 'R':
-                Bridge.call("toggle_led4_r")
-                led_states['led4_r'] = not led_states['led4_r']
-                status = "ON" if led_states['led4_r'] else "OFF"
-                print(f"🔴 LED4_R is now {status}")
-            elif key == 'G':
-                Bridge.call("toggle_led4_g")
-                led_states['led4_g'] = not led_states['led4_g']
-                status = "ON" if led_states['led4_g'] else "OFF"
-                print(f"🟢 LED4_G is now {status}")
-            elif key == 'B':
-                Bridge.call("toggle_led4_b")
-                led_states['led4_b'] = not led_states['led4_b']
-                status = "ON" if led_states['led4_b'] else "OFF"
-                print(f"🔵 LED4_B is now {status}")
-            
-            # Blink commands - LED3
-            elif key == 'ir':
-                Bridge.call("start_blink_led3_r")
-                print("✨ LED3_R blink started")
-            elif key == 'sr':
-                Bridge.call("stop_blink_led3_r")
-                print("⏹️  LED3_R blink stopped")
-            elif key == 'ig':
-                Bridge.call("start_blink_led3_g")
-                print("✨ LED3_G blink started")
-            elif key == 'sg':
-                Bridge.call("stop_blink_led3_g")
-                print("⏹️  LED3_G blink stopped")
-            elif key == 'ib':
-                Bridge.call("start_blink_led3_b")
-                print("✨ LED3_B blink started")
-            elif key == 'sb':
-                Bridge.call("stop_blink_led3_b")
-                print("⏹️  LED3_B blink stopped")
+            elif key == 'l':
+                try:
+                    board.sync()
+                except Exception as e:
+                    print(f"[warn] LED read-back failed: {e}", file=sys.stderr)
+                    print("Last known state:")
+                for led in LED_ORDER:
+                    print(f"{LED_ICONS[led]} {led.upper()}: {board.mode(led)}")
+            elif key in TOGGLE_KEYS:
+                led = TOGGLE_KEYS[key]
+                board.maybe_sync()
+                board.toggle(led)
+                status = "ON" if board.is_on(led) else "OFF"
+                print(f"{LED_ICONS[led]} {led.upper()} is now {status}")
             
-            # Blink commands - LED4
-            elif key == 'iR':
-                Bridge.call("start_blink_led4_r")
-                print("✨ LED4_R blink started")
-            elif key == 'sR':
-                Bridge.call("stop_blink_led4_r")
-                print("⏹️  LED4_R blink stopped")
-            elif key == 'iG':
-                Bridge.call("start_blink_led4_g")
-                print("✨ LED4_G blink started")
-            elif key == 'sG':
-                Bridge.call("stop_blink_led4_g")
-                print("⏹️  LED4_G blink stopped")
-            elif key == 'iB':
-                Bridge.call("start_blink_led4_b")
-                print("✨ LED4_B blink started")
-            elif key == 'sB':
-                Bridge.call("stop_blink_led4_b")
-                print("⏹️  LED4_B blink stopped")
+            # Blink commands
+            elif key in BLINK_KEYS:
+                led = BLINK_KEYS[key]
+                board.maybe_sync()
+                if key[0] == 'i':
+                    changed = board.start_blink(led)
+                    print(f"✨ {led.upper()} blink started" if changed else f"✨ {led.upper()} already blinking")
+                else:
+                    changed = board.stop_blink(led)
+                    print(f"⏹️  {led.upper()} blink stopped" if changed else f"⏹️  {led.upper()} already off")
             
             else:
                 print("❌ Invalid option! Check the menu above.")
                 
     except KeyboardInterrupt:
         print("\nExiting...")
+        print(REGISTRY.summary())
     except Exception as e:
         print(f"[error] {e}", file=sys.stderr)
 
@@ -12,6 +12,15 @@ else
 	exit 1
 fi
 
+# Sketch only: skip the flash when the MCU already has this image, otherwise
+# rewrite only the changed sectors (FLASH_FULL=1 for a full erase/write)
+if [ -z "$ZEPHYR" ] && command -v python3 >/dev/null 2>&1 ; then
+	if [ "$FLASH_FULL" = "1" ] ; then
+		exec python3 $INSTALL_PATH/bin/flashctl.py --full "$SKETCH"
+	fi
+	exec python3 $INSTALL_PATH/bin/flashctl.py "$SKETCH"
+fi
+
 CMDS="reset_config srst_only srst_push_pull; init; reset; halt; flash info 0"
 if [ -z "$ZEPHYR" ] ; then
 	echo
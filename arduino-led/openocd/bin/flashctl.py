@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""Skip-if-identical and delta flashing of the sketch region.
+
+arduino-flash.sh used to erase and rewrite the whole sketch on every start.
+This front end first runs verify_image on the sketch region (the target
+computes the checksum, so nothing is read over SWD). When the region already
+holds the image, the MCU is only reset. Otherwise the region is read back
+with dump_image in the same OpenOCD session, and only the flash sectors that
+differ are erased and written, followed by a verify of the whole image and a
+reset.
+
+Targets:
+    openocd      the board, through bin/openocd and openocd_gpiod.cfg (default)
+    file:PATH    a file-backed fake flash starting at the sketch address, for
+                 trying the delta logic without hardware
+
+The time saved is the number of sectors not erased and written, times the
+per-sector cost measured on earlier writes (kept in --state, per kind of
+target, so file: runs do not skew the board's figures). The report
+also splits the OpenOCD time into verify, read, erase and write phases.
+With FLASHCTL_JSON=1 it is printed as one `FLASHCTL-REPORT {...}` line too,
+for fleet_flash.py.
+
+Usage:
+    python3 flashctl.py sketch.ino.elf-zsk.bin
+    python3 flashctl.py --full sketch.ino.elf-zsk.bin
+    python3 flashctl.py --target file:/tmp/flash.bin sketch.ino.elf-zsk.bin
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional, Tuple
+
+INSTALL_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")
+SKETCH_ADDRESS = 0x80F0000
+SECTOR_SIZE = 0x2000  # STM32U5 flash page
+ERASED = 0xFF
+DEFAULT_STATE = os.environ.get("FLASHCTL_STATE", "/var/cache/arduino-sketch/flashctl.json")
+# Used until a write has been timed on this board
+DEFAULT_SECTOR_SECONDS = 0.25
+DEFAULT_SESSION_SECONDS = 2.0
+
+Run = Tuple[int, bytes]  # (flash address, data starting at a sector boundary)
+
+# OpenOCD's own timing lines, summed per phase
+PHASE_PATTERNS = {
+    "verify": re.compile(r"verified \d+ bytes in ([\d.]+)s"),
+    "read": re.compile(r"dumped \d+ bytes in ([\d.]+)s"),
+    "erase": re.compile(r"erased address \S+ \(length \d+\) in ([\d.]+)s"),
+    "write": re.compile(r"wrote \d+ bytes from file .* in ([\d.]+)s"),
+}
+
+
+def changed_runs(image: bytes, current: bytes, address: int, sector_size: int = SECTOR_SIZE) -> List[Run]:
+    """Contiguous runs of sectors whose content differs from the image"""
+    runs = []
+    start = None
+    sectors = (len(image) + sector_size - 1) // sector_size
+    for i in range(sectors + 1):
+        differs = False
+        if i < sectors:
+            lo, hi = i * sector_size, min((i + 1) * sector_size, len(image))
+            differs = image[lo:hi] != current[lo:hi]
+        if differs and start is None:
+            start = i
+        elif not differs and start is not None:
+            lo, hi = start * sector_size, min(i * sector_size, len(image))
+            runs.append((address + lo, image[lo:hi]))
+            start = None
+    return runs
+
+
+class OpenOcdTarget:
+    """The MCU, through the bundled OpenOCD over linuxgpiod SWD"""
+    kind = "openocd"
+
+    def __init__(self, install_path: str = INSTALL_PATH):
+        self.install_path = install_path
+        self.phases = dict.fromkeys(PHASE_PATTERNS, 0.0)
+
+    def _run(self, cmds: str) -> str:
+        result = subprocess.run(
+            [os.path.join(self.install_path, "bin", "openocd"), "-d2", "-s", self.install_path,
+             "-f", "openocd_gpiod.cfg", "-c", cmds],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        if result.returncode != 0:
+            sys.stdout.write(result.stdout)
+            raise RuntimeError(f"openocd exited with {result.returncode}")
+        for phase, pattern in PHASE_PATTERNS.items():
+            self.phases[phase] += sum(float(t) for t in pattern.findall(result.stdout))
+        return result.stdout
+
+    def probe(self, image_path: str, address: int, size: int) -> Optional[bytes]:
+        """None if the region already holds the image (MCU reset), else its contents"""
+        with tempfile.TemporaryDirectory(prefix="flashctl-") as tmp:
+            dump = os.path.join(tmp, "readback.bin")
+            output = self._run(
+                "reset_config srst_only srst_push_pull; init; reset; halt; flash info 0; "
+                f"if {{[catch {{verify_image {image_path} {address:#x} bin}}]}} "
+                f"{{echo FLASHCTL-DIFFERS; dump_image {dump} {address:#x} {size}}} "
+                "else {echo FLASHCTL-IDENTICAL; reset}; shutdown")
+            if "FLASHCTL-IDENTICAL" in output:
+                return None
+            with open(dump, "rb") as f:
+                return f.read()
+
+    def program(self, runs: List[Run], image_path: str, address: int):
+        """Erase and write the given runs, verify the whole image, reset"""
+        with tempfile.TemporaryDirectory(prefix="flashctl-") as tmp:
+            cmds = "reset_config srst_only srst_push_pull; init; reset; halt"
+            for n, (run_address, data) in enumerate(runs):
+                path = os.path.join(tmp, f"run{n}.bin")
+                with open(path, "wb") as f:
+                    f.write(data)
+                # Separate erase and write, so OpenOCD times each of them
+                cmds += (f"; flash erase_address pad {run_address:#x} {len(data)}"
+                         f"; flash write_image {path} {run_address:#x} bin")
+            cmds += f"; verify_image {image_path} {address:#x} bin; reset; shutdown"
+            self._run(cmds)
+
+    def program_full(self, image_path: str, address: int, zephyr: Optional[str] = None):
+        """The original arduino-flash.sh sequence"""
+        cmds = "reset_config srst_only srst_push_pull; init; reset; halt; flash info 0"
+        if zephyr:
+            cmds += f"; flash write_image erase {zephyr}"
+        cmds += f"; flash write_image erase {image_path} {address:#x} bin; reset; shutdown"
+        self._run(cmds)
+
+
+class FileTarget:
+    """Fake flash backed by a file that starts at `base`; counts sector erases"""
+    kind = "file"
+
+    def __init__(self, path: str, base: int = SKETCH_ADDRESS, sector_size: int = SECTOR_SIZE):
+        self.path = path
+        self.base = base
+        self.sector_size = sector_size
+        self.erased_sectors = 0
+        self.resets = 0
+        self.phases = dict.fromkeys(PHASE_PATTERNS, 0.0)
+
+    def _read(self) -> bytearray:
+        try:
+            with open(self.path, "rb") as f:
+                return bytearray(f.read())
+        except FileNotFoundError:
+            return bytearray()
+
+    def _write_flash(self, address: int, data: bytes):
+        """flash write_image erase: erase every sector touched, then write"""
+        flash = self._read()
+        offset = address - self.base
+        end = offset + len(data)
+        lo = offset - offset % self.sector_size
+        hi = -(-end // self.sector_size) * self.sector_size
+        start = time.monotonic()
+        if len(flash) < hi:
+            flash.extend([ERASED] * (hi - len(flash)))
+        flash[lo:hi] = bytes([ERASED]) * (hi - lo)
+        self.erased_sectors += (hi - lo) // self.sector_size
+        erased = time.monotonic()
+        flash[offset:end] = data
+        with open(self.path, "wb") as f:
+            f.write(flash)
+        self.phases["erase"] += erased - start
+        self.phases["write"] += time.monotonic() - erased
+
+    def probe(self, image_path: str, address: int, size: int) -> Optional[bytes]:
+        start = time.monotonic()
+        offset = address - self.base
+        current = bytes(self._read()[offset:offset + size])
+        with open(image_path, "rb") as f:
+            identical = current == f.read()
+        self.phases["verify"] += time.monotonic() - start
+        if identical:
+            self.resets += 1
+            return None
+        return current.ljust(size, bytes([ERASED]))
+
+    def program(self, runs: List[Run], image_path: str, address: int):
+        for run_address, data in runs:
+            self._write_flash(run_address, data)
+        if self.probe(image_path, address, os.path.getsize(image_path)) is not None:
+            raise RuntimeError("verify failed after programming")
+
+    def program_full(self, image_path: str, address: int, zephyr: Optional[str] = None):
+        with open(image_path, "rb") as f:
+            self._write_flash(address, f.read())
+        self.resets += 1
+
+
+def _load_state(path: str) -> dict:
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def _save_state(path: str, state: dict):
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(state, f)
+    except OSError as e:
+        print(f"[FLASH] Could not save timing state: {e}")
+
+
+def flash(target, image_path: str, address: int = SKETCH_ADDRESS, sector_size: int = SECTOR_SIZE,
+          full: bool = False, state_path: str = DEFAULT_STATE) -> dict:
+    """Flash `image_path` with as little erasing as possible; returns a report"""
+    with open(image_path, "rb") as f:
+        image = f.read()
+    sectors = (len(image) + sector_size - 1) // sector_size
+    # {target kind: timings}; anything else (e.g. an older flat file) is ignored
+    state = _load_state(state_path)
+    kind = getattr(target, "kind", type(target).__name__)
+    timings = state.get(kind)
+    if not isinstance(timings, dict):
+        timings = {}
+    sector_seconds = timings.get("sector_seconds", DEFAULT_SECTOR_SECONDS)
+    session_seconds = timings.get("session_seconds", DEFAULT_SESSION_SECONDS)
+    report = {"image": image_path, "bytes": len(image), "sectors": sectors, "written": sectors}
+
+    start = time.monotonic()
+    if full:
+        target.program_full(image_path, address)
+        if sectors:
+            measured = max(time.monotonic() - start - session_seconds, 0.0) / sectors
+            sector_seconds = 0.7 * sector_seconds + 0.3 * measured
+        report["mode"] = "full"
+    else:
+        current = target.probe(image_path, address, len(image))
+        probe_seconds = time.monotonic() - start
+        session_seconds = 0.7 * session_seconds + 0.3 * probe_seconds
+        if current is None:
+            report.update(mode="skipped", written=0)
+        else:
+            runs = changed_runs(image, current, address, sector_size)
+            written = sum(-(-len(data) // sector_size) for _, data in runs)
+            write_start = time.monotonic()
+            target.program(runs, image_path, address)
+            if written:
+                # Program session minus its fixed cost, per sector
+                measured = max(time.monotonic() - write_start - session_seconds, 0.0) / written
+                sector_seconds = 0.7 * sector_seconds + 0.3 * measured
+            report.update(mode="delta", written=written, runs=len(runs))
+    elapsed = time.monotonic() - start
+
+    phases = getattr(target, "phases", {})
+    report.update(seconds=round(elapsed, 2),
+                  phases={phase: round(t, 3) for phase, t in phases.items()},
+                  full_estimate=round(session_seconds + sectors * sector_seconds, 2),
+                  saved=round((sectors - report["written"]) * sector_seconds, 2))
+    state = {k: v for k, v in state.items() if isinstance(v, dict)}
+    state[kind] = {"sector_seconds": sector_seconds, "session_seconds": session_seconds}
+    _save_state(state_path, state)
+    return report
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Flash the sketch only where it changed")
+    parser.add_argument("image", help="sketch .elf-zsk.bin")
+    parser.add_argument('--address', type=lambda v: int(v, 0), default=SKETCH_ADDRESS)
+    parser.add_argument('--sector-size', type=lambda v: int(v, 0), default=SECTOR_SIZE)
+    parser.add_argument('--target', default="openocd", help="openocd, or file:PATH for a fake flash")
+    parser.add_argument('--full', action='store_true', help="always erase and write the whole image")
+    parser.add_argument('--state', default=DEFAULT_STATE, help="where measured flash timings are kept")
+    args = parser.parse_args(argv)
+
+    if args.target.startswith("file:"):
+        target = FileTarget(args.target[len("file:"):], args.address, args.sector_size)
+    elif args.target == "openocd":
+        target = OpenOcdTarget()
+    else:
+        parser.error(f"unknown target {args.target}")
+
+    try:
+        report = flash(target, args.image, args.address, args.sector_size, args.full, args.state)
+    except (OSError, RuntimeError) as e:
+        print(f"ERROR: flashing failed: {e}", file=sys.stderr)
+        return 1
+
+    if report["mode"] == "skipped":
+        print(f"[FLASH] {report['image']} already on the MCU ({report['sectors']} sectors), "
+              f"reset only in {report['seconds']:.1f}s, ~{report['saved']:.1f}s saved")
+    elif report["mode"] == "delta":
+        print(f"[FLASH] Wrote {report['written']}/{report['sectors']} sectors in {report['runs']} runs "
+              f"in {report['seconds']:.1f}s, ~{report['saved']:.1f}s saved "
+              f"(full flash ~{report['full_estimate']:.1f}s)")
+    else:
+        print(f"[FLASH] Full flash of {report['sectors']} sectors in {report['seconds']:.1f}s")
+    if os.environ.get("FLASHCTL_JSON") == "1":
+        print("FLASHCTL-REPORT " + json.dumps(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -20,9 +20,15 @@ bool blinking_led4_r = false;
 bool blinking_led4_g = false;
 bool blinking_led4_b = false;
 
-// Timing for blink (1 second ON, 1 second OFF)
+// Same order as the bits of set_leds() masks: LED_BUILTIN + i
+bool* const ledStates[6] = {&led3_r_state, &led3_g_state, &led3_b_state,
+                            &led4_r_state, &led4_g_state, &led4_b_state};
+bool* const blinkFlags[6] = {&blinking_led3_r, &blinking_led3_g, &blinking_led3_b,
+                             &blinking_led4_r, &blinking_led4_g, &blinking_led4_b};
+
+// Timing for blink (1 second ON, 1 second OFF by default, see set_leds)
 unsigned long previousMillis = 0;
-const long blinkInterval = 1000;  // 1 second
+long blinkInterval = 1000;  // 1 second
 bool blinkState = false;
 
 void setup() {
@@ -68,6 +74,10 @@ void setup() {
   Bridge.provide("stop_blink_led4_r", stop_blink_led4_r);
   Bridge.provide("stop_blink_led4_g", stop_blink_led4_g);
   Bridge.provide("stop_blink_led4_b", stop_blink_led4_b);
+
+  // Absolute state: whole scene in one call, and read back
+  Bridge.provide("set_leds", set_leds);
+  Bridge.provide("get_leds", get_leds);
 }
 
 void loop() {
@@ -169,30 +179,64 @@ void start_blink_led4_b() {
 // Blink stop functions
 void stop_blink_led3_r() {
   blinking_led3_r = false;
+  led3_r_state = false;
   digitalWrite(LED_BUILTIN, HIGH);  // Turn off LED
 }
 
 void stop_blink_led3_g() {
   blinking_led3_g = false;
+  led3_g_state = false;
   digitalWrite(LED_BUILTIN + 1, HIGH);  // Turn off LED
 }
 
 void stop_blink_led3_b() {
   blinking_led3_b = false;
+  led3_b_state = false;
   digitalWrite(LED_BUILTIN + 2, HIGH);  // Turn off LED
 }
 
 void stop_blink_led4_r() {
   blinking_led4_r = false;
+  led4_r_state = false;
   digitalWrite(LED_BUILTIN + 3, HIGH);  // Turn off LED
 }
 
 void stop_blink_led4_g() {
   blinking_led4_g = false;
+  led4_g_state = false;
   digitalWrite(LED_BUILTIN + 4, HIGH);  // Turn off LED
 }
 
 void stop_blink_led4_b() {
   blinking_led4_b = false;
+  led4_b_state = false;
   digitalWrite(LED_BUILTIN + 5, HIGH);  // Turn off LED
 }
+
+// Set all six LEDs at once: bit i of on_mask / blink_mask is LED_BUILTIN + i
+// (LED3_R, LED3_G, LED3_B, LED4_R, LED4_G, LED4_B). period_ms > 0 sets the
+// blink interval shared by all blinking LEDs.
+void set_leds(int on_mask, int blink_mask, int period_ms) {
+  if (period_ms > 0) {
+    blinkInterval = period_ms;
+  }
+  for (int i = 0; i < 6; i++) {
+    *blinkFlags[i] = (blink_mask >> i) & 1;
+    *ledStates[i] = (on_mask >> i) & 1;
+    if (!*blinkFlags[i]) {
+      digitalWrite(LED_BUILTIN + i, *ledStates[i] ? LOW : HIGH);
+    }
+  }
+}
+
+// Read back the whole LED state in one value (see ledstate.py):
+// bits 0-5 on mask, bits 6-11 blink mask, bits 12+ blink interval in ms
+int get_leds() {
+  int on_mask = 0;
+  int blink_mask = 0;
+  for (int i = 0; i < 6; i++) {
+    if (*ledStates[i]) on_mask |= 1 << i;
+    if (*blinkFlags[i]) blink_mask |= 1 << i;
+  }
+  return ((int)blinkInterval << 12) | (blink_mask << 6) | on_mask;
+}
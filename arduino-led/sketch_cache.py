@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""Content-addressed cache of compiled sketches.
+
+`arduino-cli compile` takes a long time on the board, and start.sh runs it on
+every container start. The cache key is a SHA-256 over the FQBN, the
+installed core version, the arduino-cli version and every sketch source file
+(*.ino, *.h, *.c, *.cpp, sketch.yaml, ...). A hit copies the cached
+*.elf-zsk.bin (and the other build outputs) into the output directory
+without compiling. A miss compiles and stores the result under the key.
+
+Entries are directories named after the key, holding the build outputs plus
+meta.json. A hit touches the entry, and pruning evicts the least recently
+used entries first. Because entries are keyed by content, one cache
+directory can be shared by every app on the board.
+
+Usage:
+    python3 sketch_cache.py build /app/sketch [--fqbn arduino:zephyr:unoq] [--output-dir DIR]
+    python3 sketch_cache.py key /app/sketch
+    python3 sketch_cache.py list
+    python3 sketch_cache.py prune [--max-entries 8] [--max-mb 64]
+    python3 sketch_cache.py clear
+"""
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+DEFAULT_FQBN = "arduino:zephyr:unoq"
+DEFAULT_ROOT = os.environ.get("SKETCH_CACHE_DIR", "/var/cache/arduino-sketch")
+DEFAULT_MAX_ENTRIES = 8
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Files that affect the build; everything else in the sketch dir (outputs,
+# frames.bin, editor files) is ignored
+SOURCE_SUFFIXES = (".ino", ".pde", ".h", ".hpp", ".c", ".cpp", ".S", ".s")
+SOURCE_NAMES = ("sketch.yaml", "sketch.json")
+# Build outputs worth keeping, the flashed image first
+OUTPUT_SUFFIXES = (".elf-zsk.bin", ".bin", ".elf", ".hex", ".map")
+META_FILE = "meta.json"
+
+
+def sketch_sources(sketch_dir: str) -> List[str]:
+    """Relative paths of the files that go into the build, sorted"""
+    sources = []
+    for dirpath, dirnames, filenames in os.walk(sketch_dir):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith(".") and d != "build")
+        for name in filenames:
+            if name.endswith(SOURCE_SUFFIXES) or name in SOURCE_NAMES:
+                sources.append(os.path.relpath(os.path.join(dirpath, name), sketch_dir))
+    return sorted(sources)
+
+
+def _data_dir() -> str:
+    return os.environ.get("ARDUINO_DIRECTORIES_DATA", os.path.expanduser("~/.arduino15"))
+
+
+def toolchain_versions(fqbn: str) -> Dict[str, str]:
+    """Installed core version for the FQBN's platform and the arduino-cli version"""
+    vendor, arch = fqbn.split(":")[:2]
+    hardware = os.path.join(_data_dir(), "packages", vendor, "hardware", arch)
+    try:
+        core = ",".join(sorted(os.listdir(hardware)))
+    except OSError:
+        core = "unknown"
+    try:
+        cli = subprocess.run(["arduino-cli", "version"], capture_output=True, text=True,
+                             timeout=30).stdout.strip()
+    except (OSError, subprocess.TimeoutExpired):
+        cli = "unknown"
+    return {"core": f"{vendor}:{arch}@{core}", "cli": cli}
+
+
+def cache_key(sketch_dir: str, fqbn: str = DEFAULT_FQBN, versions: Optional[Dict[str, str]] = None) -> str:
+    """SHA-256 of the FQBN, toolchain versions and sketch sources"""
+    versions = versions or toolchain_versions(fqbn)
+    digest = hashlib.sha256()
+    digest.update(f"fqbn={fqbn}\ncore={versions['core']}\ncli={versions['cli']}\n".encode())
+    for rel in sketch_sources(sketch_dir):
+        with open(os.path.join(sketch_dir, rel), "rb") as f:
+            data = f.read()
+        digest.update(f"{rel}\0{len(data)}\0".encode())
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def _outputs(directory: str) -> List[str]:
+    return sorted(name for name in os.listdir(directory) if name.endswith(OUTPUT_SUFFIXES))
+
+
+def _entry_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+class SketchCache:
+    """Build outputs stored under <root>/<key>/, evicted least recently used first"""
+
+    def __init__(self, root: str = DEFAULT_ROOT):
+        self.root = root
+
+    @contextmanager
+    def _locked(self):
+        """Serializes stores and prunes between containers sharing the cache"""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Entry directory for `key`, marked as just used, or None"""
+        path = self.path(key)
+        meta = os.path.join(path, META_FILE)
+        if not os.path.exists(meta):
+            return None
+        os.utime(meta)
+        return path
+
+    def store(self, key: str, build_dir: str, meta: Dict) -> str:
+        """Copy the build outputs of `build_dir` into the cache"""
+        outputs = _outputs(build_dir)
+        if not any(name.endswith(".elf-zsk.bin") for name in outputs):
+            raise FileNotFoundError(f"No .elf-zsk.bin in {build_dir}")
+        with self._locked():
+            path = self.path(key)
+            if os.path.exists(os.path.join(path, META_FILE)):
+                return path
+            staging = tempfile.mkdtemp(prefix=".store-", dir=self.root)
+            for name in outputs:
+                shutil.copy2(os.path.join(build_dir, name), staging)
+            with open(os.path.join(staging, META_FILE), "w") as f:
+                json.dump(dict(meta, key=key, outputs=outputs, stored=time.time()), f, indent=1)
+            shutil.rmtree(path, ignore_errors=True)
+            os.rename(staging, path)
+        return path
+
+    def entries(self) -> List[Dict]:
+        """All entries, most recently used first"""
+        result = []
+        if not os.path.isdir(self.root):
+            return result
+        for key in os.listdir(self.root):
+            meta_path = os.path.join(self.root, key, META_FILE)
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+                meta["last_used"] = os.path.getmtime(meta_path)
+                meta["size"] = _entry_size(os.path.join(self.root, key))
+            except (OSError, ValueError):
+                continue
+            result.append(meta)
+        return sorted(result, key=lambda e: e["last_used"], reverse=True)
+
+    def prune(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES,
+              keep: Optional[str] = None) -> List[str]:
+        """Evict least recently used entries beyond the limits, returns evicted keys.
+        `keep` (e.g. the entry just stored) is never evicted, even if it alone
+        is over the limits; it still counts towards them"""
+        evicted = []
+        with self._locked():
+            kept = 0
+            total = 0
+            entries = self.entries()
+            # The kept entry first, so it takes its share of the budget
+            entries.sort(key=lambda e: e["key"] != keep)
+            for entry in entries:
+                if entry["key"] == keep or kept < max_entries and total + entry["size"] <= max_bytes:
+                    kept += 1
+                    total += entry["size"]
+                    continue
+                shutil.rmtree(self.path(entry["key"]), ignore_errors=True)
+                evicted.append(entry["key"])
+            # Leftovers of interrupted stores
+            for name in os.listdir(self.root):
+                if name.startswith(".store-"):
+                    shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+        return evicted
+
+    def clear(self):
+        with self._locked():
+            for name in os.listdir(self.root):
+                if name != ".lock":
+                    shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    def build(self, sketch_dir: str, fqbn: str = DEFAULT_FQBN, output_dir: Optional[str] = None) -> str:
+        """Compile `sketch_dir` unless the cache has it; returns the .elf-zsk.bin path"""
+        output_dir = output_dir or sketch_dir
+        start = time.monotonic()
+        versions = toolchain_versions(fqbn)
+        key = cache_key(sketch_dir, fqbn, versions)
+
+        entry = self.lookup(key)
+        if entry is not None:
+            print(f"[CACHE] Hit {key[:12]} ({time.monotonic() - start:.2f}s), skipping compile")
+        else:
+            print(f"[CACHE] Miss {key[:12]}, compiling for {fqbn}...")
+            with tempfile.TemporaryDirectory(prefix="sketch-build-") as build_dir:
+                subprocess.run(["arduino-cli", "compile", "-b", fqbn, "--output-dir", build_dir, sketch_dir],
+                               check=True)
+                compile_seconds = time.monotonic() - start
+                entry = self.store(key, build_dir, {
+                    "fqbn": fqbn,
+                    "sketch": os.path.abspath(sketch_dir),
+                    "sources": sketch_sources(sketch_dir),
+                    "compile_seconds": round(compile_seconds, 1),
+                    **versions
+                })
+            print(f"[CACHE] Stored {key[:12]} (compiled in {compile_seconds:.1f}s)")
+            evicted = self.prune(keep=key)
+            if evicted:
+                print(f"[CACHE] Evicted {len(evicted)} least recently used entries")
+
+        os.makedirs(output_dir, exist_ok=True)
+        for name in _outputs(entry):
+            shutil.copy2(os.path.join(entry, name), output_dir)
+        image = next(name for name in _outputs(entry) if name.endswith(".elf-zsk.bin"))
+        return os.path.join(output_dir, image)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Content-addressed cache of compiled sketches")
+    parser.add_argument('--cache-dir', default=DEFAULT_ROOT, help="cache root (env SKETCH_CACHE_DIR)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="compile a sketch unless it is cached")
+    build.add_argument("sketch_dir")
+    build.add_argument('--fqbn', default=DEFAULT_FQBN)
+    build.add_argument('--output-dir', help="where to put the outputs (default: the sketch dir)")
+
+    key = commands.add_parser("key", help="print the cache key of a sketch")
+    key.add_argument("sketch_dir")
+    key.add_argument('--fqbn', default=DEFAULT_FQBN)
+
+    commands.add_parser("list", help="list entries, most recently used first")
+
+    prune = commands.add_parser("prune", help="evict least recently used entries")
+    prune.add_argument('--max-entries', type=int, default=DEFAULT_MAX_ENTRIES)
+    prune.add_argument('--max-mb', type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024))
+
+    commands.add_parser("clear", help="remove every entry")
+    args = parser.parse_args(argv)
+
+    cache = SketchCache(args.cache_dir)
+    if args.command == "build":
+        try:
+            print(cache.build(args.sketch_dir, args.fqbn, args.output_dir))
+        except subprocess.CalledProcessError as e:
+            print(f"ERROR: compile failed ({e.returncode})", file=sys.stderr)
+            return 1
+    elif args.command == "key":
+        print(cache_key(args.sketch_dir, args.fqbn))
+    elif args.command == "list":
+        entries = cache.entries()
+        for e in entries:
+            used = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(e["last_used"]))
+            print(f"{e['key'][:12]}  {used}  {e['size'] / 1024:8.1f} KiB  {e.get('fqbn', '?')}  {e.get('sketch', '?')}")
+        print(f"{len(entries)} entries, {sum(e['size'] for e in entries) / 1024:.1f} KiB in {cache.root}")
+    elif args.command == "prune":
+        evicted = cache.prune(args.max_entries, int(args.max_mb * 1024 * 1024))
+        print(f"Evicted {len(evicted)} entries")
+    elif args.command == "clear":
+        cache.clear()
+        print(f"Cleared {cache.root}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,40 @@
+"""ledstate packing shared with sketch.ino. Run from arduino-led/:
+
+    python3 -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from ledstate import LED_ORDER, from_masks, pack_state, to_masks, unpack_state
+
+
+class PackTest(unittest.TestCase):
+
+    def test_layout(self):
+        # on: led3_r, led4_b; blink: led3_g; period 500 ms
+        self.assertEqual(pack_state(0b100001, 0b000010, 500), 500 << 12 | 0b000010 << 6 | 0b100001)
+
+    def test_round_trip(self):
+        for state in ((0, 0, 0), (0b111111, 0b111111, 1000), (0b010101, 0b101010, 65535)):
+            self.assertEqual(unpack_state(pack_state(*state)), state)
+
+    def test_masks_do_not_spill_into_each_other(self):
+        self.assertEqual(unpack_state(pack_state(0xFFF, 0xFFF, 250)), (0b111111, 0b111111, 250))
+
+
+class MaskTest(unittest.TestCase):
+
+    def test_bit_order_follows_led_order(self):
+        leds = dict.fromkeys(LED_ORDER, False)
+        blinks = dict.fromkeys(LED_ORDER, False)
+        leds["led3_r"] = leds["led4_g"] = True
+        blinks["led4_b"] = True
+        self.assertEqual(to_masks(leds, blinks), (0b010001, 0b100000))
+        self.assertEqual(from_masks(0b010001, 0b100000), (leds, blinks))
+
+
+if __name__ == "__main__":
+    unittest.main()
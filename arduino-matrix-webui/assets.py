@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""In-memory static assets for the web UIs, precompressed, with strong ETags.
+
+Every file is read once at startup. Text files (index.html, ...) also get a
+gzip variant and, if the `brotli` module is installed, a brotli variant,
+each kept only if it is smaller than the original. Every variant has a strong
+ETag (a SHA-256 prefix of its bytes). A request then picks the smallest
+variant the client accepts, and answers If-None-Match with 304. No disk
+access, stat() or compression happens per request.
+
+index.html is sent with `Cache-Control: no-cache`, so the browser
+revalidates it on every load (cheap: a 304 without a body). Other assets
+are cached for ASSET_MAX_AGE seconds (default one week). Files changed on
+disk are picked up on the next restart.
+
+    assets = AssetStore(BASE_DIR, ["index.html", "red.png"])
+    status, headers, body = assets.respond("red.png", environ)   # any WSGI server
+    return assets.flask_response("index.html")                   # in a Flask view
+
+`python3 assets.py [DIR]` prints the variants and ETags of DIR's files.
+"""
+import gzip
+import hashlib
+import os
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ASSET_MAX_AGE = int(os.getenv("ASSET_MAX_AGE", str(7 * 24 * 3600)))
+INDEX = "index.html"
+
+CONTENT_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".json": "application/json",
+    ".svg": "image/svg+xml",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".ico": "image/x-icon",
+}
+# Already-compressed formats (png, jpg) gain nothing from another pass
+COMPRESSIBLE = (".html", ".css", ".js", ".json", ".svg", ".ico")
+
+Headers = List[Tuple[str, str]]
+
+
+def _etag(data: bytes) -> str:
+    return '"' + hashlib.sha256(data).hexdigest()[:32] + '"'
+
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """Accept-Encoding as {coding: q}; codings with q=0 are left out"""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted[coding] = q
+    return accepted
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match uses the weak comparison: W/ prefixes are ignored"""
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class Asset:
+    """One file: the identity bytes plus any smaller encoded variants"""
+    __slots__ = ("name", "content_type", "cache_control", "variants")
+
+    def __init__(self, name: str, data: bytes, cache_control: str):
+        self.name = name
+        self.content_type = CONTENT_TYPES.get(os.path.splitext(name)[1].lower(), "application/octet-stream")
+        self.cache_control = cache_control
+        # {coding: (body, etag)}, smallest first, identity always present
+        variants = {"identity": (data, _etag(data))}
+        if name.lower().endswith(COMPRESSIBLE):
+            encoded = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                encoded["br"] = brotli.compress(data, quality=11)
+            for coding, body in encoded.items():
+                if len(body) < len(data):
+                    variants[coding] = (body, _etag(body))
+        self.variants = dict(sorted(variants.items(), key=lambda v: len(v[1][0])))
+
+    def select(self, accept_encoding: str) -> Tuple[str, bytes, str]:
+        """(coding, body, etag) of the smallest variant the client accepts"""
+        accepted = accepted_encodings(accept_encoding) if accept_encoding else {}
+        for coding, (body, etag) in self.variants.items():
+            if coding == "identity" or coding in accepted:
+                return coding, body, etag
+        body, etag = self.variants["identity"]
+        return "identity", body, etag
+
+
+class AssetStore:
+    """The allowed files of one web UI, loaded and encoded once"""
+
+    def __init__(self, base_dir: str, names: Iterable[str], max_age: int = ASSET_MAX_AGE):
+        self.base_dir = base_dir
+        self.assets: Dict[str, Asset] = {}
+        for name in names:
+            try:
+                with open(os.path.join(base_dir, name), "rb") as f:
+                    data = f.read()
+            except OSError as e:
+                print(f"[WARN] Asset {name} not loaded: {e}")
+                continue
+            cache_control = "no-cache" if name == INDEX else f"public, max-age={max_age}"
+            self.assets[name] = Asset(name, data, cache_control)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.assets
+
+    def respond(self, name: str, environ: dict) -> Tuple[str, Headers, bytes]:
+        """(status, headers, body) for GET/HEAD of `name`; 404 if it is not loaded"""
+        asset = self.assets.get(name)
+        if asset is None:
+            return "404 NOT FOUND", [("Content-Type", "text/plain")], b"Not Found"
+        if environ.get("REQUEST_METHOD", "GET") not in ("GET", "HEAD"):
+            return "405 METHOD NOT ALLOWED", [("Content-Type", "text/plain"), ("Allow", "GET, HEAD")], \
+                b"Method Not Allowed"
+
+        coding, body, etag = asset.select(environ.get("HTTP_ACCEPT_ENCODING", ""))
+        headers = [("ETag", etag), ("Cache-Control", asset.cache_control)]
+        if len(asset.variants) > 1:
+            headers.append(("Vary", "Accept-Encoding"))
+        if_none_match = environ.get("HTTP_IF_NONE_MATCH")
+        if if_none_match and etag_matches(if_none_match, etag):
+            return "304 NOT MODIFIED", headers, b""
+        headers.append(("Content-Type", asset.content_type))
+        if coding != "identity":
+            headers.append(("Content-Encoding", coding))
+        return "200 OK", headers, body
+
+    def wsgi(self, environ: dict, start_response):
+        """WSGI app serving / as index.html and every other loaded file by name"""
+        path = environ.get("PATH_INFO") or "/"
+        status, headers, body = self.respond(INDEX if path == "/" else path.lstrip("/"), environ)
+        start_response(status, headers)
+        return [body]
+
+    def flask_response(self, name: str):
+        """respond() for the current Flask request"""
+        from flask import Response, request
+        status, headers, body = self.respond(name, request.environ)
+        return Response(body, status=status, headers=headers)
+
+
+def main(argv):
+    base_dir = argv[0] if argv else os.path.dirname(os.path.realpath(__file__))
+    names = sorted(n for n in os.listdir(base_dir)
+                   if os.path.splitext(n)[1].lower() in CONTENT_TYPES and os.path.isfile(os.path.join(base_dir, n)))
+    store = AssetStore(base_dir, names)
+    for name, asset in store.assets.items():
+        variants = "  ".join(f"{coding} {len(body)} B {etag}" for coding, (body, etag) in asset.variants.items())
+        print(f"{name:20} {asset.content_type:26} {variants}")
+    if brotli is None:
+        print("(brotli not installed: gzip variants only)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
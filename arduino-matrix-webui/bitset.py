@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""LED matrix state held as a single integer.
+
+LED i = y * cols + x is bit i, which is the packed layout of updateDisplay()
+in sketch.ino: the 13-byte frame is the integer in little-endian order, and
+word w of set_frame is bits 32*w .. 32*w+31. Row and column operations are
+shifts and masks on that integer, so no per-pixel Python loop is needed.
+
+    state = MatrixBitset()
+    state.toggle(5, 3)
+    state.scroll(dx=1)                 # whole matrix, wrapping around
+    set_frame(*state.words())
+    state.rows()                       # [[0, 1, ...], ...], built on demand
+
+Each mutation bumps `version`, which callers use as a cheap change marker
+(cache keys, read-back races). A process can keep any number of instances.
+
+diff_words() and frame_update() compare two word lists and pick the smallest
+Bridge call (set_led, set_frame_word or set_frame) that turns one into the
+other.
+"""
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+MATRIX_COLS = 13
+MATRIX_ROWS = 8
+
+
+class MatrixBitset:
+    """cols x rows LED matrix as one int, bit y * cols + x"""
+    __slots__ = ("cols", "rows_count", "size", "mask", "value", "version",
+                 "_row_mask", "_repeat", "_rows_version", "_rows")
+
+    def __init__(self, cols: int = MATRIX_COLS, rows: int = MATRIX_ROWS, value: int = 0):
+        self.cols = cols
+        self.rows_count = rows
+        self.size = cols * rows
+        self.mask = (1 << self.size) - 1
+        self._row_mask = (1 << cols) - 1
+        # 1 at the first bit of every row: multiplying a row pattern by it
+        # repeats the pattern on all rows
+        self._repeat = sum(1 << (r * cols) for r in range(rows))
+        self.value = value & self.mask
+        self.version = 0
+        self._rows_version = -1
+        self._rows = None
+
+    def _index(self, x: int, y: int) -> int:
+        if not (0 <= x < self.cols and 0 <= y < self.rows_count):
+            raise IndexError(f"({x},{y}) outside {self.cols}x{self.rows_count}")
+        return y * self.cols + x
+
+    def _columns(self, first: int, last: int) -> int:
+        """Mask of columns first..last-1 on every row"""
+        first, last = max(first, 0), min(last, self.cols)
+        if first >= last:
+            return 0
+        return (((1 << (last - first)) - 1) << first) * self._repeat
+
+    def _store(self, value: int):
+        value &= self.mask
+        if value != self.value:
+            self.value = value
+            self.version += 1
+
+    # Single pixels
+
+    def get(self, x: int, y: int) -> int:
+        return (self.value >> self._index(x, y)) & 1
+
+    def set(self, x: int, y: int, on: int = 1):
+        bit = 1 << self._index(x, y)
+        self._store(self.value | bit if on else self.value & ~bit)
+
+    def toggle(self, x: int, y: int) -> int:
+        """Flip one LED and return its new state"""
+        i = self._index(x, y)
+        self._store(self.value ^ (1 << i))
+        return (self.value >> i) & 1
+
+    # Whole matrix
+
+    def clear(self):
+        self._store(0)
+
+    def fill(self):
+        self._store(self.mask)
+
+    def invert(self):
+        self._store(~self.value)
+
+    def load(self, value: int):
+        """Replace the whole state, e.g. with a frame read back from the MCU"""
+        self._store(value)
+
+    def shift(self, dx: int = 0, dy: int = 0):
+        """Move the image right by dx and down by dy; pixels pushed off are lost"""
+        self._store(self._moved(self.value, dx, dy, wrap=False))
+
+    def scroll(self, dx: int = 0, dy: int = 0):
+        """Like shift(), but pixels pushed off one edge come back on the other"""
+        self._store(self._moved(self.value, dx % self.cols, dy % self.rows_count, wrap=True))
+
+    def _moved(self, value: int, dx: int, dy: int, wrap: bool) -> int:
+        cols, size = self.cols, self.size
+        if dx > 0:
+            moved = (value << dx) & self._columns(dx, cols)
+            if wrap:
+                moved |= (value >> (cols - dx)) & self._columns(0, dx)
+            value = moved
+        elif dx < 0:
+            value = (value >> -dx) & self._columns(0, cols + dx)
+        if dy > 0:
+            moved = (value << (dy * cols)) & self.mask
+            if wrap:
+                moved |= value >> (size - dy * cols)
+            value = moved
+        elif dy < 0:
+            value >>= -dy * cols
+        return value
+
+    def blit(self, sprite: "MatrixBitset", x: int = 0, y: int = 0, op: str = "copy"):
+        """Draw `sprite` with its top-left corner at (x, y), clipped to the matrix.
+        op: "copy" replaces the covered area, "or" adds lit pixels, "xor" flips them"""
+        if op not in ("copy", "or", "xor"):
+            raise ValueError(f"Unknown blit op: {op}")
+        image = 0
+        area = 0
+        visible = self._columns(x, x + sprite.cols) & self._row_mask
+        for row in range(sprite.rows_count):
+            ty = y + row
+            if not 0 <= ty < self.rows_count:
+                continue
+            bits = (sprite.value >> (row * sprite.cols)) & sprite._row_mask
+            bits = (bits << x if x >= 0 else bits >> -x) & visible
+            image |= bits << (ty * self.cols)
+            area |= visible << (ty * self.cols)
+        if op == "copy":
+            self._store((self.value & ~area) | image)
+        elif op == "or":
+            self._store(self.value | image)
+        else:
+            self._store(self.value ^ image)
+
+    def popcount(self) -> int:
+        """Number of lit LEDs"""
+        return bin(self.value).count("1")
+
+    # Packed and JSON views
+
+    def words(self) -> List[int]:
+        """The uint32 words taken by set_frame"""
+        return [(self.value >> (32 * w)) & 0xFFFFFFFF for w in range((self.size + 31) // 32)]
+
+    def load_words(self, words: Iterable[int]):
+        self._store(sum((w & 0xFFFFFFFF) << (32 * i) for i, w in enumerate(words)))
+
+    def to_bytes(self) -> bytes:
+        """The packed frame, LSB-first (13 bytes for 13x8)"""
+        return self.value.to_bytes((self.size + 7) // 8, "little")
+
+    def load_bytes(self, data: bytes):
+        self._store(int.from_bytes(data, "little"))
+
+    def rows(self) -> List[List[int]]:
+        """rows x cols list of 0/1, built only when asked for and reused until
+        the next change; callers must not modify it"""
+        if self._rows_version != self.version:
+            bits = bin(self.value)[2:].zfill(self.size)[::-1]
+            cols = self.cols
+            self._rows = [[int(b) for b in bits[r * cols:(r + 1) * cols]] for r in range(self.rows_count)]
+            self._rows_version = self.version
+        return self._rows
+
+    def __eq__(self, other):
+        if not isinstance(other, MatrixBitset):
+            return NotImplemented
+        return (self.cols, self.rows_count, self.value) == (other.cols, other.rows_count, other.value)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"MatrixBitset({self.cols}x{self.rows_count}, {self.to_bytes().hex()})"
+
+
+def diff_words(old_words: Sequence[int], new_words: Sequence[int]) -> Tuple[List[int], int]:
+    """(changed word indexes, changed pixel count) between two frames"""
+    changed_words = [i for i, (old, new) in enumerate(zip(old_words, new_words)) if old != new]
+    changed_pixels = sum(bin(old_words[i] ^ new_words[i]).count("1") for i in changed_words)
+    return changed_words, changed_pixels
+
+
+def frame_update(old_words: Sequence[int], new_words: Sequence[int],
+                 cols: int = MATRIX_COLS) -> Optional[Tuple[str, tuple]]:
+    """(bridge method, args) sending only what changed, or None if nothing did"""
+    changed_words, changed_pixels = diff_words(old_words, new_words)
+    if changed_pixels == 0:
+        return None
+    if changed_pixels == 1:
+        i = changed_words[0]
+        bit = (old_words[i] ^ new_words[i]).bit_length() - 1
+        index = i * 32 + bit
+        return "set_led", (index % cols, index // cols, (new_words[i] >> bit) & 1)
+    if len(changed_words) == 1:
+        i = changed_words[0]
+        return "set_frame_word", (i, new_words[i])
+    return "set_frame", tuple(new_words)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Pipelined Bridge client: HTTP handlers queue MCU calls instead of waiting on them.
+
+Calls are submitted to a named channel and return a `concurrent.futures.Future`
+right away. Each channel is a FIFO that runs one call at a time, so the order of
+calls to the same device is kept; different channels run in parallel on a
+bounded pool (`max_in_flight` round trips through the router socket at once).
+
+Calls that queue up while their channel is busy are handed to the channel's
+merger as one batch, which can fold them into fewer MCU calls (e.g. a burst of
+pixel writes into a single `set_frame`). The merger says which queued calls
+each call it returns stands for, and only those futures share its result.
+Without a merger every call is sent as is and resolves with its own result:
+
+    bridge = BridgeDispatcher(Bridge.call)
+    bridge.channel("matrix", merger=lambda batch: [("set_frame", tuple(words), range(len(batch)))])
+    future = bridge.submit("matrix", "set_led", 5, 3, 1)
+"""
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+MAX_IN_FLIGHT = 4
+
+# (method, args)
+Call = Tuple[str, tuple]
+# (method, args, indexes of the batch calls it stands for)
+MergedCall = Tuple[str, tuple, Iterable[int]]
+Merger = Callable[[List[Call]], List[MergedCall]]
+
+
+class _Channel:
+    __slots__ = ("merger", "pending", "busy")
+
+    def __init__(self, merger: Optional[Merger]):
+        self.merger = merger
+        self.pending = deque()
+        self.busy = False
+
+
+class BridgeDispatcher:
+    """Per-channel FIFO queues over a bounded pool of in-flight Bridge calls"""
+
+    def __init__(self, call: Callable, max_in_flight: int = MAX_IN_FLIGHT):
+        self._call = call
+        self._pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="bridge")
+        self._channels: Dict[str, _Channel] = {}
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self.stats = {
+            'submitted': 0,
+            'sent': 0,
+            'merged': 0,
+            'failed': 0,
+            'batches': 0,
+            'max_batch': 0,
+            'max_pending': 0
+        }
+
+    def channel(self, name: str, merger: Optional[Merger] = None):
+        """Declare a channel and the merger used for batches of 2+ queued calls.
+
+        The merger returns the calls to send, in order, each with the indexes
+        of the batch calls it replaces; those futures resolve with its result.
+        A batch call that no returned call covers fails with RuntimeError."""
+        with self._lock:
+            self._channels[name] = _Channel(merger)
+
+    def submit(self, channel: str, method: str, *args) -> Future:
+        """Queue `method(*args)` on `channel`; never blocks on the MCU"""
+        future = Future()
+        with self._lock:
+            ch = self._channels.get(channel)
+            if ch is None:
+                ch = self._channels[channel] = _Channel(None)
+            ch.pending.append((method, args, future))
+            self.stats['submitted'] += 1
+            self.stats['max_pending'] = max(self.stats['max_pending'], len(ch.pending))
+            if not ch.busy:
+                ch.busy = True
+                self._pool.submit(self._drain, ch)
+        return future
+
+    def pending(self) -> int:
+        """Calls queued but not yet sent, over all channels"""
+        with self._lock:
+            return sum(len(ch.pending) for ch in self._channels.values())
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every channel is idle, returns False on timeout"""
+        with self._idle:
+            return self._idle.wait_for(
+                lambda: not any(ch.busy for ch in self._channels.values()), timeout)
+
+    def close(self):
+        self.flush()
+        self._pool.shutdown(wait=True)
+
+    def _drain(self, ch: _Channel):
+        while True:
+            with self._lock:
+                if not ch.pending:
+                    ch.busy = False
+                    self._idle.notify_all()
+                    return
+                batch = list(ch.pending)
+                ch.pending.clear()
+                self.stats['batches'] += 1
+                self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+            self._run_batch(ch, batch)
+
+    def _plan(self, ch: _Channel, batch) -> List[Tuple[str, tuple, List[Future]]]:
+        """(method, args, futures it resolves) for each call to send"""
+        if len(batch) < 2 or ch.merger is None:
+            return [(method, args, [future]) for method, args, future in batch]
+        plan = []
+        covered = set()
+        for method, args, members in ch.merger([(method, args) for method, args, _ in batch]):
+            members = [i for i in members if i not in covered]
+            covered.update(members)
+            plan.append((method, args, [batch[i][2] for i in members]))
+        dropped = [future for i, (_, _, future) in enumerate(batch) if i not in covered]
+        if dropped:
+            error = RuntimeError("Call dropped by the channel merger")
+            for future in dropped:
+                future.set_exception(error)
+            with self._lock:
+                self.stats['failed'] += len(dropped)
+        return plan
+
+    def _run_batch(self, ch: _Channel, batch):
+        try:
+            plan = self._plan(ch, batch)
+        except Exception as e:
+            with self._lock:
+                self.stats['failed'] += len(batch)
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        sent = 0
+        for n, (method, args, futures) in enumerate(plan):
+            try:
+                result = self._call(method, *args)
+            except Exception as e:
+                # Later calls on the channel may depend on this one: fail them too
+                failed = [f for _, _, fs in plan[n:] for f in fs]
+                with self._lock:
+                    self.stats['sent'] += sent
+                    self.stats['failed'] += len(failed)
+                for future in failed:
+                    future.set_exception(e)
+                return
+            sent += 1
+            for future in futures:
+                future.set_result(result)
+        with self._lock:
+            self.stats['sent'] += sent
+            self.stats['merged'] += max(0, len(batch) - sent)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""Packed, memory-mapped frame library built from frames.h.
+
+frames.h stores each frame as a 104-element uint8_t C array. This module
+parses it once and writes a binary library with 13 bytes per frame (LED
+i = y * 13 + x is bit i % 8 of byte i / 8, the same LSB-first order as the
+uint32_t[4] buffer written by matrixWrite()) plus a name index. Opening the
+library is an mmap plus a read of the index; frames are returned as
+zero-copy memoryviews.
+
+Layout:
+    header  <8sHHIqQ  magic, frame size, name size, frame count,
+                      source mtime_ns, source size
+    index   count * NAME_SIZE bytes, NUL-padded ASCII names
+    frames  count * FRAME_BYTES bytes
+
+Usage:
+    python framelib.py build frames.h frames.bin
+    python framelib.py list frames.bin
+    python framelib.py show frames.bin Heart1
+"""
+import mmap
+import os
+import re
+import struct
+import sys
+from typing import Dict, Iterator, Optional
+
+MATRIX_COLS = 13
+MATRIX_ROWS = 8
+MATRIX_SIZE = 104
+FRAME_BYTES = 13
+NAME_SIZE = 24
+
+MAGIC = b"FRMLIB01"
+HEADER = struct.Struct("<8sHHIqQ")
+
+_COMMENT_RE = re.compile(r"//[^\n]*|/\*.*?\*/", re.S)
+_FRAME_RE = re.compile(r"const\s+uint8_t\s+(\w+)\s*\[\s*104\s*\]\s*=\s*\{([^}]*)\}")
+
+
+def pack_pixels(pixels) -> bytes:
+    """Pack 104 row-major 0/1 values into the 13-byte frame format"""
+    if len(pixels) != MATRIX_SIZE:
+        raise ValueError(f"Frame must have {MATRIX_SIZE} pixels, got {len(pixels)}")
+    out = bytearray(FRAME_BYTES)
+    for i, v in enumerate(pixels):
+        if v:
+            out[i >> 3] |= 1 << (i & 7)
+    return bytes(out)
+
+
+def frame_words(frame) -> tuple:
+    """Convert a 13-byte frame into the uint32_t[4] words used by set_frame"""
+    value = int.from_bytes(frame, "little")
+    return tuple((value >> (32 * i)) & 0xFFFFFFFF for i in range(4))
+
+
+def parse_frames_h(text: str) -> Dict[str, bytes]:
+    """Parse every `const uint8_t Name[104] = {...}` array, in file order"""
+    frames = {}
+    for name, body in _FRAME_RE.findall(_COMMENT_RE.sub("", text)):
+        values = [int(v, 0) for v in body.replace("\n", " ").split(",") if v.strip()]
+        frames[name] = pack_pixels(values)
+    return frames
+
+
+def build_library(header_path: str, lib_path: str) -> int:
+    """Parse header_path and (atomically) write the packed library, returns frame count"""
+    st = os.stat(header_path)
+    with open(header_path, "r", encoding="utf-8") as f:
+        frames = parse_frames_h(f.read())
+
+    index = bytearray()
+    for name in frames:
+        raw = name.encode("ascii")
+        if len(raw) > NAME_SIZE:
+            raise ValueError(f"Frame name too long for the index: {name}")
+        index += raw.ljust(NAME_SIZE, b"\0")
+
+    tmp = f"{lib_path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FRAME_BYTES, NAME_SIZE, len(frames), st.st_mtime_ns, st.st_size))
+        f.write(index)
+        f.write(b"".join(frames.values()))
+    os.replace(tmp, lib_path)
+    return len(frames)
+
+
+class FrameLibrary:
+    """Read-only, mmap-backed view of a packed frame library"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mm)
+
+        magic, frame_bytes, name_size, count, self.source_mtime_ns, self.source_size = \
+            HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or frame_bytes != FRAME_BYTES or name_size != NAME_SIZE:
+            self.close()
+            raise ValueError(f"{path} is not a frame library")
+
+        self._frames_at = HEADER.size + count * NAME_SIZE
+        self._index = {}
+        for i in range(count):
+            start = HEADER.size + i * NAME_SIZE
+            name = bytes(self._view[start:start + NAME_SIZE]).rstrip(b"\0").decode("ascii")
+            self._index[name] = i
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __getitem__(self, name: str) -> memoryview:
+        """13-byte frame as a zero-copy view into the mapping"""
+        start = self._frames_at + self._index[name] * FRAME_BYTES
+        return self._view[start:start + FRAME_BYTES]
+
+    def get(self, name: str) -> Optional[memoryview]:
+        return self[name] if name in self._index else None
+
+    def words(self, name: str) -> tuple:
+        """Frame as uint32_t[4] words, ready for Bridge.call("set_frame", *words)"""
+        return frame_words(self[name])
+
+    @property
+    def names(self):
+        return list(self._index)
+
+    def is_stale(self, header_path: str) -> bool:
+        """True if header_path changed since the library was built"""
+        try:
+            st = os.stat(header_path)
+        except OSError:
+            return False
+        return (st.st_mtime_ns, st.st_size) != (self.source_mtime_ns, self.source_size)
+
+    def close(self):
+        self._view.release()
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_library(header_path: str, lib_path: Optional[str] = None) -> FrameLibrary:
+    """Open lib_path, (re)building it from header_path only if missing or stale"""
+    if lib_path is None:
+        lib_path = os.path.splitext(header_path)[0] + ".bin"
+    try:
+        lib = FrameLibrary(lib_path)
+        if not lib.is_stale(header_path):
+            return lib
+        lib.close()
+    except (OSError, ValueError, struct.error):
+        pass
+    count = build_library(header_path, lib_path)
+    print(f"[FRAMES] Built {lib_path} ({count} frames) from {header_path}")
+    return FrameLibrary(lib_path)
+
+
+def _show(frame) -> str:
+    bits = int.from_bytes(frame, "little")
+    return "\n".join(
+        "".join("#" if (bits >> (y * MATRIX_COLS + x)) & 1 else "." for x in range(MATRIX_COLS))
+        for y in range(MATRIX_ROWS))
+
+
+def main(argv):
+    if len(argv) == 3 and argv[0] == "build":
+        count = build_library(argv[1], argv[2])
+        print(f"Wrote {count} frames to {argv[2]}")
+    elif len(argv) == 2 and argv[0] == "list":
+        with FrameLibrary(argv[1]) as lib:
+            for name in lib:
+                print(f"{name:<{NAME_SIZE}} {bytes(lib[name]).hex()}")
+    elif len(argv) == 3 and argv[0] == "show":
+        with FrameLibrary(argv[1]) as lib:
+            print(_show(lib[argv[2]]))
+    else:
+        print(__doc__.split("Usage:")[1].rstrip())
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -3,17 +3,32 @@ import sys
 import threading
 import json
 import time
-from queue import Queue
-from weakref import WeakSet
-from flask import Flask, Response, send_file, jsonify, request
+import os
+import base64
+import struct
+from flask import Flask, Response, jsonify, request
 from arduino.app_utils import *
+from metrics import REGISTRY, InstrumentedBridge, instrument_flask
+from framelib import open_library
+from sse import Broadcaster, serve
+from bridge_dispatch import BridgeDispatcher
+from bitset import MatrixBitset, diff_words, frame_update
+from assets import AssetStore
+
+# Time every Bridge.call per method (exposed on /metrics)
+Bridge = InstrumentedBridge(Bridge)
 
 # Flask app
 app = Flask(__name__)
+instrument_flask(app)
+
+BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+# index.html in memory, gzip/brotli precompressed, served with an ETag
+assets = AssetStore(BASE_DIR, ['index.html'])
 
-# Status management for Server-Sent Events
-status_connections = WeakSet()
+# Status management for Server-Sent Events (served by sse.py on /status)
 current_status = "Ready"
+status_broadcaster = Broadcaster({"status": current_status})
 
 class WebStatus:
     _lock = threading.Lock()
@@ -21,11 +36,7 @@ class WebStatus:
     @classmethod
     def _broadcast(cls):
         """Broadcast current status to all connected clients"""
-        for q in status_connections:
-            try:
-                q.put({"status": current_status})
-            except:
-                pass
+        status_broadcaster.publish({"status": current_status})
 
     @classmethod
     def update_status(cls, status: str):
@@ -40,33 +51,167 @@ MATRIX_COLS = 13
 MATRIX_ROWS = 8
 MATRIX_SIZE = 104
 
-# Initialize matrix state (all LEDs off)
-matrix_state = [[0 for _ in range(MATRIX_COLS)] for _ in range(MATRIX_ROWS)]
+# Packed frame layout (same as updateDisplay() in sketch.ino):
+# LED index i = y * 13 + x lives in bit (i % 32) of word (i / 32)
+FRAME_BYTES = 13  # 104 bits, LSB-first
+FRAME_WORDS = 4   # uint32_t[4]
+
+# Initialize matrix state (all LEDs off), one bit per LED in the frame layout.
+# matrix_state.version moves on every change: it keys the /matrix/get cache and
+# tells a read-back whether a local change raced it
+matrix_state = MatrixBitset(MATRIX_COLS, MATRIX_ROWS)
+
+# Serializes frame diffing, state updates and queueing the matching bridge call
+frame_lock = threading.Lock()
+
+# Packed /matrix/get body and its ETag, rebuilt only when matrix_state changes
+matrix_cache = {'version': -1, 'etag': None, 'body': None}
+
+# get_frame read-back counters
+readback_stats = {'reads': 0, 'drifts': 0, 'raced': 0, 'failed': 0}
+
+# Dirty-region counters for /matrix/frame
+frame_stats = {
+    'frames_requested': 0,
+    'frames_skipped': 0,
+    'pixels_requested': 0,
+    'pixels_changed': 0,
+    'bridge_calls': 0
+}
+
+def parse_frame(frame):
+    """Convert a 13-byte bitmask, base64 string or uint32[4] list into 4 words"""
+    if isinstance(frame, str):
+        frame = base64.b64decode(frame, validate=True)
+    elif isinstance(frame, list) and len(frame) == FRAME_WORDS:
+        words = [int(w) for w in frame]
+        if any(w < 0 or w > 0xFFFFFFFF for w in words):
+            raise ValueError("Frame words must be uint32")
+        if words[3] >> (MATRIX_SIZE - 96):
+            raise ValueError("Frame has bits beyond LED 103")
+        return words
+    elif isinstance(frame, list):
+        frame = bytes(int(b) for b in frame)
+
+    if not isinstance(frame, (bytes, bytearray, memoryview)) or len(frame) != FRAME_BYTES:
+        raise ValueError(f"Frame must be {FRAME_BYTES} bytes or {FRAME_WORDS} uint32 words")
+    return list(struct.unpack('<4I', bytes(frame) + bytes(16 - FRAME_BYTES)))
+
+def pack_frame(words) -> bytes:
+    """Convert 4 frame words back to the 13-byte bitmask"""
+    return struct.pack('<4I', *words)[:FRAME_BYTES]
+
+def frame_from_state():
+    """Pack matrix_state into 4 frame words"""
+    return matrix_state.words()
+
+def load_frames():
+    """Open the packed frame library (built from frames.h only when it changed)"""
+    for header in (os.path.join(BASE_DIR, "sketch", "frames.h"), os.path.join(BASE_DIR, "frames.h")):
+        if os.path.exists(header):
+            try:
+                return open_library(header, os.path.join(BASE_DIR, "frames.bin"))
+            except Exception as e:
+                print(f"[WARN] Frame library unavailable: {e}")
+    return None
+
+# Named frames from frames.h (Heart1, Sig1, ...)
+frame_library = load_frames()
+
+def merge_matrix_calls(batch):
+    """Calls that queued up behind an in-flight one collapse into a single
+    set_frame of the current state, which already includes all of them; a
+    queued read-back is sent last so it sees that state. Each write shares
+    the set_frame result, each read-back gets the get_frame hex"""
+    writes = [i for i, (method, _) in enumerate(batch) if method != "get_frame"]
+    reads = [i for i, (method, _) in enumerate(batch) if method == "get_frame"]
+    calls = []
+    if writes:
+        with frame_lock:
+            calls.append(("set_frame", tuple(frame_from_state()), writes))
+    if reads:
+        calls.append(("get_frame", (), reads))
+    return calls
+
+# All matrix calls go through one FIFO channel, so routes never wait on the bridge
+bridge = BridgeDispatcher(Bridge.call)
+bridge.channel("matrix", merger=merge_matrix_calls)
+
+REGISTRY.gauge("sse_subscribers", "Connected SSE clients", lambda: {("/status",): status_broadcaster.subscribers}, ("path",))
+REGISTRY.gauge("bridge_pending_calls", "Bridge calls queued but not yet sent", bridge.pending)
+
+def report_bridge_error(label):
+    """Future callback: log and surface a failed bridge call"""
+    def callback(future):
+        error = future.exception()
+        if error is not None:
+            print(f"[ERROR] {label}: {error}")
+            WebStatus.update_status(f"{label} failed: {error}")
+    return callback
+
+def send_frame_diff(old_words, new_words):
+    """Queue only what changed between two frames, returns (bridge method, future)"""
+    update = frame_update(old_words, new_words, MATRIX_COLS)
+    if update is None:
+        return None, None
+    method, args = update
+    return method, bridge.submit("matrix", method, *args)
+
+def state_from_frame(words):
+    """Unpack 4 frame words into matrix_state (caller holds frame_lock)"""
+    matrix_state.load_words(words)
+
+def read_back_frame(timeout=2.0):
+    """Read the frame from the MCU with get_frame (13 bytes as hex) and adopt it
+    if matrix_state drifted (MCU reset, another client); returns True when both
+    already matched"""
+    with frame_lock:
+        version = matrix_state.version
+        # Queued behind pending writes, so it sees them applied
+        future = bridge.submit("matrix", "get_frame")
+    try:
+        words = parse_frame(bytes.fromhex(future.result(timeout)))
+    except Exception:
+        readback_stats['failed'] += 1
+        raise
+    with frame_lock:
+        readback_stats['reads'] += 1
+        if version != matrix_state.version:
+            # Changed while reading; the local state is the newer one
+            readback_stats['raced'] += 1
+            return True
+        if words == frame_from_state():
+            return True
+        readback_stats['drifts'] += 1
+        state_from_frame(words)
+    lit = sum(bin(w).count('1') for w in words)
+    WebStatus.update_status(f"Matrix resynced from the board ({lit} ON)")
+    print(f"[MATRIX] Resynced from MCU -> {pack_frame(words).hex()}")
+    return False
+
+def packed_matrix():
+    """(ETag, JSON body) of the current state, cached until the next change"""
+    with frame_lock:
+        if matrix_cache['version'] != matrix_state.version:
+            words = frame_from_state()
+            frame = pack_frame(words)
+            matrix_cache['etag'] = frame.hex()
+            matrix_cache['body'] = json.dumps({
+                'success': True,
+                'frame': base64.b64encode(frame).decode('ascii'),
+                'words': words,
+                'matrix': matrix_state.rows(),
+                'cols': MATRIX_COLS,
+                'rows': MATRIX_ROWS
+            }, separators=(',', ':'))
+            matrix_cache['version'] = matrix_state.version
+        return matrix_cache['etag'], matrix_cache['body']
 
 # Routes
 @app.route('/')
 def index():
     """Serve the main HTML page"""
-    return send_file('index.html')
-
-@app.route('/status')
-def status_stream():
-    """Server-Sent Events endpoint for real-time status updates"""
-    def event_stream():
-        q = Queue()
-        status_connections.add(q)
-        try:
-            # Send initial status
-            yield f"data: {{\"status\": \"{current_status}\"}}\n\n"
-            
-            # Stream updates
-            while True:
-                data = q.get()
-                yield f"data: {{'status': '{data['status']}'}}\n\n"
-        except GeneratorExit:
-            status_connections.discard(q)
-    
-    return Response(event_stream(), mimetype='text/event-stream')
+    return assets.flask_response('index.html')
 
 @app.route('/matrix/toggle', methods=['POST'])
 def toggle_led():
@@ -79,12 +224,13 @@ def toggle_led():
         if x < 0 or x >= MATRIX_COLS or y < 0 or y >= MATRIX_ROWS:
             return jsonify({'success': False, 'error': 'Invalid coordinates'}), 400
         
-        # Toggle state
-        matrix_state[y][x] = 1 if matrix_state[y][x] == 0 else 0
-        new_state = matrix_state[y][x]
-        
-        # Call Arduino Bridge
-        Bridge.call("set_led", x, y, new_state)
+        with frame_lock:
+            # Toggle state
+            new_state = matrix_state.toggle(x, y)
+
+            # Queue Arduino Bridge call
+            future = bridge.submit("matrix", "set_led", x, y, new_state)
+        future.add_done_callback(report_bridge_error(f"Set LED ({x},{y})"))
         
         # Update status
         status_msg = f"LED ({x},{y}): {'ON' if new_state else 'OFF'}"
@@ -102,17 +248,91 @@ def toggle_led():
         print(f"[ERROR] Toggle LED: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/matrix/frame', methods=['POST'])
+def set_frame():
+    """Set the whole matrix with one bridge call"""
+    try:
+        if request.mimetype == 'application/octet-stream':
+            data = {'frame': request.get_data()}
+        else:
+            data = request.get_json() or {}
+
+        name = data.get('name')
+        if name is not None:
+            if not frame_library or name not in frame_library:
+                return jsonify({'success': False, 'error': f'Unknown frame: {name}'}), 404
+            data = {'frame': frame_library[name]}
+
+        try:
+            words = parse_frame(data.get('frame'))
+        except (ValueError, TypeError) as e:
+            return jsonify({'success': False, 'error': f'Invalid frame: {e}'}), 400
+
+        with frame_lock:
+            old_words = frame_from_state()
+            _, changed = diff_words(old_words, words)
+            frame_stats['frames_requested'] += 1
+            frame_stats['pixels_requested'] += MATRIX_SIZE
+            frame_stats['pixels_changed'] += changed
+
+            if changed:
+                # Queue Arduino Bridge call with the dirty region only
+                method, future = send_frame_diff(old_words, words)
+                frame_stats['bridge_calls'] += 1
+
+                # Update local state
+                state_from_frame(words)
+            else:
+                method, future = None, None
+                frame_stats['frames_skipped'] += 1
+
+        if future is not None:
+            future.add_done_callback(report_bridge_error("Set frame"))
+
+        lit = sum(bin(w).count('1') for w in words)
+        if changed:
+            WebStatus.update_status(f"Frame updated ({changed} LEDs changed, {lit} ON)")
+            print(f"[MATRIX] Frame set -> {pack_frame(words).hex()} ({changed} changed via {method})")
+
+        return jsonify({
+            'success': True,
+            'frame': base64.b64encode(pack_frame(words)).decode('ascii'),
+            'words': words,
+            'lit': lit,
+            'changed': changed,
+            'skipped': not changed
+        })
+    except Exception as e:
+        print(f"[ERROR] Set frame: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/matrix/frames', methods=['GET'])
+def list_frames():
+    """List the named frames available to /matrix/frame"""
+    names = frame_library.names if frame_library else []
+    return jsonify({'success': True, 'frames': names})
+
+@app.route('/matrix/stats', methods=['GET'])
+def frame_stats_view():
+    """Get dirty-region counters for /matrix/frame"""
+    with frame_lock:
+        stats = dict(frame_stats)
+    requested = stats['pixels_requested']
+    stats['changed_ratio'] = stats['pixels_changed'] / requested if requested else 0.0
+    return jsonify({'success': True, 'stats': stats, 'bridge': dict(bridge.stats),
+                    'bridge_pending': bridge.pending(), 'readback': dict(readback_stats)})
+
 @app.route('/matrix/clear', methods=['POST'])
 def clear_matrix():
     """Clear entire matrix"""
     try:
-        # Clear local state
-        for y in range(MATRIX_ROWS):
-            for x in range(MATRIX_COLS):
-                matrix_state[y][x] = 0
-        
-        # Call Arduino Bridge
-        Bridge.call("clear_matrix")
+        with frame_lock:
+            # Clear local state
+            matrix_state.clear()
+
+            # Queue Arduino Bridge call
+            future = bridge.submit("matrix", "clear_matrix")
+        future.add_done_callback(report_bridge_error("Clear matrix"))
         
         # Update status
         WebStatus.update_status("Matrix cleared")
@@ -124,16 +344,58 @@ def clear_matrix():
         print(f"[ERROR] Clear matrix: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/matrix/get', methods=['GET'])
-def get_matrix():
-    """Get current matrix state"""
+@app.route('/matrix/transform', methods=['POST'])
+def transform_matrix():
+    """Invert, shift or scroll the whole matrix with one bridge call"""
     try:
+        data = request.get_json() or {}
+        op = data.get('op')
+        if op not in ('invert', 'shift', 'scroll'):
+            return jsonify({'success': False, 'error': 'op must be invert, shift or scroll'}), 400
+        dx = int(data.get('dx', 0))
+        dy = int(data.get('dy', 0))
+
+        with frame_lock:
+            old_words = frame_from_state()
+            if op == 'invert':
+                matrix_state.invert()
+            else:
+                getattr(matrix_state, op)(dx, dy)
+            words = frame_from_state()
+            method, future = send_frame_diff(old_words, words)
+            lit = matrix_state.popcount()
+
+        if future is not None:
+            future.add_done_callback(report_bridge_error(f"Matrix {op}"))
+            WebStatus.update_status(f"Matrix {op} ({lit} ON)")
+            print(f"[MATRIX] {op} dx={dx} dy={dy} -> {pack_frame(words).hex()} via {method}")
+
         return jsonify({
             'success': True,
-            'matrix': matrix_state,
-            'cols': MATRIX_COLS,
-            'rows': MATRIX_ROWS
+            'op': op,
+            'words': words,
+            'lit': lit,
+            'skipped': future is None
         })
+    except Exception as e:
+        print(f"[ERROR] Transform matrix: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/matrix/get', methods=['GET'])
+def get_matrix():
+    """Get current matrix state (?refresh=1 reads it back from the MCU first)"""
+    try:
+        if request.args.get('refresh') in ('1', 'true'):
+            read_back_frame()
+
+        etag, body = packed_matrix()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
         print(f"[ERROR] Get matrix: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -146,10 +408,17 @@ def main():
     print(f"� Matrix size: {MATRIX_COLS}x{MATRIX_ROWS} = {MATRIX_SIZE} LEDs")
     print("\n" + "=" * 60)
     print()
+
+    # Start from what the board shows instead of assuming a blank matrix
+    try:
+        read_back_frame()
+        print(f"[MATRIX] Read back frame -> {pack_frame(frame_from_state()).hex()}")
+    except Exception as e:
+        print(f"[WARN] Could not read the matrix from the board: {e}")
     
     try:
-        # Start Flask server
-        app.run(host='0.0.0.0', port=8000, debug=False, threaded=True)
+        # Start server: Flask routes on a worker pool, /status SSE on the event loop
+        serve(app, '0.0.0.0', 8000, {'/status': status_broadcaster})
     except KeyboardInterrupt:
         print("\n\nShutting down...")
         sys.exit(0)
@@ -8,6 +8,7 @@
 #define MATRIX_COLS 13
 #define MATRIX_ROWS 8
 #define MATRIX_SIZE 104  // 13 x 8
+#define FRAME_BYTES 13   // 104 bits, packed like updateDisplay()
 
 // TODO: those will go into an header file.
 extern "C" void matrixWrite(const uint32_t* buf);
@@ -27,6 +28,9 @@ void setup() {
   Bridge.provide("set_led", set_led);
   Bridge.provide("clear_matrix", clear_matrix_bridge);
   Bridge.provide("get_matrix", get_matrix);
+  Bridge.provide("get_frame", get_frame);
+  Bridge.provide("set_frame", set_frame);
+  Bridge.provide("set_frame_word", set_frame_word);
 }
 
 void loop() {
@@ -53,6 +57,40 @@ void set_led(int x, int y, int state) {
   updateDisplay();
 }
 
+/**
+ * Set the whole matrix in one call
+ * Parameters: w0..w3, the packed uint32_t[4] buffer (same layout as updateDisplay)
+ */
+void set_frame(uint32_t w0, uint32_t w1, uint32_t w2, uint32_t w3) {
+  uint32_t buffer[4] = {w0, w1, w2, w3 & 0xFF};  // Only 104 bits are used
+
+  for (int i = 0; i < MATRIX_SIZE; i++) {
+    matrixState[i] = (buffer[i / 32] >> (i % 32)) & 1;
+  }
+
+  matrixWrite(buffer);
+}
+
+/**
+ * Replace one 32-bit word of the packed frame
+ * Parameters: index (0-3), word (LEDs index*32 .. index*32+31)
+ */
+void set_frame_word(int index, uint32_t word) {
+  if (index < 0 || index >= 4) {
+    return;  // Invalid word index
+  }
+
+  for (int bit = 0; bit < 32; bit++) {
+    int i = index * 32 + bit;
+    if (i >= MATRIX_SIZE) {
+      break;
+    }
+    matrixState[i] = (word >> bit) & 1;
+  }
+
+  updateDisplay();
+}
+
 /**
  * Clear the entire matrix
  */
@@ -65,15 +103,42 @@ void clear_matrix_bridge() {
  * Returns: JSON-like string with all 104 LED states
  */
 String get_matrix() {
-  String result = "[";
+  // "[" + 104 digits + 103 commas + "]", built in place instead of growing a String
+  char result[2 * MATRIX_SIZE + 2];
+  int n = 0;
+  result[n++] = '[';
   for (int i = 0; i < MATRIX_SIZE; i++) {
-    result += String(matrixState[i]);
-    if (i < MATRIX_SIZE - 1) {
-      result += ",";
+    if (i > 0) {
+      result[n++] = ',';
+    }
+    result[n++] = matrixState[i] ? '1' : '0';
+  }
+  result[n++] = ']';
+  result[n] = '\0';
+  return String(result);
+}
+
+/**
+ * Get the packed frame as hex
+ * Returns: 26 hex digits, the 13 bytes of the uint32_t[4] buffer (LSB-first)
+ */
+String get_frame() {
+  static const char digits[] = "0123456789abcdef";
+  char hex[2 * FRAME_BYTES + 1];
+
+  for (int b = 0; b < FRAME_BYTES; b++) {
+    uint8_t value = 0;
+    for (int bit = 0; bit < 8; bit++) {
+      int i = b * 8 + bit;
+      if (i < MATRIX_SIZE && matrixState[i]) {
+        value |= 1 << bit;
+      }
     }
+    hex[2 * b] = digits[value >> 4];
+    hex[2 * b + 1] = digits[value & 0x0F];
   }
-  result += "]";
-  return result;
+  hex[2 * FRAME_BYTES] = '\0';
+  return String(hex);
 }
 
 /**
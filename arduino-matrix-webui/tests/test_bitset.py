@@ -0,0 +1,138 @@
+"""MatrixBitset layout, packing and whole-matrix operations. Run from arduino-matrix-webui/:
+
+    python3 -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from bitset import MatrixBitset
+
+
+def lit(state):
+    return {(x, y) for y, row in enumerate(state.rows()) for x, on in enumerate(row) if on}
+
+
+def bitset(*pixels, cols=13, rows=8):
+    state = MatrixBitset(cols, rows)
+    for x, y in pixels:
+        state.set(x, y)
+    return state
+
+
+class LayoutTest(unittest.TestCase):
+
+    def test_led_index_is_bit_index(self):
+        state = bitset((0, 0), (5, 2), (6, 2), (12, 7))
+        self.assertEqual(state.value, 1 | 1 << 31 | 1 << 32 | 1 << 103)
+        self.assertEqual(state.words(), [1 | 1 << 31, 1, 0, 1 << 7])
+
+    def test_packed_frame_is_little_endian(self):
+        state = bitset((0, 0), (8, 0), (12, 7))
+        self.assertEqual(state.to_bytes(), bytes([1, 1]) + bytes(10) + bytes([0x80]))
+        self.assertEqual(len(state.to_bytes()), 13)
+
+    def test_round_trips(self):
+        state = bitset((1, 0), (7, 3), (12, 7))
+        for load, packed in (("load_words", state.words()), ("load_bytes", state.to_bytes())):
+            copy = MatrixBitset()
+            getattr(copy, load)(packed)
+            self.assertEqual(copy, state)
+
+    def test_bits_beyond_the_matrix_are_dropped(self):
+        state = MatrixBitset()
+        state.load_words([0, 0, 0, 0xFFFFFFFF])
+        self.assertEqual(state.popcount(), 8)
+        self.assertEqual(state.value >> 104, 0)
+
+    def test_out_of_range_pixel(self):
+        with self.assertRaises(IndexError):
+            MatrixBitset().set(13, 0)
+        with self.assertRaises(IndexError):
+            MatrixBitset().get(0, -1)
+
+
+class VersionTest(unittest.TestCase):
+
+    def test_only_real_changes_bump_version(self):
+        state = MatrixBitset()
+        self.assertEqual(state.toggle(2, 2), 1)
+        self.assertEqual(state.version, 1)
+        state.set(2, 2)
+        state.load(state.value)
+        self.assertEqual(state.version, 1)
+        self.assertEqual(state.toggle(2, 2), 0)
+        self.assertEqual(state.version, 2)
+
+    def test_rows_are_rebuilt_after_a_change(self):
+        state = bitset((0, 0))
+        rows = state.rows()
+        self.assertIs(state.rows(), rows)
+        state.set(1, 0)
+        self.assertEqual(state.rows()[0][:3], [1, 1, 0])
+        self.assertEqual(len(state.rows()), 8)
+
+
+class TransformTest(unittest.TestCase):
+
+    def test_fill_clear_invert(self):
+        state = bitset((3, 4))
+        state.invert()
+        self.assertEqual(state.popcount(), 103)
+        self.assertEqual(state.get(3, 4), 0)
+        state.fill()
+        self.assertEqual(state.popcount(), 104)
+        state.clear()
+        self.assertEqual(state.value, 0)
+
+    def test_shift_drops_pixels_at_the_edges(self):
+        state = bitset((0, 0), (12, 3), (5, 7))
+        state.shift(dx=1)
+        self.assertEqual(lit(state), {(1, 0), (6, 7)})
+        state.shift(dx=-2, dy=-1)
+        self.assertEqual(lit(state), {(4, 6)})
+        state.shift(dy=2)
+        self.assertEqual(lit(state), set())
+
+    def test_scroll_wraps_around(self):
+        state = bitset((0, 0), (12, 3), (5, 7))
+        state.scroll(dx=1, dy=1)
+        self.assertEqual(lit(state), {(1, 1), (0, 4), (6, 0)})
+        state.scroll(dx=-1, dy=-1)
+        self.assertEqual(lit(state), {(0, 0), (12, 3), (5, 7)})
+        state.scroll(dx=13, dy=8)
+        self.assertEqual(lit(state), {(0, 0), (12, 3), (5, 7)})
+
+    def test_blit_ops(self):
+        sprite = bitset((0, 0), (1, 0), cols=2, rows=2)  # bottom row of the sprite is dark
+        for op, expected in (("copy", {(5, 0), (6, 0), (9, 0)}),
+                             ("or", {(5, 0), (6, 0), (6, 1), (9, 0)}),
+                             ("xor", {(6, 0), (6, 1), (9, 0)})):
+            state = bitset((5, 0), (6, 1), (9, 0))
+            state.blit(sprite, 5, 0, op=op)
+            self.assertEqual(lit(state), expected, op)
+
+    def test_blit_partially_off_screen(self):
+        sprite = bitset((0, 0), (1, 0), (0, 1), (1, 1), cols=2, rows=2)
+        state = MatrixBitset()
+        state.blit(sprite, -1, 7)
+        self.assertEqual(lit(state), {(0, 7)})
+        state.blit(sprite, 12, -1)
+        self.assertEqual(lit(state), {(0, 7), (12, 0)})
+
+    def test_blit_copy_clears_the_covered_area_only(self):
+        state = MatrixBitset()
+        state.fill()
+        state.blit(MatrixBitset(2, 2), 1, 1)
+        self.assertEqual(state.popcount(), 100)
+        self.assertEqual([state.get(x, y) for x, y in ((1, 1), (2, 2), (0, 1), (3, 1))], [0, 0, 1, 1])
+
+    def test_unknown_blit_op(self):
+        with self.assertRaises(ValueError):
+            MatrixBitset().blit(MatrixBitset(1, 1), op="and")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+"""BridgeDispatcher ordering, batching and result routing. Run from arduino-matrix-webui/:
+
+    python3 -m unittest discover tests
+"""
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from bridge_dispatch import BridgeDispatcher
+
+
+class FakeBridge:
+    """Records calls; the first call blocks until `release()` so later ones queue up"""
+
+    def __init__(self, fail=()):
+        self.calls = []
+        self.fail = set(fail)
+        self.gate = threading.Event()
+        self.started = threading.Event()
+
+    def __call__(self, method, *args):
+        self.started.set()
+        self.gate.wait(5)
+        self.calls.append((method, args))
+        if method in self.fail:
+            raise OSError(f"{method} failed")
+        return f"{method}{args}"
+
+    def release(self):
+        self.gate.set()
+
+
+class DispatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeBridge()
+        self.bridge = BridgeDispatcher(self.fake)
+
+    def tearDown(self):
+        self.fake.release()
+        self.bridge.close()
+
+    def queue_behind_first(self, channel, calls):
+        """Submits calls[0], waits until it is in flight, then queues the rest"""
+        futures = [self.bridge.submit(channel, *calls[0])]
+        self.assertTrue(self.fake.started.wait(5))
+        futures += [self.bridge.submit(channel, *call) for call in calls[1:]]
+        self.fake.release()
+        self.assertTrue(self.bridge.flush(5))
+        return futures
+
+    def test_without_merger_each_future_gets_its_own_result(self):
+        futures = self.queue_behind_first("m", [("set_led", 1, 2, 1), ("get_frame",), ("set_led", 3, 4, 0)])
+        self.assertEqual([f.result() for f in futures],
+                         ["set_led(1, 2, 1)", "get_frame()", "set_led(3, 4, 0)"])
+        self.assertEqual([m for m, _ in self.fake.calls], ["set_led", "get_frame", "set_led"])
+        self.assertEqual(self.bridge.stats["merged"], 0)
+
+    def test_merger_folds_writes_and_keeps_reads_separate(self):
+        def merger(batch):
+            writes = [i for i, (m, _) in enumerate(batch) if m != "get_frame"]
+            reads = [i for i, (m, _) in enumerate(batch) if m == "get_frame"]
+            return [("set_frame", (len(writes),), writes), ("get_frame", (), reads)]
+
+        self.bridge.channel("m", merger=merger)
+        futures = self.queue_behind_first("m", [("set_led", 0, 0, 1), ("set_led", 1, 0, 1),
+                                                ("get_frame",), ("set_led", 2, 0, 1)])
+        self.assertEqual([f.result() for f in futures],
+                         ["set_led(0, 0, 1)", "set_frame(2,)", "get_frame()", "set_frame(2,)"])
+        self.assertEqual(self.fake.calls, [("set_led", (0, 0, 1)), ("set_frame", (2,)), ("get_frame", ())])
+        self.assertEqual(self.bridge.stats["merged"], 1)
+        self.assertEqual(self.bridge.stats["max_batch"], 3)
+
+    def test_calls_dropped_by_the_merger_fail(self):
+        self.bridge.channel("m", merger=lambda batch: [("set_frame", (), [0])])
+        futures = self.queue_behind_first("m", [("a",), ("b",), ("c",)])
+        self.assertEqual(futures[1].result(), "set_frame()")
+        with self.assertRaises(RuntimeError):
+            futures[2].result()
+
+    def test_failure_fails_the_rest_of_the_batch(self):
+        self.fake.fail.add("b")
+        futures = self.queue_behind_first("m", [("a",), ("b",), ("c",)])
+        self.assertEqual(futures[0].result(), "a()")
+        for future in futures[1:]:
+            with self.assertRaises(OSError):
+                future.result()
+        self.assertEqual([m for m, _ in self.fake.calls], ["a", "b"])
+        self.assertEqual(self.bridge.stats["failed"], 2)
+
+    def test_order_is_kept_per_channel(self):
+        futures = self.queue_behind_first("m", [("call", i) for i in range(20)])
+        self.assertEqual([args[0] for _, args in self.fake.calls], list(range(20)))
+        self.assertEqual([f.result() for f in futures], [f"call({i},)" for i in range(20)])
+
+
+if __name__ == "__main__":
+    unittest.main()
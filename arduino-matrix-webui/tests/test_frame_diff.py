@@ -0,0 +1,69 @@
+"""Dirty-region diffing of /matrix/frame updates. Run from arduino-matrix-webui/:
+
+    python3 -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from bitset import MatrixBitset, diff_words, frame_update
+
+
+def words(*pixels):
+    state = MatrixBitset()
+    for x, y in pixels:
+        state.set(x, y)
+    return state.words()
+
+
+class DiffWordsTest(unittest.TestCase):
+
+    def test_identical_frames(self):
+        frame = words((0, 0), (12, 7))
+        self.assertEqual(diff_words(frame, frame), ([], 0))
+
+    def test_counts_pixels_in_each_changed_word(self):
+        # LED 31 is the last bit of word 0, LED 32 the first of word 1
+        old = words((0, 0))
+        new = words((5, 2), (6, 2), (12, 7))
+        self.assertEqual(diff_words(old, new), ([0, 1, 3], 4))
+
+
+class FrameUpdateTest(unittest.TestCase):
+
+    def test_nothing_changed(self):
+        self.assertIsNone(frame_update(words((3, 3)), words((3, 3))))
+
+    def test_single_pixel_is_set_led(self):
+        self.assertEqual(frame_update(words(), words((12, 7))), ("set_led", (12, 7, 1)))
+        self.assertEqual(frame_update(words((4, 1), (5, 1)), words((5, 1))), ("set_led", (4, 1, 0)))
+
+    def test_pixels_in_one_word_is_set_frame_word(self):
+        new = words((0, 0), (1, 0))
+        self.assertEqual(frame_update(words(), new), ("set_frame_word", (0, new[0])))
+
+    def test_pixels_across_words_is_set_frame(self):
+        new = words((0, 0), (12, 7))
+        self.assertEqual(frame_update(words(), new), ("set_frame", tuple(new)))
+
+    def test_applying_the_update_reaches_the_new_frame(self):
+        old = words((1, 1), (2, 2))
+        for new in (words((1, 1)), words((1, 1), (2, 2), (3, 2)), words((9, 6), (1, 1)), words()):
+            method, args = frame_update(old, new)
+            state = MatrixBitset()
+            state.load_words(old)
+            if method == "set_led":
+                state.set(*args)
+            elif method == "set_frame_word":
+                frame = list(old)
+                frame[args[0]] = args[1]
+                state.load_words(frame)
+            else:
+                state.load_words(args)
+            self.assertEqual(state.words(), new)
+
+
+if __name__ == "__main__":
+    unittest.main()
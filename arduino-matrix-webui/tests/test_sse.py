@@ -0,0 +1,75 @@
+"""sse.Broadcaster frame ids and Last-Event-ID resume. Run from arduino-matrix-webui/:
+
+    python3 -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from sse import Broadcaster
+
+
+def ids(frames):
+    return [f.split(b"\n", 1)[0].decode()[len("id: "):] for f in frames]
+
+
+class BacklogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.b = Broadcaster({"status": "Ready"}, history=4, epoch="e1")
+
+    def publish(self, n):
+        for i in range(n):
+            self.b.publish({"status": f"s{i}"})
+
+    def test_frames_carry_epoch_and_seq(self):
+        self.publish(2)
+        self.assertEqual(ids(self.b.backlog("e1-0")[1]), ["e1-1", "e1-2"])
+        self.assertEqual(self.b.last_id, 2)
+
+    def test_new_client_gets_latest_state_only(self):
+        self.publish(3)
+        last_id, frames = self.b.backlog(None)
+        self.assertEqual(last_id, 3)
+        self.assertEqual(ids(frames), ["e1-3"])
+        self.assertIn(b'"s2"', frames[0])
+
+    def test_resume_sends_only_missed_frames(self):
+        self.publish(3)
+        self.assertEqual(ids(self.b.backlog("e1-1")[1]), ["e1-2", "e1-3"])
+
+    def test_up_to_date_client_gets_nothing(self):
+        self.publish(3)
+        self.assertEqual(self.b.backlog("e1-3"), (3, []))
+
+    def test_id_older_than_history_gets_full_state(self):
+        self.publish(10)  # history keeps seq 7..10
+        self.assertEqual(ids(self.b.backlog("e1-2")[1]), ["e1-10"])
+        # The oldest resumable id is the one just before the history
+        self.assertEqual(ids(self.b.backlog("e1-6")[1]), ["e1-7", "e1-8", "e1-9", "e1-10"])
+
+    def test_id_from_another_epoch_gets_full_state(self):
+        # A browser that saw seq 7 before a restart; the new process is at 7 too
+        self.publish(7)
+        for stale in ("e0-7", "e0-3", "7", "3"):
+            self.assertEqual(self.b.backlog(stale), (7, [self.b.backlog(None)[1][0]]), stale)
+
+    def test_garbage_ids_get_full_state(self):
+        self.publish(2)
+        for bad in ("", "e1-", "e1-x", "-", "e1-2-3"):
+            self.assertEqual(ids(self.b.backlog(bad)[1]), ["e1-2"], bad)
+
+    def test_epochs_differ_between_instances(self):
+        self.assertNotEqual(Broadcaster({}).epoch, Broadcaster({}).epoch)
+
+    def test_no_initial_state(self):
+        b = Broadcaster(epoch="e1")
+        self.assertEqual(b.backlog(None), (-1, []))
+        b.publish({"status": "x"})
+        self.assertEqual(ids(b.backlog(None)[1]), ["e1-1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""EventLoopServer HTTP/1.1 edge cases, against a server on a free local port.
+Run from arduino-matrix-webui/:
+
+    python3 -m unittest discover tests
+"""
+import os
+import socket
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from sse import Broadcaster, serve
+
+
+def echo_app(environ, start_response):
+    body = environ["wsgi.input"].read()
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"echo:" + body]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ServerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.port = _free_port()
+        ready = threading.Event()
+        threading.Thread(target=serve, args=(echo_app, "127.0.0.1", cls.port, {"/status": Broadcaster({})}),
+                         kwargs={"ready": ready}, daemon=True).start()
+        assert ready.wait(5)
+
+    def exchange(self, *parts: bytes, until_close: bool = True) -> bytes:
+        """Sends the parts in order and returns everything read (until close, or one recv)"""
+        with socket.create_connection(("127.0.0.1", self.port), timeout=2) as s:
+            for part in parts:
+                s.sendall(part)
+            data = b""
+            while True:
+                chunk = s.recv(65536)
+                data += chunk
+                if not chunk or not until_close:
+                    return data
+
+    def status(self, response: bytes) -> str:
+        return response.split(b"\r\n", 1)[0].decode()
+
+    def test_plain_post(self):
+        r = self.exchange(b"POST /x HTTP/1.1\r\nContent-Length: 3\r\nConnection: close\r\n\r\nabc")
+        self.assertEqual(self.status(r), "HTTP/1.1 200 OK")
+        self.assertTrue(r.endswith(b"echo:abc"))
+
+    def test_keep_alive_serves_several_requests(self):
+        r = self.exchange(b"GET / HTTP/1.1\r\n\r\n", b"GET / HTTP/1.1\r\nConnection: close\r\n\r\n")
+        self.assertEqual(r.count(b"HTTP/1.1 200 OK"), 2)
+
+    def test_expect_100_continue(self):
+        with socket.create_connection(("127.0.0.1", self.port), timeout=2) as s:
+            s.sendall(b"POST /x HTTP/1.1\r\nContent-Length: 3\r\nExpect: 100-continue\r\n"
+                      b"Connection: close\r\n\r\n")
+            self.assertEqual(s.recv(1024), b"HTTP/1.1 100 Continue\r\n\r\n")
+            s.sendall(b"abc")
+            r = b""
+            while True:
+                chunk = s.recv(65536)
+                if not chunk:
+                    break
+                r += chunk
+        self.assertEqual(self.status(r), "HTTP/1.1 200 OK")
+        self.assertTrue(r.endswith(b"echo:abc"))
+
+    def test_chunked_body_is_refused(self):
+        r = self.exchange(b"POST /x HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n3\r\nabc\r\n0\r\n\r\n")
+        self.assertEqual(self.status(r), "HTTP/1.1 411 Length Required")
+        # The chunk bytes must not be answered as a second request
+        self.assertEqual(r.count(b"HTTP/1.1 "), 1)
+
+    def test_malformed_requests_get_400(self):
+        for request in (b"GARBAGE\r\n\r\n",
+                        b"POST /x HTTP/1.1\r\nContent-Length: abc\r\n\r\n",
+                        b"POST /x HTTP/1.1\r\nContent-Length: -1\r\n\r\n",
+                        b"GET / HTTP/1.1\r\nno colon here\r\n\r\n",
+                        b"GET / HTTP/1.1\r\n" + b"X: y\r\n" * 150 + b"\r\n"):
+            self.assertEqual(self.status(self.exchange(request)), "HTTP/1.1 400 Bad Request", request[:40])
+
+    def test_body_too_large(self):
+        r = self.exchange(b"POST /x HTTP/1.1\r\nContent-Length: 99999999\r\n\r\n")
+        self.assertEqual(self.status(r), "HTTP/1.1 413 Payload Too Large")
+
+    def test_head_on_stream(self):
+        r = self.exchange(b"HEAD /status HTTP/1.1\r\n\r\n", until_close=False)
+        self.assertEqual(self.status(r), "HTTP/1.1 200 OK")
+        self.assertIn(b"Content-Type: text/event-stream", r)
+        self.assertTrue(r.endswith(b"\r\n\r\n"))
+
+    def test_get_stream_sends_current_state(self):
+        r = self.exchange(b"GET /status HTTP/1.1\r\n\r\n", until_close=False)
+        self.assertIn(b"text/event-stream", r)
+
+
+if __name__ == "__main__":
+    unittest.main()
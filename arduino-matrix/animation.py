@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""Host-side animation streaming for the 13x8 LED matrix.
+
+Frames are packed into the same uint32_t[4] layout used by convertAndDisplay()
+in sketch.ino (LED i = y * 13 + x is bit i % 32 of word i / 32) and pushed to
+the MCU with Bridge.call("set_frame", w0, w1, w2, w3). Playback is scheduled
+against a monotonic clock, so new animations don't need a recompile/reflash.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence
+
+MATRIX_COLS = 13
+MATRIX_ROWS = 8
+MATRIX_SIZE = 104
+
+
+def pack_frame(pixels: Sequence[int]) -> tuple:
+    """Pack 104 row-major 0/1 values into 4 frame words"""
+    if len(pixels) != MATRIX_SIZE:
+        raise ValueError(f"Frame must have {MATRIX_SIZE} pixels, got {len(pixels)}")
+    words = [0, 0, 0, 0]
+    for i, v in enumerate(pixels):
+        if v:
+            words[i >> 5] |= 1 << (i & 31)
+    return tuple(words)
+
+
+def pack_rows(rows: Sequence[Sequence[int]]) -> tuple:
+    """Pack 8 rows of 13 values into 4 frame words"""
+    return pack_frame([v for row in rows for v in row])
+
+
+@dataclass
+class Animation:
+    """A frame sequence played at a fixed target FPS"""
+    name: str
+    frames: List[tuple]
+    fps: float = 5.0
+    repeat: int = 1
+
+    def __post_init__(self):
+        if self.fps <= 0:
+            raise ValueError("fps must be > 0")
+        if not self.frames:
+            raise ValueError("Animation needs at least one frame")
+
+
+@dataclass
+class PlaybackStats:
+    """Timing report for one playback"""
+    name: str
+    target_fps: float
+    frames_sent: int = 0
+    frames_dropped: int = 0
+    elapsed: float = 0.0
+    lateness_sum: float = 0.0
+    lateness_max: float = 0.0
+
+    def record(self, lateness: float):
+        """Account one sent frame that went out `lateness` seconds after its deadline"""
+        lateness = abs(lateness)
+        self.frames_sent += 1
+        self.lateness_sum += lateness
+        if lateness > self.lateness_max:
+            self.lateness_max = lateness
+
+    @property
+    def achieved_fps(self) -> float:
+        return self.frames_sent / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def jitter_ms(self) -> float:
+        """Mean absolute deviation from the frame deadlines, in ms"""
+        if not self.frames_sent:
+            return 0.0
+        return 1000.0 * self.lateness_sum / self.frames_sent
+
+    @property
+    def max_jitter_ms(self) -> float:
+        return 1000.0 * self.lateness_max
+
+    def summary(self) -> str:
+        return (f"{self.name}: {self.frames_sent} frames in {self.elapsed:.2f}s "
+                f"({self.achieved_fps:.1f}/{self.target_fps:.1f} FPS), "
+                f"jitter {self.jitter_ms:.1f} ms (max {self.max_jitter_ms:.1f} ms), "
+                f"dropped {self.frames_dropped}")
+
+
+class AnimationPlayer:
+    """Streams Animation frames through send_frame(words) on a fixed schedule.
+
+    Frame k is due at start + k / fps. Deadlines are absolute, so a slow
+    bridge call never accumulates drift; a frame that is already a full period
+    late is dropped (except the last one) so playback catches up.
+    """
+
+    def __init__(self, send_frame: Callable[[tuple], None],
+                 clock: Callable[[], float] = time.monotonic):
+        self._send_frame = send_frame
+        self._clock = clock
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_stats: Optional[PlaybackStats] = None
+
+    def play(self, animation: Animation, loop: bool = False) -> PlaybackStats:
+        """Play the animation in the calling thread until done or stop()"""
+        self._stop.clear()
+        return self._run(animation, loop)
+
+    def _run(self, animation: Animation, loop: bool) -> PlaybackStats:
+        stats = PlaybackStats(animation.name, animation.fps)
+        self.last_stats = stats
+        period = 1.0 / animation.fps
+        frames = animation.frames
+        total = len(frames) * animation.repeat
+
+        start = self._clock()
+        k = 0
+        while not self._stop.is_set() and (loop or k < total):
+            deadline = start + k * period
+            delay = deadline - self._clock()
+            if delay > 0 and self._stop.wait(delay):
+                break
+
+            lateness = self._clock() - deadline
+            is_last = not loop and k == total - 1
+            if lateness >= period and not is_last:
+                # Behind schedule: skip this frame instead of pushing it late
+                stats.frames_dropped += 1
+            else:
+                self._send_frame(frames[k % len(frames)])
+                stats.record(lateness)
+            k += 1
+
+        stats.elapsed = self._clock() - start
+        return stats
+
+    def start(self, animation: Animation, loop: bool = True):
+        """Play the animation in a background thread"""
+        self.stop()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(animation, loop), daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Optional[PlaybackStats]:
+        """Stop background playback and return its stats"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        return self.last_stats
+
+    @property
+    def playing(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+
+def scanner(fps: float = 20.0) -> Animation:
+    """Vertical bar sweeping left to right and back"""
+    frames = []
+    cols = list(range(MATRIX_COLS)) + list(range(MATRIX_COLS - 2, 0, -1))
+    for col in cols:
+        frames.append(pack_rows([[1 if x == col else 0 for x in range(MATRIX_COLS)]
+                                 for _ in range(MATRIX_ROWS)]))
+    return Animation("scanner", frames, fps=fps)
@@ -1,6 +1,39 @@
+import os
 import sys
 from arduino.app_utils import *
 from arduino.app_bricks.keyword_spotting import KeywordSpotting
+from animation import Animation, AnimationPlayer, scanner
+from framelib import frame_words, open_library
+from metrics import REGISTRY, InstrumentedBridge
+
+# Time every Bridge.call per method
+Bridge = InstrumentedBridge(Bridge)
+
+BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+
+HOST_ANIMATION_KEYS = ('hi', 'hm', 'hh')
+
+def load_frames():
+    """Open the packed frame library (built from frames.h only when it changed);
+    None if it is missing or unreadable, which only disables the host animations"""
+    for header in (os.path.join(BASE_DIR, "sketch", "frames.h"), os.path.join(BASE_DIR, "frames.h")):
+        if os.path.exists(header):
+            try:
+                return open_library(header, os.path.join(BASE_DIR, "frames.bin"))
+            except Exception as e:
+                print(f"[WARN] Frame library unavailable: {e}")
+    return None
+
+def library_animation(frames, name, names, fps):
+    return Animation(name, [frame_words(frames[n]) for n in names], fps=fps)
+
+def send_frame(words):
+    Bridge.call("set_frame", *words)
+
+def stop_streaming(player):
+    if player.playing:
+        stats = player.stop()
+        print(f"📊 {stats.summary()}")
 
 def main():
     print("=" * 60)
@@ -21,17 +54,37 @@ def main():
     print("\n🎬 Animação:")
     print("  i - Iniciar animação Sig1-10    s - Parar animação")
     print("  mi - Iniciar animação Mic1-4    ms - Parar animação Mic")
+    print("\n📺 Streaming do host (sem recompilar):")
+    print("  hs - Iniciar varredura (20 FPS)    hp - Parar streaming")
+    print("  hi - Sig1-10 (10 FPS)    hm - Mic1-4 (8 FPS)    hh - Heart1-8 (12 FPS)")
     print("\n⚙️  Utilidades:")
     print("  z - Zero (limpar display)    q - Sair")
     print("\n" + "=" * 60)
     print()
     
+    player = AnimationPlayer(send_frame)
+    frames = load_frames()
+    host_animations = {}
+    if frames:
+        try:
+            host_animations = {
+                'hi': library_animation(frames, "Sig1-10", [f"Sig{i}" for i in range(1, 11)], 10.0),
+                'hm': library_animation(frames, "Mic1-4", [f"Mic{i}" for i in range(1, 5)], 8.0),
+                'hh': library_animation(frames, "Heart1-8", [f"Heart{i}" for i in range(1, 9)], 12.0),
+            }
+        except Exception as e:
+            print(f"[WARN] Frame library incomplete: {e}")
+    if not host_animations:
+        print("⚠️  Biblioteca de frames indisponível: hi/hm/hh desativados")
+
     try:
         while True:
             key = input("Digite sua escolha: ").strip().lower()
             
             if key == 'q':
                 print("Encerrando...")
+                stop_streaming(player)
+                print(REGISTRY.summary())
                 break
             elif key == '0':
                 print("📤 Enviando LittleHeart...")
@@ -112,22 +165,37 @@ def main():
                 print("📤 Limpando display (Zero)...")
                 Bridge.call("Zero")
             elif key == 'i':
+                stop_streaming(player)
                 print("🎬 Iniciando animação Sig1-10...")
                 Bridge.call("StartAnimation")
             elif key == 's':
                 print("⏹️  Parando animação...")
                 Bridge.call("StopAnimation")
             elif key == 'mi':
+                stop_streaming(player)
                 print("🎬 Iniciando animação Mic1-4...")
                 Bridge.call("StartMicAnimation")
             elif key == 'ms':
                 print("⏹️  Parando animação Mic...")
                 Bridge.call("StopMicAnimation")
+            elif key == 'hs':
+                print("📺 Iniciando streaming da varredura...")
+                player.start(scanner(20.0))
+            elif key in host_animations:
+                print(f"📺 Iniciando streaming {host_animations[key].name}...")
+                player.start(host_animations[key])
+            elif key in HOST_ANIMATION_KEYS:
+                print("❌ Biblioteca de frames indisponível (frames.h/frames.bin).")
+            elif key == 'hp':
+                print("⏹️  Parando streaming...")
+                stop_streaming(player)
             else:
                 print("❌ Opção inválida! Consulte o menu acima.")
                 
     except KeyboardInterrupt:
         print("\nEncerrando...")
+        stop_streaming(player)
+        print(REGISTRY.summary())
     except Exception as e:
         print(f"[error] {e}", file=sys.stderr)
 
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""Bridge call latency metrics, exposed in Prometheus text format.
+
+`InstrumentedBridge` wraps the Bridge object and records, per method, the
+number of calls, errors and a latency histogram with fixed buckets. Every
+thread writes into its own shard of plain int/float slots, so the hot path
+takes no lock; shards are only summed when the metrics are read.
+
+    Bridge = InstrumentedBridge(Bridge)   # after `from arduino.app_utils import *`
+    Bridge.call("set_led", 5, 3, 1)
+    print(REGISTRY.summary())              # CLI: count, errors, p50/p95/p99
+    instrument_flask(app)                  # web UI: HTTP timings + GET /metrics
+"""
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+# Upper bounds in seconds, from sub-millisecond socket hops to stuck calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class HistogramSnapshot:
+    """Summed view of a histogram at one point in time"""
+    __slots__ = ("buckets", "counts", "total", "errors")
+
+    def __init__(self, buckets, counts, total, errors):
+        self.buckets = buckets
+        self.counts = counts    # per bucket, the last one is +Inf
+        self.total = total      # sum of observed seconds
+        self.errors = errors
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by linear interpolation inside its bucket"""
+        count = self.count
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with per-thread shards (no lock on observe)"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._shards = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _shard(self) -> list:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            # bucket counts, +Inf count, sum of seconds, errors
+            shard = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def observe(self, seconds: float, error: bool = False):
+        shard = self._shard()
+        shard[bisect_left(self.buckets, seconds)] += 1
+        shard[-2] += seconds
+        if error:
+            shard[-1] += 1
+
+    def snapshot(self) -> HistogramSnapshot:
+        n = len(self.buckets) + 1
+        with self._lock:
+            shards = list(self._shards)
+        totals = [sum(column) for column in zip(*shards)] if shards else [0] * (n + 2)
+        return HistogramSnapshot(self.buckets, totals[:n], totals[n], totals[n + 1])
+
+
+class HistogramVec:
+    """A family of histograms keyed by label values"""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...],
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._children: Dict[tuple, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values) -> Histogram:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, Histogram(self.buckets))
+        return child
+
+    def items(self):
+        return sorted(self._children.items())
+
+
+class Metrics:
+    """Registry of histogram families and callback gauges"""
+
+    def __init__(self):
+        self._histograms: Dict[str, HistogramVec] = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> HistogramVec:
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = HistogramVec(name, help, labelnames, buckets)
+            return self._histograms[name]
+
+    def gauge(self, name: str, help: str, read: Callable, labelnames: Tuple[str, ...] = ()):
+        """Register a gauge read at scrape time; `read()` returns a number, or
+        a {label values tuple: number} dict when `labelnames` is given"""
+        with self._lock:
+            self._gauges[name] = (help, labelnames, read)
+
+    def render(self) -> str:
+        """All metrics in Prometheus text exposition format (0.0.4)"""
+        lines = []
+        for family in list(self._histograms.values()):
+            children = [(values, child.snapshot()) for values, child in family.items()]
+            lines += [f"# HELP {family.name} {family.help}", f"# TYPE {family.name} histogram"]
+            for values, snap in children:
+                labels = _labels(family.labelnames, values)
+                cumulative = 0
+                for bound, n in zip(family.buckets + (float("inf"),), snap.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{family.name}_bucket{_labels(family.labelnames, values, le=le)} {cumulative}")
+                lines.append(f"{family.name}_sum{labels} {snap.total:.6f}")
+                lines.append(f"{family.name}_count{labels} {cumulative}")
+            # bridge_call_duration_seconds -> bridge_call_errors_total, bridge_call_latency_seconds
+            base = family.name[:-len("_duration_seconds")] if family.name.endswith("_duration_seconds") else family.name
+            lines += [f"# HELP {base}_errors_total Failed observations of {family.name}",
+                      f"# TYPE {base}_errors_total counter"]
+            for values, snap in children:
+                lines.append(f"{base}_errors_total{_labels(family.labelnames, values)} {snap.errors}")
+            lines += [f"# HELP {base}_latency_seconds Quantiles estimated from {family.name}",
+                      f"# TYPE {base}_latency_seconds gauge"]
+            for values, snap in children:
+                for q in QUANTILES:
+                    lines.append(f"{base}_latency_seconds{_labels(family.labelnames, values, quantile=repr(q))} "
+                                 f"{snap.quantile(q):.6f}")
+        for name, (help, labelnames, read) in list(self._gauges.items()):
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+            try:
+                value = read()
+            except Exception as e:
+                print(f"[WARN] Gauge {name} failed: {e}")
+                continue
+            if labelnames:
+                for values, v in sorted(value.items()):
+                    lines.append(f"{name}{_labels(labelnames, values)} {v}")
+            else:
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, name: str = "bridge_call_duration_seconds") -> str:
+        """Human readable table of one histogram family, for the CLIs"""
+        family = self._histograms.get(name)
+        if family is None or not family.items():
+            return "No bridge calls recorded"
+        rows = [f"{'method':<24} {'calls':>7} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"]
+        for values, child in family.items():
+            snap = child.snapshot()
+            p50, p95, p99 = (snap.quantile(q) * 1000 for q in QUANTILES)
+            rows.append(f"{'/'.join(values):<24} {snap.count:>7} {snap.errors:>6} "
+                        f"{p50:>8.2f} {p95:>8.2f} {p99:>8.2f}")
+        return "\n".join(rows)
+
+
+def _labels(names, values, **extra) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+# Process-wide registry used by default
+REGISTRY = Metrics()
+
+
+class InstrumentedBridge:
+    """Drop-in Bridge wrapper that times every `call()` per method"""
+
+    def __init__(self, bridge, registry: Optional[Metrics] = None):
+        self._bridge = bridge
+        self._calls = (registry or REGISTRY).histogram(
+            "bridge_call_duration_seconds", "Bridge.call round trip to the MCU", ("method",))
+
+    def call(self, method: str, *args, **kwargs):
+        start = perf_counter()
+        error = True
+        try:
+            result = self._bridge.call(method, *args, **kwargs)
+            error = False
+            return result
+        finally:
+            self._calls.labels(method).observe(perf_counter() - start, error)
+
+    def __getattr__(self, name):
+        return getattr(self._bridge, name)
+
+
+def instrument_flask(app, registry: Optional[Metrics] = None, path: str = "/metrics"):
+    """Time every Flask request per route and serve the registry at `path`"""
+    from flask import Response, g, request
+
+    registry = registry or REGISTRY
+    http = registry.histogram("http_request_duration_seconds", "Flask handler time",
+                              ("method", "route", "status"))
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = perf_counter()
+
+    @app.after_request
+    def _record_timing(response):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            http.labels(request.method, route, str(response.status_code)).observe(
+                perf_counter() - start, response.status_code >= 500)
+        return response
+
+    def metrics_view():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+    app.add_url_rule(path, "metrics", metrics_view)
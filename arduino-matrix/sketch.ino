@@ -48,6 +48,7 @@ void setup() {
   Bridge.provide("StopAnimation", stop_animation);
   Bridge.provide("StartMicAnimation", start_mic_animation);
   Bridge.provide("StopMicAnimation", stop_mic_animation);
+  Bridge.provide("set_frame", set_frame);
 }
 
 void loop() {
@@ -85,6 +86,14 @@ void convertAndDisplay(const uint8_t* matrix, int delayMs) {
   delay(delayMs);
 }
 
+// Recebe um frame já compactado (uint32_t[4]) do host, sem delay
+void set_frame(uint32_t w0, uint32_t w1, uint32_t w2, uint32_t w3) {
+  animating = false;     // O host assume o controle do display
+  animatingMic = false;
+  uint32_t buffer[4] = {w0, w1, w2, w3 & 0xFF};
+  matrixWrite(buffer);
+}
+
 void play_LittleHeart() {
   convertAndDisplay(LittleHeart, 2000);
 }
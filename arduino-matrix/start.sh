@@ -3,8 +3,8 @@ set -e
 
 SKETCH_DIR="/app/sketch"
 
-echo ">>> Compiling sketch..."
-arduino-cli compile -b arduino:zephyr:unoq --output-dir "$SKETCH_DIR" "$SKETCH_DIR"
+echo ">>> Compiling sketch (skipped when cached)..."
+python3 /app/sketch_cache.py build --fqbn arduino:zephyr:unoq "$SKETCH_DIR"
 
 echo ">>> Flashing..."
 BIN_FILE=$(ls "$SKETCH_DIR"/*.elf-zsk.bin | head -n 1)
@@ -0,0 +1,112 @@
+"""framelib packing, frames.h parsing and the library file. Run from arduino-matrix/:
+
+    python3 -m unittest discover tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from framelib import FrameLibrary, build_library, frame_words, open_library, pack_pixels, parse_frames_h
+
+HEADER = """
+// Two test frames
+const uint8_t First[104] = {
+  1,0,0,0,0,0,0,0,0,0,0,0,0,
+  0,0,0,0,0,0,0,0,0,0,0,0,0,
+  0,0,0,0,0,0,0,0,0,0,0,0,0,
+  0,0,0,0,0,0,0,0,0,0,0,0,0,
+  0,0,0,0,0,0,0,0,0,0,0,0,0,
+  0,0,0,0,0,0,0,0,0,0,0,0,0,
+  0,0,0,0,0,0,0,0,0,0,0,0,0,
+  0,0,0,0,0,0,0,0,0,0,0,0,1
+};
+/* const uint8_t Hidden[104] = {0}; */
+const uint8_t Second[104] = {%s};
+"""
+
+
+def pixels(*lit):
+    values = [0] * 104
+    for i in lit:
+        values[i] = 1
+    return values
+
+
+class PackTest(unittest.TestCase):
+
+    def test_led_i_is_bit_i_lsb_first(self):
+        frame = pack_pixels(pixels(0, 9, 103))
+        self.assertEqual(frame, bytes([0x01, 0x02]) + bytes(10) + bytes([0x80]))
+        self.assertEqual(frame_words(frame), (1 | 1 << 9, 0, 0, 1 << 7))
+
+    def test_words_split_at_32_bits(self):
+        self.assertEqual(frame_words(pack_pixels(pixels(31, 32, 64))), (1 << 31, 1, 1, 0))
+
+    def test_wrong_pixel_count(self):
+        with self.assertRaises(ValueError):
+            pack_pixels([0] * 103)
+
+
+class HeaderTest(unittest.TestCase):
+
+    def test_parses_arrays_in_order_and_skips_comments(self):
+        frames = parse_frames_h(HEADER % ",".join(["1"] * 104))
+        self.assertEqual(list(frames), ["First", "Second"])
+        self.assertEqual(frames["First"], pack_pixels(pixels(0, 103)))
+        self.assertEqual(frames["Second"], b"\xff" * 13)
+
+    def test_bundled_frames_h(self):
+        with open(os.path.join(BASE_DIR, "frames.h")) as f:
+            frames = parse_frames_h(f.read())
+        self.assertTrue(frames)
+        self.assertTrue(all(len(frame) == 13 for frame in frames.values()))
+
+
+class LibraryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="framelib-test-")
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.header = os.path.join(self.tmp, "frames.h")
+        self.lib = os.path.join(self.tmp, "frames.bin")
+        self.write_header(["0"] * 104)
+
+    def write_header(self, second):
+        with open(self.header, "w") as f:
+            f.write(HEADER % ",".join(second))
+
+    def test_build_and_read(self):
+        self.assertEqual(build_library(self.header, self.lib), 2)
+        with FrameLibrary(self.lib) as lib:
+            self.assertEqual(lib.names, ["First", "Second"])
+            self.assertIn("First", lib)
+            self.assertEqual(bytes(lib["First"]), pack_pixels(pixels(0, 103)))
+            self.assertEqual(lib.words("Second"), (0, 0, 0, 0))
+            self.assertIsNone(lib.get("Hidden"))
+            self.assertFalse(lib.is_stale(self.header))
+
+    def test_open_rebuilds_only_when_the_header_changed(self):
+        open_library(self.header, self.lib).close()
+        built = os.stat(self.lib).st_mtime_ns
+        open_library(self.header, self.lib).close()
+        self.assertEqual(os.stat(self.lib).st_mtime_ns, built)
+
+        self.write_header(["1"] + ["0"] * 103)  # same size, newer mtime
+        os.utime(self.header, ns=(built + 10 ** 9, built + 10 ** 9))
+        with open_library(self.header, self.lib) as lib:
+            self.assertEqual(lib.words("Second"), (1, 0, 0, 0))
+
+    def test_open_replaces_a_corrupt_library(self):
+        with open(self.lib, "wb") as f:
+            f.write(b"not a frame library at all, just some bytes")
+        with open_library(self.header, self.lib) as lib:
+            self.assertEqual(len(lib), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
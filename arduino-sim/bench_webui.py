@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""HTTP and SSE load test for arduino-matrix-webui and arduino-led-webui.
+
+Run the web UI against the simulated router (router_sim.py), then:
+
+    python bench_webui.py --app matrix --pid $(pgrep -f matrix-webui/main.py) --save baseline.json
+    python bench_webui.py --app matrix --pid ... --compare baseline.json
+
+Scenarios:
+    matrix-toggle  concurrent POST /matrix/toggle storm (matrix app)
+    led-burst      POST /toggle/<led> in back-to-back bursts (led app)
+    sse-idle       hundreds of idle /status subscribers, probing GET latency meanwhile
+    sse-active     /status subscribers receiving the updates of a toggle driver
+
+Each scenario reports requests/s, latency percentiles and errors, and when the
+server's pid is known (--pid or --launch) the peak thread count and RSS read
+from /proc. --save writes the results as a baseline; --compare exits with
+status 1 when a metric regressed by more than --tolerance.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import selectors
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+from time import perf_counter
+from urllib.parse import urlsplit
+
+MATRIX_COLS = 13
+MATRIX_ROWS = 8
+LEDS = ("led3_r", "led3_g", "led3_b", "led4_r", "led4_g", "led4_b")
+
+DEFAULT_SCENARIOS = {
+    "matrix": ("matrix-toggle", "sse-idle", "sse-active"),
+    "led": ("led-burst", "sse-idle", "sse-active"),
+}
+
+# Metric -> +1 if higher is better, -1 if lower is better
+COMPARED = {
+    "rps": +1,
+    "p50_ms": -1,
+    "p99_ms": -1,
+    "errors": -1,
+    "threads_max": -1,
+    "rss_max_kb": -1,
+    "sse_events_per_s": +1,
+    "sse_delivery_p99_ms": -1,
+}
+
+
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class Recorder:
+    """Latencies and errors of one worker thread (merged after the run)"""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+
+    def add(self, seconds: float, ok: bool):
+        self.latencies.append(seconds)
+        if not ok:
+            self.errors += 1
+
+    @staticmethod
+    def summary(recorders, elapsed: float) -> dict:
+        latencies = sorted(l for r in recorders for l in r.latencies)
+        return {
+            "requests": len(latencies),
+            "errors": sum(r.errors for r in recorders),
+            "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        }
+
+
+class ProcessSampler:
+    """Samples Threads and VmRSS of the server from /proc/<pid>/status"""
+
+    def __init__(self, pid, interval: float = 0.2):
+        self.pid = pid
+        self.interval = interval
+        self.threads_max = 0
+        self.rss_max_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def read(self):
+        fields = {}
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                fields[name] = value.split()
+        return int(fields["Threads"][0]), int(fields["VmRSS"][0])
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                threads, rss = self.read()
+            except (OSError, KeyError, ValueError):
+                return
+            self.threads_max = max(self.threads_max, threads)
+            self.rss_max_kb = max(self.rss_max_kb, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if self.pid:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def result(self) -> dict:
+        if not self.pid:
+            return {}
+        return {"threads_max": self.threads_max, "rss_max_kb": self.rss_max_kb}
+
+
+def http_worker(host, port, deadline, next_request, recorder, burst=1, gap=0.0):
+    """Sends requests on one keep-alive connection until `deadline`"""
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    while perf_counter() < deadline:
+        for _ in range(burst):
+            method, path, body = next_request()
+            headers = {"Content-Type": "application/json"} if body is not None else {}
+            start = perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                ok = False
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=10)
+            recorder.add(perf_counter() - start, ok)
+        if gap:
+            time.sleep(gap)
+    conn.close()
+
+
+def run_http(host, port, concurrency, duration, next_request, burst=1, gap=0.0) -> dict:
+    recorders = [Recorder() for _ in range(concurrency)]
+    deadline = perf_counter() + duration
+    threads = [threading.Thread(target=http_worker,
+                                args=(host, port, deadline, next_request, rec, burst, gap))
+               for rec in recorders]
+    start = perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return Recorder.summary(recorders, perf_counter() - start)
+
+
+class SseSwarm:
+    """Many /status subscribers on raw sockets, all read by one selector thread"""
+
+    def __init__(self, host, port, path, count):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.count = count
+        self.connect_times = []
+        self.events = []        # arrival perf_counter() of every data event
+        self.failed = 0
+        self._selector = selectors.DefaultSelector()
+        self._buffers = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def open(self):
+        request = f"GET {self.path} HTTP/1.1\r\nHost: {self.host}\r\nAccept: text/event-stream\r\n\r\n".encode()
+        for _ in range(self.count):
+            start = perf_counter()
+            try:
+                sock = socket.create_connection((self.host, self.port), timeout=10)
+                sock.sendall(request)
+                head = sock.recv(4096)
+                if b" 200 " not in head.split(b"\r\n", 1)[0]:
+                    raise OSError("unexpected status")
+            except OSError:
+                self.failed += 1
+                continue
+            self.connect_times.append(perf_counter() - start)
+            sock.setblocking(False)
+            self._buffers[sock] = head.partition(b"\r\n\r\n")[2]
+            self._selector.register(sock, selectors.EVENT_READ)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            for key, _ in self._selector.select(timeout=0.1):
+                sock = key.fileobj
+                try:
+                    data = sock.recv(65536)
+                except OSError:
+                    data = b""
+                if not data:
+                    self._selector.unregister(sock)
+                    sock.close()
+                    continue
+                now = perf_counter()
+                buffer = self._buffers[sock] + data
+                *frames, self._buffers[sock] = buffer.split(b"\n\n")
+                self.events.extend(now for frame in frames if b"data:" in frame)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        for key in list(self._selector.get_map().values()):
+            key.fileobj.close()
+        self._selector.close()
+
+    def result(self) -> dict:
+        connects = sorted(self.connect_times)
+        return {
+            "subscribers": len(connects),
+            "subscribe_failed": self.failed,
+            "subscribe_p99_ms": round(percentile(connects, 0.99) * 1000, 2),
+        }
+
+
+def toggle_request(app):
+    """Request factory for the app's toggle endpoint"""
+    if app == "matrix":
+        def next_request():
+            body = json.dumps({"x": random.randrange(MATRIX_COLS), "y": random.randrange(MATRIX_ROWS)})
+            return "POST", "/matrix/toggle", body
+    else:
+        def next_request():
+            return "POST", f"/toggle/{random.choice(LEDS)}", None
+    return next_request
+
+
+def scenario_matrix_toggle(host, port, args):
+    return run_http(host, port, args.concurrency, args.duration, toggle_request("matrix"))
+
+
+def scenario_led_burst(host, port, args):
+    return run_http(host, port, args.concurrency, args.duration, toggle_request("led"),
+                    burst=args.burst, gap=args.burst_gap)
+
+
+def scenario_sse_idle(host, port, args):
+    swarm = SseSwarm(host, port, "/status", args.subscribers)
+    swarm.open()
+    try:
+        probe = "/matrix/get" if args.app == "matrix" else "/"
+        result = run_http(host, port, 1, args.duration, lambda: ("GET", probe, None))
+    finally:
+        swarm.close()
+    result.update(swarm.result())
+    return result
+
+
+def scenario_sse_active(host, port, args):
+    swarm = SseSwarm(host, port, "/status", args.subscribers)
+    swarm.open()
+    time.sleep(0.5)  # let the initial state frames arrive
+    baseline_events = len(swarm.events)
+    sent = []
+    next_request = toggle_request(args.app)
+
+    def driver():
+        method, path, body = next_request()
+        sent.append(perf_counter())
+        return method, path, body
+
+    try:
+        result = run_http(host, port, 1, args.duration, driver, gap=1.0 / args.rate)
+        time.sleep(0.5)  # drain in-flight events
+    finally:
+        swarm.close()
+
+    # Delivery latency: event arrival minus the most recent toggle sent before it
+    events = sorted(swarm.events[baseline_events:])
+    delays = []
+    i = 0
+    for arrived in events:
+        while i + 1 < len(sent) and sent[i + 1] <= arrived:
+            i += 1
+        if sent and sent[i] <= arrived:
+            delays.append(arrived - sent[i])
+    delays.sort()
+    result.update(swarm.result())
+    result.update({
+        "sse_events": len(events),
+        "sse_events_per_s": round(len(events) / args.duration, 1),
+        "sse_delivery_p50_ms": round(percentile(delays, 0.50) * 1000, 2),
+        "sse_delivery_p99_ms": round(percentile(delays, 0.99) * 1000, 2),
+    })
+    return result
+
+
+SCENARIOS = {
+    "matrix-toggle": scenario_matrix_toggle,
+    "led-burst": scenario_led_burst,
+    "sse-idle": scenario_sse_idle,
+    "sse-active": scenario_sse_active,
+}
+
+
+def wait_for_port(host, port, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.realpath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Returns (scenario, metric, old, new) for every regression beyond tolerance"""
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        for metric, direction in COMPARED.items():
+            if metric not in result or metric not in old:
+                continue
+            before, after = old[metric], result[metric]
+            if metric == "errors":
+                worse = after > before
+            elif before == 0:
+                continue
+            else:
+                change = (after - before) / before
+                worse = change * direction < -tolerance
+            if worse:
+                regressions.append((name, metric, before, after))
+    return regressions
+
+
+def print_result(name: str, result: dict):
+    print(f"\n== {name}")
+    for key, value in result.items():
+        print(f"   {key:<22} {value}")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Load test the LED / matrix web UIs")
+    parser.add_argument('--url', default="http://127.0.0.1:8000", help="web UI base URL")
+    parser.add_argument('--app', choices=sorted(DEFAULT_SCENARIOS), required=True)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help="scenario to run (repeatable, default: all for the app)")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument('--concurrency', type=int, default=16, help="HTTP client threads")
+    parser.add_argument('--burst', type=int, default=10, help="requests per burst (led-burst)")
+    parser.add_argument('--burst-gap', type=float, default=0.1, help="seconds between bursts (led-burst)")
+    parser.add_argument('--subscribers', type=int, default=300, help="SSE clients (sse-*)")
+    parser.add_argument('--rate', type=float, default=20.0, help="toggles/s during sse-active")
+    parser.add_argument('--pid', type=int, help="server pid, for thread count and RSS")
+    parser.add_argument('--launch', help="command starting the web UI (its pid is sampled)")
+    parser.add_argument('--save', help="write results to this baseline file")
+    parser.add_argument('--compare', help="baseline file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+
+    server = None
+    pid = args.pid
+    if args.launch:
+        server = subprocess.Popen(shlex.split(args.launch))
+        pid = server.pid
+        if not wait_for_port(host, port, 30.0):
+            server.terminate()
+            print(f"[ERROR] {args.url} did not come up", file=sys.stderr)
+            return 2
+
+    results = {}
+    try:
+        for name in args.scenario or DEFAULT_SCENARIOS[args.app]:
+            with ProcessSampler(pid) as sampler:
+                result = SCENARIOS[name](host, port, args)
+            result.update(sampler.result())
+            results[name] = result
+            print_result(name, result)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = {
+        "app": args.app,
+        "commit": git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {k: getattr(args, k) for k in ("duration", "concurrency", "burst", "subscribers", "rate")},
+        "scenarios": results,
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        print(f"\nCompared with {args.compare} ({baseline.get('commit') or 'unknown commit'}):")
+        for name, metric, before, after in regressions:
+            print(f"   REGRESSION {name} {metric}: {before} -> {after}")
+        if regressions:
+            return 1
+        print("   no regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""Simulated arduino-router: answers Bridge calls without a board.
+
+Listens on a Unix socket and speaks the same msgpack-rpc framing as the real
+router ([0, msgid, method, params] -> [1, msgid, error, result]). Instead of
+forwarding calls to the MCU, it implements the functions the sketches in this
+repository register with `Bridge.provide` and keeps the matrix, LED and
+animation state in memory.
+
+The MCU link is modelled with a base latency plus jitter per call, and calls
+are handled one at a time like the single-threaded sketch loop (unless
+--parallel). Frame functions hold the "MCU" as long as the sketch's delay()
+does (--no-sketch-delays to skip). This is enough to run the web UIs and CLIs
+on any Linux machine and load-test them:
+
+    python router_sim.py --socket /tmp/arduino-router.sock --latency-ms 3 --jitter-ms 1
+
+then mount that socket over /var/run/arduino-router.sock in the app container.
+"""
+import argparse
+import asyncio
+import os
+import random
+import signal
+import sys
+import time
+from collections import Counter
+
+import msgpack
+
+from framelib import MATRIX_COLS, MATRIX_ROWS, MATRIX_SIZE, frame_words, parse_frames_h
+
+BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+DEFAULT_SOCKET = "/var/run/arduino-router.sock"
+DEFAULT_FRAMES = os.path.join(BASE_DIR, "..", "arduino-matrix", "frames.h")
+
+REQUEST, RESPONSE, NOTIFY = 0, 1, 2
+LEDS = ("led3_r", "led3_g", "led3_b", "led4_r", "led4_g", "led4_b")
+FRAME_MASK = (0xFFFFFFFF, 0xFFFFFFFF, 0xFFFFFFFF, 0xFF)
+
+# delay() inside the sketch handlers, in ms (arduino-matrix/sketch.ino)
+FRAME_HOLD_MS = 2000
+STOP_ANIMATION_HOLD_MS = 100
+# playAnimation() frame delays, in ms
+ANIMATION_FRAME_MS = {"Sig": 200, "Mic": 200, "Heart": 50}
+
+
+class SimulatedBoard:
+    """In-memory MCU state plus the Bridge.provide'd functions"""
+
+    def __init__(self, frames):
+        self.frames = {name: frame_words(frame) for name, frame in frames.items()}
+        self.words = [0, 0, 0, 0]
+        self.leds = dict.fromkeys(LEDS, False)
+        self.blinking = dict.fromkeys(LEDS, False)
+        self.blink_period = 1000
+        self.animation = None
+        self.keywords = 0
+        self.methods = {
+            "set_led": self.set_led,
+            "clear_matrix": self.clear_matrix,
+            "get_matrix": self.get_matrix,
+            "get_frame": self.get_frame,
+            "set_frame": self.set_frame,
+            "set_frame_word": self.set_frame_word,
+            "set_leds": self.set_leds,
+            "get_leds": self.get_leds,
+            "keyword_detected": self.keyword_detected,
+            "StartAnimation": lambda: self.start_animation("Sig"),
+            "StopAnimation": self.stop_animation,
+            "StartMicAnimation": lambda: self.start_animation("Mic"),
+            "StopMicAnimation": self.stop_animation,
+            "$/sim/state": self.state,
+        }
+        for led in LEDS:
+            self.methods[f"toggle_{led}"] = lambda led=led: self.toggle(led)
+            self.methods[f"start_blink_{led}"] = lambda led=led: self.blink(led, True)
+            self.methods[f"stop_blink_{led}"] = lambda led=led: self.blink(led, False)
+        for name in self.frames:
+            self.methods.setdefault(name, lambda name=name: self.show(name))
+
+    def hold_ms(self, method: str) -> int:
+        """How long the sketch handler keeps the MCU busy"""
+        if method in self.frames:
+            return FRAME_HOLD_MS
+        if method in ("StopAnimation", "StopMicAnimation"):
+            return STOP_ANIMATION_HOLD_MS
+        return 0
+
+    def set_led(self, x, y, state):
+        if 0 <= x < MATRIX_COLS and 0 <= y < MATRIX_ROWS:
+            i = y * MATRIX_COLS + x
+            if state:
+                self.words[i >> 5] |= 1 << (i & 31)
+            else:
+                self.words[i >> 5] &= ~(1 << (i & 31))
+
+    def clear_matrix(self):
+        self.words = [0, 0, 0, 0]
+
+    def get_matrix(self):
+        value = sum(w << (32 * i) for i, w in enumerate(self.words))
+        return "[" + ",".join(str((value >> i) & 1) for i in range(MATRIX_SIZE)) + "]"
+
+    def get_frame(self):
+        return bytes(b for w in self.words for b in w.to_bytes(4, "little"))[:13].hex()
+
+    def set_frame(self, w0, w1, w2, w3):
+        self.animation = None
+        self.words = [w & m for w, m in zip((w0, w1, w2, w3), FRAME_MASK)]
+
+    def set_frame_word(self, index, word):
+        if 0 <= index < 4:
+            self.words[index] = word & FRAME_MASK[index]
+
+    def show(self, name):
+        self.words = list(self.frames[name])
+
+    def toggle(self, led):
+        self.leds[led] = not self.leds[led]
+
+    def blink(self, led, on):
+        self.blinking[led] = on
+        if not on:
+            self.leds[led] = False
+
+    def set_leds(self, on_mask, blink_mask, period_ms):
+        if period_ms > 0:
+            self.blink_period = period_ms
+        for i, led in enumerate(LEDS):
+            self.leds[led] = bool((on_mask >> i) & 1)
+            self.blinking[led] = bool((blink_mask >> i) & 1)
+
+    def get_leds(self):
+        on_mask = sum(1 << i for i, led in enumerate(LEDS) if self.leds[led])
+        blink_mask = sum(1 << i for i, led in enumerate(LEDS) if self.blinking[led])
+        return (self.blink_period << 12) | (blink_mask << 6) | on_mask
+
+    def keyword_detected(self):
+        self.keywords += 1
+        self.animation = "Heart"
+
+    def start_animation(self, kind):
+        self.animation = kind
+
+    def stop_animation(self):
+        self.animation = None
+        self.clear_matrix()
+
+    def state(self):
+        return {
+            "matrix": self.get_frame(),
+            "leds": self.leds,
+            "blinking": self.blinking,
+            "blink_period": self.blink_period,
+            "animation": self.animation,
+            "keywords": self.keywords,
+        }
+
+    async def animate(self):
+        """Steps the sketch's loop() animations while one is running"""
+        step = 0
+        while True:
+            kind = self.animation
+            names = [n for n in self.frames if kind and n.startswith(kind) and n[len(kind):].isdigit()]
+            if not names:
+                step = 0
+                await asyncio.sleep(0.1)
+                continue
+            names.sort(key=lambda n: int(n[len(kind):]))
+            self.words = list(self.frames[names[step % len(names)]])
+            step += 1
+            await asyncio.sleep(ANIMATION_FRAME_MS[kind] / 1000)
+
+
+class RouterSim:
+    """msgpack-rpc server on a Unix socket, with a latency/jitter model of the MCU link"""
+
+    def __init__(self, board: SimulatedBoard, latency_ms=2.0, jitter_ms=0.5, error_rate=0.0,
+                 parallel=False, sketch_delays=True, seed=None):
+        self.board = board
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.sketch_delays = sketch_delays
+        self.random = random.Random(seed)
+        self._mcu = None if parallel else asyncio.Lock()
+        self.calls = Counter()
+        self.errors = Counter()
+        self.clients = 0
+        self.started = time.monotonic()
+
+    def link_delay(self) -> float:
+        return max(0.0, self.latency + self.random.gauss(0.0, self.jitter)) if self.jitter else self.latency
+
+    async def dispatch(self, method: str, params):
+        if method.startswith("$/") and method != "$/sim/state":
+            return True  # $/register, $/reset, ... from providers
+        handler = self.board.methods.get(method)
+        if handler is None:
+            raise LookupError(f"method {method} not available")
+        if self._mcu is not None:
+            async with self._mcu:
+                return await self._execute(method, handler, params)
+        return await self._execute(method, handler, params)
+
+    async def _execute(self, method, handler, params):
+        await asyncio.sleep(self.link_delay())
+        if self.error_rate and self.random.random() < self.error_rate:
+            raise RuntimeError("simulated link error")
+        result = handler(*params)
+        if self.sketch_delays and self.board.hold_ms(method):
+            await asyncio.sleep(self.board.hold_ms(method) / 1000)
+        return result
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.clients += 1
+        unpacker = msgpack.Unpacker(raw=False)
+        packer = msgpack.Packer(use_bin_type=True)
+        tasks = set()
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                unpacker.feed(data)
+                for message in unpacker:
+                    task = asyncio.ensure_future(self._answer(message, writer, packer))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+        except ConnectionError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.clients -= 1
+            writer.close()
+
+    async def _answer(self, message, writer, packer):
+        kind = message[0]
+        if kind == REQUEST:
+            _, msgid, method, params = message
+        elif kind == NOTIFY:
+            _, method, params = message
+            msgid = None
+        else:
+            return
+        self.calls[method] += 1
+        try:
+            result, error = await self.dispatch(method, params or []), None
+        except Exception as e:
+            self.errors[method] += 1
+            result, error = None, str(e)
+        if msgid is not None and not writer.is_closing():
+            writer.write(packer.pack([RESPONSE, msgid, error, result]))
+
+    def report(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        total = sum(self.calls.values())
+        lines = [f"[SIM] {total} calls in {elapsed:.1f}s ({total / elapsed:.1f}/s), "
+                 f"{sum(self.errors.values())} errors, {self.clients} clients"]
+        for method, n in self.calls.most_common(10):
+            lines.append(f"[SIM]   {method:<20} {n:>8}")
+        return "\n".join(lines)
+
+    async def serve(self, path: str, stats_interval: float = 0.0):
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(self.handle, path=path)
+        os.chmod(path, 0o666)
+        animator = asyncio.ensure_future(self.board.animate())
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        print(f"[SIM] Listening on {path} ({len(self.board.methods)} methods, "
+              f"latency {self.latency * 1000:.1f}±{self.jitter * 1000:.1f} ms)")
+        try:
+            async with server:
+                while not stop.is_set():
+                    try:
+                        await asyncio.wait_for(stop.wait(), stats_interval or None)
+                    except asyncio.TimeoutError:
+                        print(self.report())
+        finally:
+            animator.cancel()
+            if os.path.exists(path):
+                os.unlink(path)
+            print(self.report())
+
+
+def load_frames(path: str):
+    if not os.path.exists(path):
+        print(f"[WARN] {path} not found, frame methods (Heart1, Sig1, ...) disabled")
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_frames_h(f.read())
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Simulated arduino-router for hardware-free testing")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help="Unix socket to listen on")
+    parser.add_argument('--frames', default=DEFAULT_FRAMES, help="frames.h providing Heart1, Sig1, ...")
+    parser.add_argument('--latency-ms', type=float, default=2.0, help="base MCU round trip")
+    parser.add_argument('--jitter-ms', type=float, default=0.5, help="standard deviation added to the latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of calls failing with an error")
+    parser.add_argument('--parallel', action='store_true', help="don't serialize calls like the sketch loop does")
+    parser.add_argument('--no-sketch-delays', action='store_true', help="skip the delay() of frame functions")
+    parser.add_argument('--stats-interval', type=float, default=0.0, help="print call counters every N seconds")
+    parser.add_argument('--seed', type=int, help="seed for jitter and errors")
+    args = parser.parse_args(argv)
+
+    board = SimulatedBoard(load_frames(args.frames))
+    sim = RouterSim(board, args.latency_ms, args.jitter_ms, args.error_rate,
+                    args.parallel, not args.no_sketch_delays, args.seed)
+    asyncio.run(sim.serve(args.socket, args.stats_interval))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
-import os, sys, getopt, signal, json, time, itertools, subprocess, threading
+import time
+_T0 = time.monotonic()  # start of the startup timing breakdown
+import os, sys, getopt, signal, json, itertools, subprocess, threading, select, socket, functools
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from typing import Optional
-from edge_impulse_linux.audio import AudioImpulseRunner
-from flask import Flask, Response, send_from_directory, abort
-from queue import Queue
-from weakref import WeakSet
+# numpy, decision.py, the Edge Impulse SDK and sounddevice are imported on
+# first use, so the web UI is up before any of them has loaded
+from sse import Broadcaster, serve
+from assets import AssetStore
 
 # =============================
 # Global Variables
@@ -14,6 +17,10 @@ runner = None   # Edge Impulse model runner
 
 # --- Hotplug flags ---
 shutdown_event = threading.Event()
+# Set by the hotplug watchdog when the USB card comes back
+usb_returned = threading.Event()
+# Set while main() is between runner sessions (safe to rebuild in-process)
+session_idle = threading.Event()
 
 # =============================
 # Detection Parameters
@@ -43,6 +50,67 @@ DEBOUNCE_SECONDS = _env_float("DEBOUNCE_SECONDS", 2.0)
 SELECT_SUPPRESS_SECONDS = _env_float("SELECT_SUPPRESS_SECONDS", 10.0)
 # Cooldown to prevent repeated "select" triggers in a short time
 SELECT_COOLDOWN_SECONDS = _env_float("SELECT_COOLDOWN_SECONDS", 5.0)
+# Temporal smoothing of scores before deciding: none | mean | ema
+SMOOTHING = (os.getenv("SMOOTHING") or "none").strip().lower()
+SMOOTHING_WINDOWS = int(_env_float("SMOOTHING_WINDOWS", 3))
+SMOOTHING_ALPHA = _env_float("SMOOTHING_ALPHA", 0.5)
+# Smoothed score a label must drop below before it can fire again (hysteresis)
+RELEASE_THRESH = _env_float("RELEASE_THRESH", THRESH * 0.5)
+# Optional JSONL file recording every classification window (see replay.py)
+TRACE_FILE = os.getenv("TRACE_FILE")
+
+@functools.lru_cache(maxsize=None)
+def smoothing_mode() -> str:
+    """SMOOTHING checked against decision.MODES (decision.py pulls in numpy,
+    so this runs on first use rather than at import)"""
+    from decision import MODES
+    if SMOOTHING in MODES:
+        return SMOOTHING
+    print(f"[WARN] ENV SMOOTHING='{SMOOTHING}' invalid; using default none")
+    return "none"
+
+# =============================
+# Label Scoring
+# =============================
+class LabelScores:
+    """Per-window scores in a fixed label order, stored in preallocated arrays.
+
+    The label order is resolved once from the model (alphabetical, for a
+    stable debug dump), so each window only copies floats into `values`.
+    """
+
+    def __init__(self, labels):
+        import numpy as np
+        self.labels = tuple(sorted(labels))
+        self.values = np.zeros(len(self.labels), dtype=np.float32)
+        self._slots = tuple(enumerate(self.labels))
+
+    @classmethod
+    def from_model_info(cls, model_info: dict, fallback_scores: Optional[dict] = None):
+        """Build from the model's label list (or a first window's scores); None if neither"""
+        labels = (model_info.get('model_parameters') or {}).get('labels') or list(fallback_scores or ())
+        return cls(labels) if labels else None
+
+    def load(self, scores: dict):
+        """Copy one window's classification dict into `values` (missing -> 0.0)"""
+        values = self.values
+        for i, l in self._slots:
+            values[i] = scores.get(l, 0.0)
+
+    def decision_engine(self) -> "DecisionEngine":
+        """DecisionEngine over this label order, configured from the environment"""
+        from decision import DecisionEngine
+        return DecisionEngine(self.labels, LABELS, THRESH, mode=smoothing_mode(),
+                              window=SMOOTHING_WINDOWS, alpha=SMOOTHING_ALPHA,
+                              release=RELEASE_THRESH)
+
+    def dump(self) -> str:
+        """Debug line with every label score plus the overall top label"""
+        top = int(self.values.argmax()) if len(self.values) else -1
+        line = "\t".join(f"{l}:{v:.2f}" for l, v in zip(self.labels, self.values))
+        if top >= 0:
+            line += f"\n top={self.labels[top]}:{self.values[top]:.2f}  has_select={'select' in self.labels}"
+        return line
 
 # =============================
 # Temporarily suppress STDERR (to hide ALSA warnings)
@@ -64,8 +132,15 @@ def _suppress_stderr():
             pass
 
 # =============================
-# Minimal Hotplug Helpers
+# Hotplug Detection (kernel uevents, polling fallback)
 # =============================
+NETLINK_KOBJECT_UEVENT = 15
+# Safety re-check interval when uevents are available; poll interval otherwise
+HOTPLUG_RECHECK_SECONDS = 5.0
+HOTPLUG_POLL_SECONDS = 1.0
+# How long the old session may take to unwind before falling back to a restart
+HOTPLUG_RESTART_GRACE_SECONDS = _env_float("HOTPLUG_RESTART_GRACE_SECONDS", 5.0)
+
 def _usb_card_present_proc() -> bool:
     """Returns True if /proc/asound/cards contains any card with 'USB'."""
     try:
@@ -75,15 +150,56 @@ def _usb_card_present_proc() -> bool:
     except Exception:
         return False
 
+def _open_uevent_socket():
+    """Subscribes to kernel uevents over netlink. Returns None if unavailable."""
+    try:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        sock.bind((0, 1))  # group 1 = kernel broadcasts
+        return sock
+    except (OSError, AttributeError) as e:
+        print(f"[AUDIO] Watchdog: netlink uevents unavailable ({e}); falling back to polling")
+        return None
+
+def _is_sound_uevent(msg: bytes) -> bool:
+    """True for 'ACTION@DEVPATH\\0KEY=VALUE\\0...' messages from the sound subsystem."""
+    return b'SUBSYSTEM=sound' in msg.split(b'\0')
+
+def _wait_for_sound_event(sock) -> bool:
+    """Blocks until a sound uevent arrives (True) or the re-check timeout expires (False)."""
+    deadline = time.monotonic() + HOTPLUG_RECHECK_SECONDS
+    while not shutdown_event.is_set():
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            return False
+        ready, _, _ = select.select([sock], [], [], timeout)
+        if not ready:
+            return False
+        if _is_sound_uevent(sock.recv(16384)):
+            # Coalesce the burst of card/control/pcm events for one plug
+            while select.select([sock], [], [], 0.05)[0]:
+                sock.recv(16384)
+            return True
+    return False
+
 def _hotplug_watchdog(runner_ref_fn):
-    """Monitors USB presence via /proc/asound/cards and stops runner when it disappears."""
+    """Monitors USB audio presence and stops/rebuilds the runner on unplug/replug.
+
+    Kernel uevents (netlink) wake the watchdog only when the sound subsystem
+    changes; /proc/asound/cards is then read once to confirm. Without netlink
+    it falls back to polling every HOTPLUG_POLL_SECONDS.
+    """
+    sock = _open_uevent_socket()
     last_present = _usb_card_present_proc()
-    print(f"[AUDIO] Watchdog: USB present? {last_present}")
+    print(f"[AUDIO] Watchdog: USB present? {last_present} ({'uevents' if sock else 'polling'})")
     while not shutdown_event.is_set():
-        time.sleep(1.0)
+        if sock:
+            _wait_for_sound_event(sock)
+        else:
+            time.sleep(HOTPLUG_POLL_SECONDS)
         present = _usb_card_present_proc()
         if last_present and not present:
-            print("[AUDIO] USB (alsa) disappeared. Stopping runner for restart...")
+            print("[AUDIO] USB (alsa) disappeared. Stopping runner...")
+            usb_returned.clear()
             try:
                 r = runner_ref_fn()
                 if r:
@@ -92,12 +208,16 @@ def _hotplug_watchdog(runner_ref_fn):
             except Exception as e:
                 print(f"[AUDIO] Watchdog: error stopping runner: {e}")
         elif (not last_present) and present:
-            print("[AUDIO] USB (alsa) returned. Restarting process (exit) for docker-compose restart...")
-            try:
-                sys.stdout.flush(); sys.stderr.flush()
-            except Exception:
-                pass
-            os._exit(0)
+            print("[AUDIO] USB (alsa) returned. Rebuilding runner in-process...")
+            usb_returned.set()
+            if not session_idle.wait(HOTPLUG_RESTART_GRACE_SECONDS):
+                # Old audio stream never unwound; fall back to a container restart
+                print("[AUDIO] Previous session still blocked. Restarting process (exit) for docker-compose restart...")
+                try:
+                    sys.stdout.flush(); sys.stderr.flush()
+                except Exception:
+                    pass
+                os._exit(0)
         last_present = present
 
 # =============================
@@ -112,19 +232,81 @@ LED_SET_1 = {
     "red": "/sys/class/leds/red:user/brightness",
 }
 
-def _write_led(name: str, on: bool):
-    """Write 1/0 to LED_SET_1 for the given color. Ignore failures (e.g., not present)."""
-    path = LED_SET_1.get(name)
-    
-    if not path:
-        return
-    
-    try:
-        with open(path, 'w') as f:
-            f.write('1' if on else '0')
-    except Exception as e:
-        if DEBUG:
-            print(f"[LED] could not set {path} -> {on}: {e}")
+class SysfsLeds:
+    """Writes LED brightness through descriptors opened once, skipping no-op writes.
+
+    Each brightness file is opened on first use and written with os.pwrite;
+    the last written value is cached so repeated colours cost no syscalls.
+    LEDs that fail to open are remembered as unavailable (e.g., not present).
+    """
+
+    _UNAVAILABLE = -1
+
+    def __init__(self, paths: dict):
+        self._paths = dict(paths)
+        self._fds = {}
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def _fd(self, name: str) -> int:
+        fd = self._fds.get(name)
+        if fd is None:
+            try:
+                fd = os.open(self._paths[name], os.O_WRONLY)
+            except OSError as e:
+                fd = self._UNAVAILABLE
+                if DEBUG:
+                    print(f"[LED] could not open {self._paths[name]}: {e}")
+            self._fds[name] = fd
+        return fd
+
+    def _write(self, name: str, on: bool):
+        if self._state.get(name) is on:
+            return
+        fd = self._fd(name)
+        if fd == self._UNAVAILABLE:
+            return
+        try:
+            os.pwrite(fd, b'1' if on else b'0', 0)
+            self._state[name] = on
+        except OSError as e:
+            # Drop the descriptor and cached state; reopen on next write
+            self._state.pop(name, None)
+            self._fds.pop(name, None)
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+            if DEBUG:
+                print(f"[LED] could not set {self._paths[name]} -> {on}: {e}")
+
+    def apply(self, wanted: set):
+        """Turn on exactly the LEDs in `wanted` as one transition.
+
+        LEDs going off are written before LEDs going on, so a colour change
+        never shows a mix of old and new colours, and the lock keeps
+        concurrent callers (e.g. the highlight timer) from interleaving.
+        """
+        with self._lock:
+            for n in self._paths:
+                if n not in wanted:
+                    self._write(n, False)
+            for n in self._paths:
+                if n in wanted:
+                    self._write(n, True)
+
+    def close(self):
+        with self._lock:
+            for fd in self._fds.values():
+                if fd != self._UNAVAILABLE:
+                    try:
+                        os.close(fd)
+                    except OSError:
+                        pass
+            self._fds.clear()
+            self._state.clear()
+
+leds = SysfsLeds({n: LED_SET_1[n] for n in LED_NAMES})
 
 def set_leds(color: str):
     """Set device LEDs for given color. Supported: blue, green, red, yellow, purple.
@@ -139,8 +321,7 @@ def set_leds(color: str):
         'purple': {'blue', 'red'},
     }
     wanted = mapping.get((color or '').lower(), set())
-    for n in LED_NAMES:
-        _write_led(n, n in wanted)
+    leds.apply(wanted)
 
 # =============================
 # Signal Handler (Ctrl+C)
@@ -170,10 +351,32 @@ def help():
 # =============================
 # Automatic USB Microphone Selection
 # =============================
-def auto_pick_usb_device_id():
+def _refresh_portaudio(sd) -> bool:
+    """Re-initializes PortAudio so devices plugged in after startup are listed.
+
+    sounddevice has no public call for this, only the private _terminate()
+    and _initialize(). They are used when present; otherwise (or if they
+    fail) the caller falls back to querying the current device list.
+    """
+    terminate = getattr(sd, '_terminate', None)
+    initialize = getattr(sd, '_initialize', None)
+    if not (callable(terminate) and callable(initialize)):
+        print("[AUDIO] This sounddevice version cannot refresh PortAudio; using the current device list")
+        return False
+    try:
+        terminate()
+        initialize()
+        return True
+    except Exception as e:
+        print(f"[AUDIO] Failed to refresh PortAudio device list: {e}")
+        return False
+
+def auto_pick_usb_device_id(refresh: bool = False):
     """
     Selects only the first input device whose name contains 'USB'.
     If none found, returns None (loop waits for hotplug).
+    With refresh=True, PortAudio is re-initialized first so devices plugged
+    in after startup become visible without restarting the process.
     """
     try:
         import sounddevice as sd
@@ -181,6 +384,9 @@ def auto_pick_usb_device_id():
         print(f"[AUDIO] 'sounddevice' unavailable ({e}). Keeping SDK default selection.")
         return None
 
+    if refresh:
+        _refresh_portaudio(sd)
+
     try:
         devices = sd.query_devices()
         for idx, dev in enumerate(devices):
@@ -192,12 +398,55 @@ def auto_pick_usb_device_id():
         print(f"[AUDIO] Failed to enumerate devices with 'sounddevice': {e}")
     return None
 
+# =============================
+# Startup Timing
+# =============================
+class StartupTimer:
+    """Start/end of each startup phase (seconds since classify.py started).
+
+    Phases overlap (model init runs alongside device enumeration), so the
+    report lists each one's own interval rather than a running total.
+    """
+
+    def __init__(self, t0: float):
+        self.t0 = t0
+        self.phases = {}
+        self._lock = threading.Lock()
+        self.reported = False
+
+    def record(self, name: str, start: float, end: Optional[float] = None):
+        end = time.monotonic() if end is None else end
+        with self._lock:
+            # Only the first occurrence counts (later hotplug sessions repeat phases)
+            self.phases.setdefault(name, (start - self.t0, end - self.t0))
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, start)
+
+    def report(self):
+        """Prints the breakdown once, when the first audio window has arrived"""
+        with self._lock:
+            if self.reported:
+                return
+            self.reported = True
+            phases = sorted(self.phases.items(), key=lambda p: p[1])
+        parts = [f"{name} {start:.2f}-{end:.2f}s ({end - start:.2f}s)" for name, (start, end) in phases]
+        print(f"[STARTUP] ready after {time.monotonic() - self.t0:.2f}s: " + " | ".join(parts), flush=True)
+
+startup = StartupTimer(_T0)
+
 # =============================
 # Web Status Management
 # =============================
-status_connections = WeakSet()
-current_status = "Say Select to start"
+WARMING_UP_STATUS = "Warming up..."
+current_status = WARMING_UP_STATUS
 current_color = ""
+status_broadcaster = Broadcaster({"status": current_status, "color": current_color})
 
 class WebStatus:
     _lock = threading.Lock()
@@ -206,8 +455,7 @@ class WebStatus:
 
     @classmethod
     def _broadcast(cls):
-        for q in status_connections:
-            q.put({"status": current_status, "color": current_color})
+        status_broadcaster.publish({"status": current_status, "color": current_color})
 
     @classmethod
     def update_status(cls, status: str):
@@ -258,58 +506,139 @@ class WebStatus:
                 cls._clear_timer = None
 
 # =============================
-# Flask App Setup
+# Web App (plain WSGI: the page and images need no framework, so the
+# server is up without importing Flask)
 # =============================
-app = Flask(__name__)
-
 BASE_DIR = os.path.dirname(os.path.realpath(__file__))
 
-@app.route("/")
-def home():
-    try:
-        with open("index.html", "r") as f:
-            content = f.read()
-        return Response(content, mimetype='text/html')
-    except Exception as e:
-        print(f"[ERROR] Failed to serve index.html: {e}")
-        return "Error loading page. Check if index.html exists in the same directory as classify.py"
+STATIC_FILES = {
+    'index.html',
+    'arduino.png', 'edgeimpulse.png', 'foundries.png', 'qualcomm.png',
+    'off.png', 'blue.png', 'green.png', 'purple.png', 'red.png', 'yellow.png',
+}
+
+# Loaded and compressed once; / is index.html, /stream is handled by sse.py
+assets = AssetStore(BASE_DIR, sorted(STATIC_FILES))
+app = assets.wsgi
+
+# =============================
+# Keyword Decision Session
+# =============================
+class DeviceActions:
+    """Side effects of keyword decisions: web UI status and device LEDs."""
 
-@app.route("/stream")
-def stream():
-    def eventStream():
-        q = Queue()
+    def select_armed(self, now: float, score: float):
+        WebStatus.update_status("Select the Color:")
+
+    def select_cooldown(self, now: float, score: float):
+        pass
+
+    def color(self, now: float, label: str, score: float):
+        WebStatus.update_status("Say \"Select\" to start")
+        WebStatus.update_color(label)
+        # Update device LEDs to reflect recognized color
         try:
-            status_connections.add(q)
-            # Send initial state
-            q.put({"status": current_status, "color": current_color})
-            
-            while True:
-                data = q.get()
-                if data:
-                    yield f"data: {json.dumps(data)}\n\n"
-        except Exception as e:
-            print(f"[ERROR] Stream error: {e}")
-            
-    return Response(eventStream(), mimetype="text/event-stream")
-
-@app.route('/<path:filename>')
-def serve_static(filename):
-    allowed = {
-        'arduino.png', 'edgeimpulse.png', 'foundries.png', 'qualcomm.png', 
-        'off.png', 'blue.png', 'green.png', 'purple.png', 'red.png', 'yellow.png',
-        'favicon.ico'
-    }
-    if filename in allowed:
-        p = os.path.join(BASE_DIR, filename)
-        if os.path.exists(p):
-            return send_from_directory(BASE_DIR, filename)
-    abort(404)
+            set_leds(label)
+        except Exception:
+            # Don't let LED errors affect main flow
+            if DEBUG:
+                print(f"[LED] set_leds failed for {label}")
+
+    def select_expired(self, now: float):
+        WebStatus.update_status("Say \"Select\" to start")
+        # turn off any leds when select window expires
+        try:
+            set_leds("")
+        except Exception:
+            if DEBUG:
+                print("[LED] failed to clear LEDs on select_window_expired")
+
+def run_session(items, model_info: dict, actions: DeviceActions, clock=time.time, trace=None):
+    """Runs the select/colour state machine over (res, audio) items from a classifier.
+
+    `clock` supplies the timestamp of each window (replays pass trace time) and
+    `trace`, if given, is a text file that receives one JSON line per window.
+    """
+    from decision import SelectStateMachine, READY, SELECT_ARMED, SELECT_COOLDOWN, COLOR_ACCEPTED, SELECT_EXPIRED
+
+    # Fixed label order + preallocated score vector (resolved on the first
+    # window instead if the model info doesn't list labels)
+    label_scores = LabelScores.from_model_info(model_info)
+    engine = label_scores.decision_engine() if label_scores else None
+
+    # Select window, cooldown and debounce (see decision.py)
+    machine = SelectStateMachine(DEBOUNCE_SECONDS, SELECT_SUPPRESS_SECONDS,
+                                 SELECT_COOLDOWN_SECONDS, COLOR)
+
+    if trace:
+        trace.write(json.dumps({"model_info": model_info}) + "\n")
+
+    for res, audio in items:
+        now = clock()
+        if trace:
+            trace.write(json.dumps({"t": now, "res": res}) + "\n")
+
+        # Total processing time (ms)
+        total_ms = res['timing']['dsp'] + res['timing']['classification']
+        if label_scores is None:
+            label_scores = LabelScores.from_model_info(model_info, res['result']['classification'])
+            engine = label_scores.decision_engine()
+        label_scores.load(res['result']['classification'])
+
+        if DEBUG:
+            # --- DEBUG: dump all label scores before best_label selection ---
+            print(f"Scores ({total_ms} ms): {label_scores.dump()}", flush=True)
+            # --- end DEBUG ---
+
+        # Decision among the labels we care about (smoothed, see decision.py)
+        best_idx = engine.update(label_scores.values)
+        best_label = label_scores.labels[best_idx] if best_idx >= 0 else None
+        best_score = engine.score if best_idx >= 0 else 0.0
+
+        act = machine.step(now, best_label, best_score)
+        if act & READY:
+            print(f"[READY] Debounce window elapsed ({DEBOUNCE_SECONDS}s). Listening/publishing re-enabled.")
+        if act & SELECT_COOLDOWN:
+            print("select_cooldown")
+            actions.select_cooldown(now, best_score)
+        elif act & SELECT_ARMED:
+            actions.select_armed(now, best_score)
+            print("\n" + "="*52)
+            print(f"  SELECT ARMED  score={best_score:.2f}  (window until {machine.select_window_until:.0f})")
+            print("="*52 + "\n", flush=True)
+        elif act & COLOR_ACCEPTED:
+            print(f"Result ({total_ms} ms.) {best_label}: {best_score:.2f}", flush=True)
+            actions.color(now, best_label, best_score)
+        elif act & SELECT_EXPIRED:
+            print("select_window_expired", flush=True)
+            actions.select_expired(now)
+
+# =============================
+# Model Warm-up
+# =============================
+def _start_runner(modelfile: str):
+    """Imports the SDK and loads the model; runs on the warm-up thread while
+    the main thread enumerates audio devices. Returns (runner, model_info)."""
+    global runner
+    with startup.phase("sdk import"):
+        from edge_impulse_linux.audio import AudioImpulseRunner
+    with startup.phase("model init"):
+        r = runner = AudioImpulseRunner(modelfile)
+        try:
+            model_info = r.init()
+        except Exception:
+            r.stop()
+            raise
+    with startup.phase("decision import"):
+        import decision  # noqa: F401 (loaded here rather than on the first window)
+    return r, model_info
 
 # =============================
 # Main Function
 # =============================
 def main(argv):
     global runner
+
     try:
         opts, args = getopt.getopt(argv, "h", ["--help"])
     except getopt.GetoptError:
@@ -326,158 +655,111 @@ def main(argv):
     print(f"[CFG] THRESH={THRESH:.2f} (source={'ENV' if os.getenv('THRESH') else 'default'})")
     print(f"[CFG] DEBUG={DEBUG:.2f} (source={'ENV' if os.getenv('DEBUG') else 'default'})")
     print(f"[CFG] DEBOUNCE_SECONDS={DEBOUNCE_SECONDS:.2f} (source={'ENV' if os.getenv('DEBOUNCE_SECONDS') else 'default'})")
+    print(f"[CFG] SMOOTHING={SMOOTHING} windows={SMOOTHING_WINDOWS} alpha={SMOOTHING_ALPHA:.2f} release={RELEASE_THRESH:.2f}")
 
-    # Device ID selection
+    # Device ID selection (automatic selection happens in the loop, alongside model init)
     selected_device_id = None
     if len(args) >= 2:
         selected_device_id = int(args[1])
         print("Device ID " + str(selected_device_id) + " has been provided as an argument.")
-    else:
-        # No argument → try automatically selecting first USB
-        selected_device_id = auto_pick_usb_device_id()
-        if selected_device_id is not None:
-            print(f"[AUDIO] Device ID chosen automatically: {selected_device_id}")
-        else:
-            print("[AUDIO] No USB auto-selected; SDK may choose/ask.")
 
     # Resolve model path relative to script directory
     dir_path = os.path.dirname(os.path.realpath(__file__))
     modelfile = os.path.join(dir_path, model)
 
+    # Optional per-window trace for offline replay
+    trace = open(TRACE_FILE, 'a', buffering=1) if TRACE_FILE else None
+    if trace:
+        print(f"[CFG] Recording classification trace to {TRACE_FILE}")
+
     # --- Hotplug Loop ---
     shutdown_event.clear()
     runner_holder = {"runner": None}
     wd = threading.Thread(target=_hotplug_watchdog, args=(lambda: runner_holder.get("runner"),), daemon=True)
     wd.start()
-    print("[AUDIO] Hotplug watchdog started (scanning every 1s)")
-
+    print("[AUDIO] Hotplug watchdog started")
+
+    # Loads the next session's model while devices are enumerated (or while
+    # waiting for a microphone), so neither waits for the other
+    warmup = ThreadPoolExecutor(max_workers=1, thread_name_prefix="warmup")
+    pending = None  # Future of (runner, model_info)
+    usb_seen = False  # a USB card was present at some session start
+    refresh_devices = False
     while not shutdown_event.is_set():
+        session_idle.set()
+        if pending is None:
+            pending = warmup.submit(_start_runner, modelfile)
         # Re-select first USB if no argument was passed; maintain if user provided one
         if len(args) < 2:
-            selected_device_id = auto_pick_usb_device_id()
+            with startup.phase("devices"):
+                selected_device_id = auto_pick_usb_device_id(refresh=refresh_devices)
+            refresh_devices = False
             if selected_device_id is None:
                 print("[AUDIO] No USB microphone found. Waiting for connection...")
-                time.sleep(1.0)
+                WebStatus.update_status("Connect a USB microphone")
+                # Woken immediately by the watchdog when the card returns
+                refresh_devices = usb_returned.wait(HOTPLUG_RECHECK_SECONDS)
+                usb_returned.clear()
                 continue
+            print(f"[AUDIO] Device ID chosen automatically: {selected_device_id}")
 
-        with AudioImpulseRunner(modelfile) as runner:
-            runner_holder["runner"] = runner
-            try:
-                # Initialize runner
-                model_info = runner.init()
-                print('Loaded runner for "' + model_info['project']['owner'] + ' / ' + model_info['project']['name'] + '"')
-
-                # Debounce control
-                last_send_ts = 0.0
-                next_ready_ts = 0.0
-                ready_announced = True
-                # Window for the next color command after "select"
-                select_window_until = 0.0
-                # Cooldown to block repeated "select" detections
-                select_block_until = 0.0
-                # Flag armed by "select" to allow processing the next color
-                select_pending = False
-
-                # ========= Main Classification Loop (with stderr suppressed in 1st iteration) =========
-                _iter = runner.classifier(device_id=selected_device_id)
-
-                # Suppress ALSA warnings only until first iteration (noisy moment)
-                with _suppress_stderr():
-                    try:
-                        first_item = next(_iter)
-                    except StopIteration:
-                        return  # Nothing to classify
-
-                # Process normally from already obtained first item
-                for res, audio in itertools.chain([first_item], _iter):
-                    now = time.time()
-
-                    # Announce when debounce window ends
-                    if not ready_announced and now >= next_ready_ts:
-                        print(f"[READY] Debounce window elapsed ({DEBOUNCE_SECONDS}s). Listening/publishing re-enabled.")
-                        ready_announced = True
-
-                    # Total processing time (ms)
-                    total_ms = res['timing']['dsp'] + res['timing']['classification']
-                    scores = res['result']['classification']
-
-                    if DEBUG:
-                        # --- DEBUG: dump all label scores before best_label selection ---
-                        print(f"Scores ({total_ms} ms): ", end="")
-                        for lbl, sc in sorted(scores.items(), key=lambda kv: kv[0]):  # alphabetical for stability
-                            print(f"{lbl}:{sc:.2f}\t", end="")
-                        print("", flush=True)
-                        # Optional quick checks:
-                        print(f" top={max(scores, key=scores.get)}:{scores[max(scores, key=scores.get)]:.2f}  has_select={ 'select' in scores }", flush=True)
-                        # --- end DEBUG ---
-
-                    # Best label among those we care about
-                    candidates = [l for l in LABELS if l in scores]
-                    best_label = max(candidates, key=lambda l: scores.get(l, -1.0)) if candidates else None
-                    best_score = scores.get(best_label, 0.0) if best_label else 0.0
-
-                    # Publish/print only outside debounce window
-                    if (now - last_send_ts) >= DEBOUNCE_SECONDS and best_label and best_score >= THRESH:
-                        # 1) Detecting 'select' → arm flag and start window for next color
-                        if best_label == "select":
-                            # If still under cooldown, ignore this select
-                            if now < select_block_until:
-                                print("select_cooldown")
-                                last_send_ts = now
-                                next_ready_ts = now + DEBOUNCE_SECONDS
-                                ready_announced = False
-                                continue
-                            WebStatus.update_status("Select the Color:")
-                            select_pending = True
-                            # start capture window for next color
-                            select_window_until = now + SELECT_SUPPRESS_SECONDS
-                            # start cooldown to avoid repeated select
-                            select_block_until = now + SELECT_COOLDOWN_SECONDS
-                            print("\n" + "="*52)
-                            print(f"  SELECT ARMED  score={best_score:.2f}  (window until {select_window_until:.0f})")
-                            print("="*52 + "\n", flush=True)
-                            continue
-                        # 2) It's a COLOR — only if select_pending is True and within the window
-                        if best_label in COLOR:
-                            if select_pending and now <= select_window_until:
-                                print(f"Result ({total_ms} ms.) {best_label}: {best_score:.2f}", flush=True)
-                                WebStatus.update_status("Say \"Select\" to start")
-                                WebStatus.update_color(best_label)
-                                # Update device LEDs to reflect recognized color
-                                try:
-                                    set_leds(best_label)
-                                except Exception:
-                                    # Don't let LED errors affect main flow
-                                    if DEBUG:
-                                        print(f"[LED] set_leds failed for {best_label}")
-
-                                # In any color case, consume the armed flag and apply debounce
-                                select_pending = False
-                                last_send_ts = now
-                                next_ready_ts = now + DEBOUNCE_SECONDS
-                                ready_announced = False
-                                continue
-                    # Always check for select window expiry even if no label passed threshold
-                    if select_pending and now > select_window_until:
-                        print("select_window_expired", flush=True)
-                        WebStatus.update_status("Say \"Select\" to start")
-                        select_pending = False
-                        # turn off any leds when select window expires
-                        try:
-                            set_leds("")
-                        except Exception:
-                            if DEBUG:
-                                print("[LED] failed to clear LEDs on select_window_expired")
-                    # fall through without publishing
-
-            finally:
+        session_idle.clear()
+        usb_returned.clear()
+        usb_seen = usb_seen or _usb_card_present_proc()
+        try:
+            runner, model_info = pending.result()
+        except Exception as e:
+            print(f"[AUDIO] Model init failed: {e}")
+            pending = None
+            time.sleep(HOTPLUG_POLL_SECONDS)
+            continue
+        pending = None
+        runner_holder["runner"] = runner
+        try:
+            print('Loaded runner for "' + model_info['project']['owner'] + ' / ' + model_info['project']['name'] + '"')
+
+            # ========= Main Classification Loop (with stderr suppressed in 1st iteration) =========
+            _iter = runner.classifier(device_id=selected_device_id)
+
+            # Suppress ALSA warnings only until first iteration (noisy moment)
+            with _suppress_stderr(), startup.phase("first window"):
                 try:
-                    runner.stop()
-                except Exception:
-                    pass
+                    first_item = next(_iter)
+                except StopIteration:
+                    _iter = None  # Nothing to classify (stream closed)
 
-            runner_holder["runner"] = None
+            # Process normally from already obtained first item
+            if _iter:
+                WebStatus.update_status("Say \"Select\" to start")
+                startup.report()
+                run_session(itertools.chain([first_item], _iter), model_info,
+                            DeviceActions(), trace=trace)
 
+        except Exception as e:
+            # Audio stream errors (e.g. device unplugged) end this session only
+            print(f"[AUDIO] Classifier session ended: {e}")
+        finally:
+            try:
+                runner.stop()
+            except Exception:
+                pass
+
+        runner_holder["runner"] = None
+
+        # An explicit device id skips the USB lookup above, so wait here for
+        # the unplugged card instead of re-initialising the model every loop
+        if len(args) >= 2 and usb_seen:
+            session_idle.set()
+            if not _usb_card_present_proc():
+                print("[AUDIO] USB microphone unplugged. Waiting for connection...")
+                WebStatus.update_status("Connect a USB microphone")
+            while not shutdown_event.is_set() and not _usb_card_present_proc():
+                usb_returned.wait(HOTPLUG_RECHECK_SECONDS)
+                usb_returned.clear()
+        WebStatus.update_status(WARMING_UP_STATUS)
+
+        # Device list may have changed while the session was running
+        refresh_devices = True
         time.sleep(0.5)
 
 # =============================
@@ -485,19 +767,18 @@ def main(argv):
 # =============================
 
 if __name__ == '__main__':
-    # Start Flask in a separate thread with logging
-    web_thread = threading.Thread(target=lambda: app.run(
-        host="0.0.0.0", 
-        port=8000, 
-        debug=False,
-        use_reloader=False
-    ))
+    startup.record("imports", _T0)
+    # Start the web server first, before anything heavy is loaded: routes on
+    # a worker pool, the /stream SSE clients on one asyncio event loop (sse.py).
+    # The page shows "Warming up..." until the first audio window arrives.
+    web_start = time.monotonic()
+    web_ready = threading.Event()
+    web_thread = threading.Thread(target=serve, args=(app, "0.0.0.0", 8000, {"/stream": status_broadcaster}),
+                                  kwargs={"ready": web_ready})
     web_thread.daemon = True
     web_thread.start()
-    print(f"[WEB] Server started at http://0.0.0.0:8000")
-    
-    # Initialize starting status
-    WebStatus.update_status("Say \"Select\" to start")
-    
-    # Your existing main() call
-    main(sys.argv[1:])
\ No newline at end of file
+    web_ready.wait(5.0)
+    startup.record("web", web_start)
+    print(f"[WEB] Server started at http://0.0.0.0:8000 ({time.monotonic() - _T0:.2f}s after start)")
+
+    main(sys.argv[1:])
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""Keyword decisions: temporal smoothing and the select/colour state machine.
+
+DecisionEngine keeps a ring buffer of the last N score vectors (one float per
+model label, in a fixed order) and decides on the smoothed posteriors instead
+of a single window:
+
+    none  fire as soon as the best label reaches the threshold (single window)
+    mean  moving average over the last `window` score vectors
+    ema   exponential moving average with factor `alpha`
+
+In the smoothed modes a label fires once, at the peak of its smoothed score
+(the first window where it stops rising while above `threshold`), and is
+re-armed only after dropping below `release` (hysteresis). The engine only
+needs NumPy, so recorded score traces can be replayed offline:
+
+    engine = DecisionEngine(labels, wanted=["red", "select"], threshold=0.6, mode="ema")
+    for t, idx, score in engine.run(score_rows):
+        print(t, labels[idx], score)
+
+SelectStateMachine turns those decisions into select/colour actions ("select"
+arms a window in which one colour is accepted, with debounce and cooldown).
+It keeps its state in __slots__ and returns int bit flags, so one instance
+per microphone can be stepped per window or run over whole arrays offline.
+"""
+from typing import Iterable, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+MODES = ("none", "mean", "ema")
+
+
+class DecisionEngine:
+
+    def __init__(self, labels: Sequence[str], wanted: Iterable[str], threshold: float,
+                 mode: str = "none", window: int = 3, alpha: float = 0.5,
+                 release: Optional[float] = None):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+        if window < 1:
+            raise ValueError("window must be >= 1")
+        if not 0.0 < alpha <= 1.0:
+            raise ValueError("alpha must be in (0, 1]")
+
+        self.labels = tuple(labels)
+        n = len(self.labels)
+        # Indexes of the labels allowed to fire (others only take part in smoothing)
+        wanted = set(wanted)
+        self.wanted = np.array([i for i, l in enumerate(self.labels) if l in wanted], dtype=np.intp)
+        self.threshold = float(threshold)
+        self.release = float(release) if release is not None else self.threshold * 0.5
+        self.mode = mode
+        self.window = int(window)
+        self.alpha = float(alpha)
+
+        self._ring = np.zeros((self.window, n), dtype=np.float64)
+        self._sum = np.zeros(n, dtype=np.float64)
+        self.smoothed = np.zeros(n, dtype=np.float64)
+        self._prev = np.zeros(n, dtype=np.float64)
+        self._scratch = np.zeros(n, dtype=np.float64)
+        self._wanted_scores = np.zeros(len(self.wanted), dtype=np.float64)
+        self._wanted_prev = np.zeros(len(self.wanted), dtype=np.float64)
+        self._wanted_armed = np.zeros(len(self.wanted), dtype=bool)
+        self._peaks = np.zeros(len(self.wanted), dtype=bool)
+        self._armed = np.ones(n, dtype=bool)
+        self._pos = 0
+        self._count = 0
+        # Score of the last decision (peak smoothed score in mean/ema modes)
+        self.score = 0.0
+
+    def reset(self):
+        """Forget all history (e.g. after a new audio session starts)"""
+        self._ring.fill(0.0)
+        self._sum.fill(0.0)
+        self.smoothed.fill(0.0)
+        self._prev.fill(0.0)
+        self._armed.fill(True)
+        self._pos = 0
+        self._count = 0
+        self.score = 0.0
+
+    def _smooth(self, scores):
+        if self.mode == "mean":
+            slot = self._ring[self._pos]
+            self._sum -= slot
+            slot[:] = scores
+            self._sum += slot
+            self._pos = (self._pos + 1) % self.window
+            if self._count < self.window:
+                self._count += 1
+            np.divide(self._sum, self._count, out=self.smoothed)
+        elif self.mode == "ema":
+            if self._count == 0:
+                self.smoothed[:] = scores
+                self._count = 1
+            else:
+                np.multiply(scores, self.alpha, out=self._scratch)
+                self.smoothed *= 1.0 - self.alpha
+                self.smoothed += self._scratch
+        else:
+            self.smoothed[:] = scores
+
+    def update(self, scores) -> int:
+        """Feed one window's score vector; returns the index of the label that fired, or -1"""
+        self._prev[:] = self.smoothed
+        self._smooth(scores)
+        if not len(self.wanted):
+            return -1
+
+        smoothed = self.smoothed
+        np.take(smoothed, self.wanted, out=self._wanted_scores)
+
+        if self.mode == "none":
+            best = int(self.wanted[self._wanted_scores.argmax()])
+            if smoothed[best] >= self.threshold:
+                self.score = float(smoothed[best])
+                return best
+            return -1
+
+        # Peak detection on every armed label, not just the current argmax: a
+        # label that peaked above threshold while another one took over still
+        # fires. If several peak in the same window the highest peak wins; the
+        # others stay armed and fire on a later window if still falling.
+        prev = self._wanted_prev
+        np.take(self._prev, self.wanted, out=prev)
+        np.take(self._armed, self.wanted, out=self._wanted_armed)
+        peaks = self._peaks
+        np.greater_equal(prev, self.threshold, out=peaks)
+        peaks &= self._wanted_scores <= prev
+        peaks &= self._wanted_armed
+        best = -1
+        if peaks.any():
+            j = int(np.where(peaks, prev, -np.inf).argmax())
+            best = int(self.wanted[j])
+            self._armed[best] = False
+            self.score = float(prev[j])
+
+        # Hysteresis: labels re-arm once they fall below the release level.
+        # Checked after peak detection, so the fall that ends one peak can't
+        # also re-arm the label and fire it a second time
+        for i in self.wanted:
+            if not self._armed[i] and smoothed[i] < self.release:
+                self._armed[i] = True
+        return best
+
+    def run(self, rows: Iterable) -> Iterator[Tuple[int, int, float]]:
+        """Replay score vectors (or dicts keyed by label); yields (row, label index, score)"""
+        vec = np.zeros(len(self.labels), dtype=np.float64)
+        for t, row in enumerate(rows):
+            if isinstance(row, dict):
+                for i, label in enumerate(self.labels):
+                    vec[i] = row.get(label, 0.0)
+                row = vec
+            idx = self.update(row)
+            if idx >= 0:
+                yield t, idx, self.score
+
+
+# Action flags returned by SelectStateMachine.step (may be combined with READY)
+NONE = 0
+READY = 1            # debounce window elapsed, publishing re-enabled
+SELECT_ARMED = 2     # "select" accepted, colour window open
+SELECT_COOLDOWN = 4  # "select" ignored (cooldown), debounce restarted
+COLOR_ACCEPTED = 8   # colour accepted inside the select window
+SELECT_EXPIRED = 16  # colour window closed without a colour
+
+
+class SelectStateMachine:
+    """Select/colour state machine driven by (timestamp, label, score) events."""
+
+    __slots__ = ("debounce", "select_window", "select_cooldown", "colors", "select_label",
+                 "threshold", "last_send_ts", "next_ready_ts", "ready_announced",
+                 "select_window_until", "select_block_until", "select_pending")
+
+    def __init__(self, debounce: float, select_window: float, select_cooldown: float,
+                 colors: Iterable[str], select_label: str = "select", threshold: float = 0.0):
+        self.debounce = float(debounce)
+        self.select_window = float(select_window)
+        self.select_cooldown = float(select_cooldown)
+        self.colors = frozenset(colors)
+        self.select_label = select_label
+        # Events scoring below this are treated as "no label"
+        self.threshold = float(threshold)
+        self.reset()
+
+    def reset(self):
+        self.last_send_ts = float("-inf")
+        self.next_ready_ts = 0.0
+        self.ready_announced = True
+        # Window for the next color command after "select"
+        self.select_window_until = 0.0
+        # Cooldown to block repeated "select" detections
+        self.select_block_until = 0.0
+        # Flag armed by "select" to allow processing the next color
+        self.select_pending = False
+
+    def step(self, now: float, label: Optional[str], score: float = 1.0) -> int:
+        """Feed one event (label None = nothing detected); returns action flags"""
+        actions = NONE
+
+        # Announce when debounce window ends
+        if not self.ready_announced and now >= self.next_ready_ts:
+            self.ready_announced = True
+            actions = READY
+
+        # Publish only outside debounce window
+        if label is not None and score >= self.threshold and now - self.last_send_ts >= self.debounce:
+            # 1) 'select' -> arm flag and start window for next color
+            if label == self.select_label:
+                if now < self.select_block_until:
+                    self._debounce(now)
+                    return actions | SELECT_COOLDOWN
+                self.select_pending = True
+                self.select_window_until = now + self.select_window
+                self.select_block_until = now + self.select_cooldown
+                return actions | SELECT_ARMED
+            # 2) A color, only if select is pending and within the window
+            if label in self.colors and self.select_pending and now <= self.select_window_until:
+                self.select_pending = False
+                self._debounce(now)
+                return actions | COLOR_ACCEPTED
+
+        # Always check for select window expiry even if no label passed threshold
+        if self.select_pending and now > self.select_window_until:
+            self.select_pending = False
+            actions |= SELECT_EXPIRED
+        return actions
+
+    def _debounce(self, now: float):
+        self.last_send_ts = now
+        self.next_ready_ts = now + self.debounce
+        self.ready_announced = False
+
+    def run_batch(self, timestamps, label_idx, scores, labels: Sequence[str], out=None):
+        """Step over arrays of events; label_idx indexes `labels` (-1 = none).
+
+        Returns a uint8 array of action flags, one per event (written into
+        `out` when given, so repeated batches don't allocate). Same result as
+        calling step() per event.
+
+        Only events that can act (a select or colour label at or above the
+        threshold) go through step(). Everything in between is "nothing
+        detected", where at most one READY and one SELECT_EXPIRED can happen.
+        Each gap costs one comparison, plus a binary search only when the
+        transition falls inside it. Real streams are
+        mostly below threshold, so most of the batch never reaches Python.
+        Timestamps must be non-decreasing; otherwise every event is stepped.
+        """
+        ts = np.asarray(timestamps, dtype=np.float64)
+        idx = np.asarray(label_idx)
+        n = len(ts)
+        if out is None:
+            out = np.zeros(n, dtype=np.uint8)
+        else:
+            out[:n] = NONE
+        if n == 0:
+            return out
+        sc = np.asarray(scores, dtype=np.float64)
+        if n > 1 and not (ts[1:] >= ts[:-1]).all():
+            return self._step_all(ts, idx, sc, labels, out)
+
+        relevant = np.array([label == self.select_label or label in self.colors for label in labels] + [False])
+        active = np.flatnonzero(relevant[idx] & (sc >= self.threshold))  # idx -1 -> the trailing False
+        step = self.step
+        quiet = self._quiet
+        tsl = ts.tolist()
+        gap_start = 0
+        for i, j, score in zip(active.tolist(), idx[active].tolist(), sc[active].tolist()):
+            if i > gap_start and (self.select_pending or not self.ready_announced):
+                quiet(ts, tsl, gap_start, i, out)
+            out[i] = step(tsl[i], labels[j], score)
+            gap_start = i + 1
+        if gap_start < n:
+            quiet(ts, tsl, gap_start, n, out)
+        return out
+
+    def _quiet(self, ts, tsl, start: int, end: int, out):
+        """step() for events start..end-1 that carry no label at or above threshold"""
+        last = tsl[end - 1]
+        if not self.ready_announced and last >= self.next_ready_ts:
+            k = start
+            if tsl[k] < self.next_ready_ts:
+                k += int(np.searchsorted(ts[start:end], self.next_ready_ts, "left"))
+            out[k] |= READY
+            self.ready_announced = True
+        if self.select_pending and last > self.select_window_until:
+            k = start
+            if tsl[k] <= self.select_window_until:
+                k += int(np.searchsorted(ts[start:end], self.select_window_until, "right"))
+            out[k] |= SELECT_EXPIRED
+            self.select_pending = False
+
+    def _step_all(self, ts, idx, sc, labels, out):
+        step = self.step
+        for i, (t, j, score) in enumerate(zip(ts.tolist(), idx.tolist(), sc.tolist())):
+            out[i] = step(t, labels[j] if j >= 0 else None, score)
+        return out
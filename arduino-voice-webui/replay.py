@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""Offline replay and benchmark harness for the voice pipeline.
+
+Feeds recorded classification traces (or WAV files) through the same
+select/colour state machine as classify.py (run_session), with the audio
+runner replaced by a stub, and reports decision latency, DSP/classification
+time, windows/second and false accept/reject rates. No microphone is needed,
+and JSONL traces don't need the .eim model either.
+
+Traces are JSONL files written by classify.py with TRACE_FILE=/path/trace.jsonl:
+    {"model_info": {...}}                  # once per session
+    {"t": 12.34, "res": {...}}             # one line per window
+Ground truth is optional: add "truth": "<label>" to the window where the
+keyword was spoken, or pass --truth with {"t": 12.3, "label": "red"} lines.
+With several inputs, each --truth line names its input with "file" (path or
+file name): every input is scored on its own timeline, then the counts are
+added up.
+
+Usage:
+    python replay.py trace.jsonl [trace2.jsonl ...] [--thresh 0.6 --smoothing ema ...]
+    python replay.py --model deployment.eim --truth truth.jsonl recording.wav
+    python replay.py --fuzz 1000000     # random events through SelectStateMachine.run_batch
+    python replay.py --fuzz 1000000 --fuzz-density 0.05   # mostly silence, like a real stream
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+import wave
+
+
+def _percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+class TraceRunner:
+    """Stands in for AudioImpulseRunner, replaying windows from a JSONL trace."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.model_info = {}
+        self.windows = []
+        self.truth = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                row = json.loads(line)
+                if 'model_info' in row:
+                    if not self.model_info:
+                        self.model_info = row['model_info']
+                    continue
+                self.windows.append((float(row['t']), row['res']))
+                if row.get('truth'):
+                    self.truth.append((float(row['t']), row['truth']))
+        self.now = self.windows[0][0] if self.windows else 0.0
+        self.yielded_at = 0.0
+
+    def init(self) -> dict:
+        return self.model_info
+
+    def classifier(self, device_id=None):
+        for t, res in self.windows:
+            self.now = t
+            self.yielded_at = time.perf_counter()
+            yield res, None
+
+    def clock(self) -> float:
+        return self.now
+
+    def audio_seconds(self) -> float:
+        """Length of audio the trace covers: first to last window plus one hop"""
+        if len(self.windows) < 2:
+            return 0.0
+        span = self.windows[-1][0] - self.windows[0][0]
+        return span + span / (len(self.windows) - 1)
+
+    def stop(self):
+        pass
+
+
+class WavRunner(TraceRunner):
+    """Classifies a WAV file offline with the real .eim model, window by window."""
+
+    def __init__(self, path: str, model: str, hop_ms: float):
+        from edge_impulse_linux.audio import AudioImpulseRunner
+
+        self.path = path
+        self.windows = []
+        self.truth = []
+        self._runner = AudioImpulseRunner(os.path.abspath(model))
+        self.model_info = self._runner.init()
+        params = self.model_info['model_parameters']
+        self._rate = int(params['frequency'])
+        self._size = int(params['input_features_count'])
+        self._hop = max(1, int(self._rate * hop_ms / 1000.0))
+
+        with wave.open(path, 'rb') as w:
+            if w.getnchannels() != 1 or w.getsampwidth() != 2 or w.getframerate() != self._rate:
+                raise ValueError(f"{path}: need mono 16-bit PCM at {self._rate} Hz")
+            raw = w.readframes(w.getnframes())
+        import numpy as np
+        self._samples = np.frombuffer(raw, dtype='<i2')
+        self.now = 0.0
+        self.yielded_at = 0.0
+
+    def classifier(self, device_id=None):
+        for start in range(0, len(self._samples) - self._size + 1, self._hop):
+            window = self._samples[start:start + self._size]
+            res = self._runner.classify(window.tolist())
+            self.now = (start + self._size) / self._rate
+            self.yielded_at = time.perf_counter()
+            yield res, window
+
+    def audio_seconds(self) -> float:
+        return len(self._samples) / self._rate
+
+    def stop(self):
+        self._runner.stop()
+
+
+def _load_truth(path: str):
+    """[(t, label, file or None)] from a --truth JSONL file"""
+    truth = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                truth.append((float(row['t']), row['label'], row.get('file')))
+    return truth
+
+
+def _truth_for(truth, path: str):
+    """The --truth keywords of one input: lines naming it by path or file name, or naming no file"""
+    names = (path, os.path.basename(path), os.path.abspath(path))
+    return [(t, label) for t, label, file in truth if file is None or file in names]
+
+
+def replay(runner, classify, verbose: bool = False) -> dict:
+    """Runs one runner through classify.run_session and returns raw measurements"""
+    decisions = []
+    windows = []
+
+    class RecordingActions(classify.DeviceActions):
+        def select_armed(self, now, score):
+            decisions.append((now, 'select', score, time.perf_counter() - runner.yielded_at))
+
+        def color(self, now, label, score):
+            decisions.append((now, label, score, time.perf_counter() - runner.yielded_at))
+
+        def select_cooldown(self, now, score):
+            pass
+
+        def select_expired(self, now):
+            pass
+
+    def items():
+        for res, audio in runner.classifier():
+            windows.append((res['timing']['dsp'], res['timing']['classification']))
+            yield res, audio
+
+    out = sys.stdout if verbose else open(os.devnull, 'w')
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(out):
+        classify.run_session(items(), runner.init(), RecordingActions(), clock=runner.clock)
+    wall = time.perf_counter() - started
+    if out is not sys.stdout:
+        out.close()
+    return {'decisions': decisions, 'windows': windows, 'wall': wall, 'audio_seconds': runner.audio_seconds()}
+
+
+def _match(decisions, truth, tolerance: float):
+    """(detected, missed, latencies) of one input, decisions and truth on the same timeline"""
+    used = set()
+    latencies = []
+    missed = 0
+    for t, label in sorted(truth):
+        for i, (dt, dlabel, _, _) in enumerate(decisions):
+            if i not in used and dlabel == label and t <= dt <= t + tolerance:
+                used.add(i)
+                latencies.append(dt - t)
+                break
+        else:
+            missed += 1
+    return len(used), missed, latencies
+
+
+def score(inputs, tolerance: float, audio_seconds: float = 0.0, windows: int = 0) -> dict:
+    """Matches decisions to ground-truth keywords within `tolerance` seconds.
+
+    `inputs` is one (decisions, truth) pair per replayed input. Each input has
+    its own clock (a WAV starts at 0), so it is matched on its own and only
+    the counts are added up. False accepts are normalized by the amount of
+    audio (per hour and per window), which does not depend on how many
+    decisions were made, so configurations can be compared on the same
+    recordings."""
+    keywords = detected = missed = decided = 0
+    latencies = []
+    for decisions, truth in inputs:
+        found, lost, delays = _match(decisions, truth, tolerance)
+        keywords += len(truth)
+        decided += len(decisions)
+        detected += found
+        missed += lost
+        latencies += delays
+    false_accepts = decided - detected
+    return {
+        'keywords': keywords,
+        'detected': detected,
+        'false_accepts': false_accepts,
+        'false_rejects': missed,
+        'false_accepts_per_hour': 3600.0 * false_accepts / audio_seconds if audio_seconds > 0 else 0.0,
+        'false_accepts_per_window': false_accepts / windows if windows else 0.0,
+        'false_reject_rate': missed / keywords if keywords else 0.0,
+        'decision_latency_ms': {
+            'mean': 1000.0 * sum(latencies) / len(latencies) if latencies else 0.0,
+            'p95': 1000.0 * _percentile(latencies, 95),
+        },
+    }
+
+
+def report(results, tolerance: float) -> dict:
+    """Pooled timings and decisions of all results; accuracy if any has a 'truth' list"""
+    decisions = [d for r in results for d in r['decisions']]
+    windows = [w for r in results for w in r['windows']]
+    wall = sum(r['wall'] for r in results)
+    audio_seconds = sum(r['audio_seconds'] for r in results)
+    dsp = [w[0] for w in windows]
+    cls = [w[1] for w in windows]
+    host = [d[3] for d in decisions]
+    out = {
+        'windows': len(windows),
+        'windows_per_second': len(windows) / wall if wall > 0 else 0.0,
+        'audio_seconds': audio_seconds,
+        'dsp_ms': {'mean': sum(dsp) / len(dsp) if dsp else 0.0, 'p95': _percentile(dsp, 95)},
+        'classification_ms': {'mean': sum(cls) / len(cls) if cls else 0.0, 'p95': _percentile(cls, 95)},
+        'decisions': len(decisions),
+        'decisions_by_label': {},
+        'host_decision_ms': {'mean': 1000.0 * sum(host) / len(host) if host else 0.0,
+                             'max': 1000.0 * max(host, default=0.0)},
+    }
+    for _, label, _, _ in decisions:
+        out['decisions_by_label'][label] = out['decisions_by_label'].get(label, 0) + 1
+    if any(r.get('truth') for r in results):
+        inputs = [(r['decisions'], r.get('truth', [])) for r in results]
+        out['accuracy'] = score(inputs, tolerance, audio_seconds, len(windows))
+        # End-to-end: keyword onset -> decision (trace time) + host processing
+        out['end_to_end_latency_ms'] = out['accuracy']['decision_latency_ms']['mean'] + \
+            out['dsp_ms']['mean'] + out['classification_ms']['mean'] + out['host_decision_ms']['mean']
+    return out
+
+
+def _print_report(rep: dict):
+    print(f"Windows:          {rep['windows']} ({rep['audio_seconds']:.0f} s of audio, "
+          f"{rep['windows_per_second']:.0f} windows/s replayed)")
+    print(f"DSP:              mean {rep['dsp_ms']['mean']:.1f} ms, p95 {rep['dsp_ms']['p95']:.1f} ms")
+    print(f"Classification:   mean {rep['classification_ms']['mean']:.1f} ms, p95 {rep['classification_ms']['p95']:.1f} ms")
+    print(f"Decisions:        {rep['decisions']} {rep['decisions_by_label']}")
+    print(f"Host decision:    mean {rep['host_decision_ms']['mean']:.3f} ms, max {rep['host_decision_ms']['max']:.3f} ms")
+    acc = rep.get('accuracy')
+    if acc:
+        print(f"Keywords:         {acc['detected']}/{acc['keywords']} detected")
+        print(f"False accepts:    {acc['false_accepts']} ({acc['false_accepts_per_hour']:.1f} per hour of audio, "
+              f"{1000 * acc['false_accepts_per_window']:.2f} per 1000 windows)")
+        print(f"False rejects:    {acc['false_rejects']} ({100 * acc['false_reject_rate']:.1f}% of keywords)")
+        print(f"Decision latency: mean {acc['decision_latency_ms']['mean']:.0f} ms, p95 {acc['decision_latency_ms']['p95']:.0f} ms")
+        print(f"End-to-end:       {rep['end_to_end_latency_ms']:.0f} ms")
+
+
+def fuzz(classify, events: int, seed: int = 0, density: float = 1.0) -> dict:
+    """Random (timestamp, label, score) events through the state machine in one batch.
+    `density` is the fraction of events that carry a label at all; the rest are silence"""
+    import numpy as np
+    from decision import SelectStateMachine
+
+    labels = tuple(sorted(classify.LABELS))
+    rng = np.random.default_rng(seed)
+    timestamps = np.cumsum(rng.random(events) * 0.1)
+    label_idx = rng.integers(-1, len(labels), events)
+    label_idx[rng.random(events) >= density] = -1
+    scores = rng.random(events)
+    out = np.zeros(events, dtype=np.uint8)
+
+    machine = SelectStateMachine(classify.DEBOUNCE_SECONDS, classify.SELECT_SUPPRESS_SECONDS,
+                                 classify.SELECT_COOLDOWN_SECONDS, classify.COLOR,
+                                 threshold=classify.THRESH)
+    started = time.perf_counter()
+    machine.run_batch(timestamps, label_idx, scores, labels, out)
+    elapsed = time.perf_counter() - started
+    return {
+        'events': events,
+        'density': density,
+        'events_per_second': events / elapsed if elapsed > 0 else 0.0,
+        'ns_per_event': 1e9 * elapsed / events if events else 0.0,
+        'actions': {int(flag): int(n) for flag, n in enumerate(np.bincount(out)) if n},
+    }
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Replay voice traces through the classify.py state machine")
+    parser.add_argument('inputs', nargs='*', help="JSONL traces or WAV files")
+    parser.add_argument('--fuzz', type=int, metavar='N', help="benchmark the state machine with N random events")
+    parser.add_argument('--fuzz-density', type=float, default=1.0, metavar='F',
+                        help="fraction of fuzz events that carry a label (default 1)")
+    parser.add_argument('--model', help=".eim model (required for WAV input)")
+    parser.add_argument('--truth', help="JSONL ground truth: {\"t\": seconds, \"label\": ..., \"file\": input}")
+    parser.add_argument('--tolerance', type=float, default=1.5, help="max seconds from keyword to decision")
+    parser.add_argument('--hop-ms', type=float, default=250.0, help="window hop for WAV input")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    parser.add_argument('--verbose', action='store_true', help="show classify.py output")
+    # classify.py configuration (same names as its environment variables)
+    for name in ('THRESH', 'DEBOUNCE_SECONDS', 'SELECT_SUPPRESS_SECONDS', 'SELECT_COOLDOWN_SECONDS',
+                 'SMOOTHING', 'SMOOTHING_WINDOWS', 'SMOOTHING_ALPHA', 'RELEASE_THRESH'):
+        parser.add_argument('--' + name.lower().replace('_', '-'), dest=name)
+    args = parser.parse_args(argv)
+
+    # classify.py reads its configuration from the environment at import time
+    for name, value in vars(args).items():
+        if name.isupper() and value is not None:
+            os.environ[name] = value
+    sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+    import classify
+
+    if args.fuzz:
+        rep = fuzz(classify, args.fuzz, density=args.fuzz_density)
+        print(json.dumps(rep, indent=2) if args.json else
+              f"{rep['events']} events: {rep['events_per_second'] / 1e6:.2f} M events/s "
+              f"({rep['ns_per_event']:.0f} ns/event), actions {rep['actions']}")
+        return 0
+    if not args.inputs:
+        parser.error("no input traces given")
+
+    truth = _load_truth(args.truth) if args.truth else []
+    if len(args.inputs) > 1 and any(file is None for _, _, file in truth):
+        parser.error("with several inputs, every --truth line needs a \"file\"")
+    results = []
+    for path in args.inputs:
+        if path.lower().endswith('.wav'):
+            if not args.model:
+                parser.error("WAV input needs --model")
+            runner = WavRunner(path, args.model, args.hop_ms)
+        else:
+            runner = TraceRunner(path)
+        try:
+            result = replay(runner, classify, args.verbose)
+        finally:
+            runner.stop()
+        result['truth'] = runner.truth + _truth_for(truth, path)
+        results.append(result)
+
+    rep = report(results, args.tolerance)
+    if args.json:
+        print(json.dumps(rep, indent=2))
+    else:
+        _print_report(rep)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
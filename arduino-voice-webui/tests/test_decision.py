@@ -0,0 +1,110 @@
+"""DecisionEngine peak firing and SelectStateMachine batches. Run from arduino-voice-webui/:
+
+    python3 -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from decision import COLOR_ACCEPTED, READY, SELECT_ARMED, SELECT_EXPIRED, DecisionEngine, SelectStateMachine
+
+LABELS = ("blue", "noise", "red", "select")
+WANTED = ("blue", "red", "select")
+
+
+def fired(engine, rows):
+    return [(t, engine.labels[i], round(score, 2)) for t, i, score in engine.run(rows)]
+
+
+class PeakFiringTest(unittest.TestCase):
+
+    def engine(self, **kwargs):
+        kwargs.setdefault("mode", "ema")
+        kwargs.setdefault("alpha", 1.0)  # no smoothing: scores are the raw rows
+        return DecisionEngine(LABELS, WANTED, 0.8, **kwargs)
+
+    def test_fires_once_at_the_peak(self):
+        rows = [{"red": 0.5}, {"red": 0.85}, {"red": 0.95}, {"red": 0.9}, {"red": 0.85}, {"red": 0.1}]
+        self.assertEqual(fired(self.engine(), rows), [(3, "red", 0.95)])
+
+    def test_rearms_below_release(self):
+        rows = [{"red": 0.9}, {"red": 0.5}, {"red": 0.9}, {"red": 0.1}, {"red": 0.9}, {"red": 0.1}]
+        # 0.5 is above the default release (0.4), so the second peak is ignored
+        self.assertEqual(fired(self.engine(), rows), [(1, "red", 0.9), (5, "red", 0.9)])
+
+    def test_overlapping_keywords_both_fire(self):
+        # "select" peaks, then "red" overtakes it in the window where select falls
+        rows = [
+            {"noise": 0.9},
+            {"select": 0.9, "red": 0.1},
+            {"select": 0.85, "red": 0.95},
+            {"select": 0.2, "red": 0.9},
+            {"noise": 0.9},
+        ]
+        self.assertEqual(fired(self.engine(), rows), [(2, "select", 0.9), (3, "red", 0.95)])
+
+    def test_simultaneous_peaks_fire_highest_first(self):
+        # Both fall in window 1: red wins, blue stays armed and fires on its
+        # next fall (with the score it had before that fall)
+        rows = [{"blue": 0.9, "red": 0.95}, {"blue": 0.85, "red": 0.9}, {"blue": 0.8, "red": 0.1}, {}]
+        self.assertEqual(fired(self.engine(), rows), [(1, "red", 0.95), (2, "blue", 0.85)])
+
+    def test_unwanted_labels_never_fire(self):
+        rows = [{"noise": 0.99}, {"noise": 0.5}, {}]
+        self.assertEqual(fired(self.engine(), rows), [])
+
+    def test_mode_none_fires_every_window_above_threshold(self):
+        rows = [{"red": 0.9}, {"red": 0.95}, {"blue": 0.85, "red": 0.3}]
+        self.assertEqual(fired(self.engine(mode="none"), rows),
+                         [(0, "red", 0.9), (1, "red", 0.95), (2, "blue", 0.85)])
+
+
+class RunBatchTest(unittest.TestCase):
+
+    def machine(self):
+        return SelectStateMachine(2.0, 10.0, 3.0, ("blue", "red"), threshold=0.8)
+
+    def stepped(self, ts, idx, sc, labels):
+        machine = self.machine()
+        return [machine.step(t, labels[j] if j >= 0 else None, s) for t, j, s in zip(ts, idx, sc)]
+
+    def test_same_flags_as_step(self):
+        labels = ("blue", "noise", "red", "select")
+        for seed, density in ((0, 1.0), (1, 0.3), (2, 0.02)):
+            rng = np.random.default_rng(seed)
+            n = 5000
+            ts = np.cumsum(rng.random(n) * 0.2)
+            ts[100:110] = ts[100]  # equal timestamps
+            idx = rng.integers(-1, len(labels), n)
+            idx[rng.random(n) >= density] = -1
+            sc = rng.random(n)
+            flags = self.machine().run_batch(ts, idx, sc, labels)
+            self.assertEqual(flags.tolist(), self.stepped(ts.tolist(), idx.tolist(), sc.tolist(), labels))
+            self.assertTrue(flags.any())
+
+    def test_transitions_inside_silence(self):
+        labels = ("red", "select")
+        # Debounce ends at exactly 3.0 (READY), the select window at exactly 15.0 (still open)
+        ts = [0.0, 1.0, 2.5, 3.0, 4.0, 5.0, 6.0, 15.0, 20.0, 21.0]
+        idx = [1, 0, -1, -1, -1, 1, -1, -1, -1, -1]
+        sc = [0.9, 0.9, 0, 0, 0, 0.9, 0, 0, 0, 0]
+        flags = self.machine().run_batch(ts, idx, sc, labels).tolist()
+        self.assertEqual(flags, [SELECT_ARMED, COLOR_ACCEPTED, 0, READY, 0, SELECT_ARMED, 0, 0, SELECT_EXPIRED, 0])
+        self.assertEqual(flags, self.stepped(ts, idx, sc, labels))
+
+    def test_unsorted_timestamps_and_reused_out(self):
+        labels = ("red", "select")
+        ts = [5.0, 0.0, 1.0, 30.0]
+        idx = [1, 1, 0, -1]
+        sc = [0.9, 0.9, 0.9, 0.0]
+        out = np.full(4, 0xFF, dtype=np.uint8)
+        self.machine().run_batch(ts, idx, sc, labels, out)
+        self.assertEqual(out.tolist(), self.stepped(ts, idx, sc, labels))
+
+
+if __name__ == "__main__":
+    unittest.main()
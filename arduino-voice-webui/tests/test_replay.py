@@ -0,0 +1,61 @@
+"""replay.py scoring across several inputs. Run from arduino-voice-webui/:
+
+    python3 -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from replay import _truth_for, report, score
+
+
+def decision(t, label):
+    return (t, label, 0.9, 0.0)
+
+
+class ScoreTest(unittest.TestCase):
+
+    def test_inputs_are_matched_on_their_own_timelines(self):
+        # Both WAVs start at 0 s: a pooled timeline would let the "red" at
+        # 5.0 s in the second file match the keyword at 4.5 s in the first
+        first = ([], [(4.5, "red")])
+        second = ([decision(5.0, "red")], [(10.0, "red")])
+        acc = score([first, second], tolerance=1.5, audio_seconds=3600.0, windows=100)
+        self.assertEqual((acc['keywords'], acc['detected']), (2, 0))
+        self.assertEqual((acc['false_accepts'], acc['false_rejects']), (1, 2))
+        self.assertEqual(acc['false_accepts_per_hour'], 1.0)
+        self.assertEqual(acc['false_reject_rate'], 1.0)
+
+    def test_counts_and_latencies_add_up(self):
+        first = ([decision(5.0, "red"), decision(8.0, "blue")], [(4.5, "red")])
+        second = ([decision(1.0, "blue")], [(0.5, "blue"), (3.0, "red")])
+        acc = score([first, second], tolerance=1.5, windows=10)
+        self.assertEqual((acc['keywords'], acc['detected'], acc['false_accepts'], acc['false_rejects']),
+                         (3, 2, 1, 1))
+        self.assertEqual(acc['false_accepts_per_window'], 0.1)
+        self.assertAlmostEqual(acc['decision_latency_ms']['mean'], 500.0)
+
+    def test_report_scores_each_result(self):
+        results = [
+            {'decisions': [], 'windows': [(1.0, 2.0)], 'wall': 1.0, 'audio_seconds': 10.0,
+             'truth': [(4.5, "red")]},
+            {'decisions': [decision(5.0, "red")], 'windows': [(1.0, 2.0)], 'wall': 1.0,
+             'audio_seconds': 10.0, 'truth': []},
+        ]
+        rep = report(results, tolerance=1.5)
+        self.assertEqual((rep['accuracy']['detected'], rep['accuracy']['false_accepts']), (0, 1))
+        self.assertNotIn('accuracy', report([dict(results[1])], tolerance=1.5))
+
+
+class TruthTest(unittest.TestCase):
+
+    def test_lines_are_picked_by_file(self):
+        truth = [(1.0, "red", "a.wav"), (2.0, "blue", "/data/b.wav"), (3.0, "select", None)]
+        self.assertEqual(_truth_for(truth, "/data/a.wav"), [(1.0, "red"), (3.0, "select")])
+        self.assertEqual(_truth_for(truth, "/data/b.wav"), [(2.0, "blue"), (3.0, "select")])
+
+
+if __name__ == "__main__":
+    unittest.main()